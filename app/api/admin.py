@@ -0,0 +1,64 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+from .. import schemas
+from ..config import settings
+from ..database import get_db
+from ..dependencies import get_ai_service, get_document_processor, get_vector_store
+from ..profiling import ProfiledRoute
+from ..services import deletion
+from ..services.ai_service import AIService
+from ..services.document_processor import DocumentProcessor
+from ..services.vector_store import VectorStore, merge_results
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Admin API disabled")
+    if not hmac.compare_digest((x_admin_token or "").encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/search", dependencies=[Depends(require_admin)])
+def search_all_documents(
+    search_request: schemas.AdminSearch,
+    ai_service: AIService = Depends(get_ai_service),
+    vector_store: VectorStore = Depends(get_vector_store),
+) -> dict:
+    """Search across tenants; partitions are queried in parallel and merged by distance."""
+    limit = search_request.limit or 10
+    results = merge_results([
+        vector_store.search_all(query_embedding, n_results=limit,
+                                user_ids=search_request.user_ids, embedding_model=model)
+        for model, query_embedding in ai_service.embed_query(search_request.query).items()
+    ], limit)
+    return {"query": search_request.query, "results": results, "total_found": len(results)}
+
+
+@router.delete("/users/{user_id}/documents", dependencies=[Depends(require_admin)])
+def purge_user_documents(
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor),
+    vector_store: VectorStore = Depends(get_vector_store),
+) -> dict:
+    """Delete every document of a user (e.g. before removing the account)."""
+    deleted = deletion.delete_documents(db, user_id, None, vector_store, doc_processor.storage,
+                                        background_tasks)
+    return {"user_id": user_id, "deleted": len(deleted)}
+
+
+@router.post("/deletions/sweep", dependencies=[Depends(require_admin)])
+def sweep_deletions(
+    min_age_seconds: float = 60.0,
+    db: Session = Depends(get_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor),
+    vector_store: VectorStore = Depends(get_vector_store),
+) -> dict:
+    """Retry vector and file cleanup that failed after documents were deleted."""
+    return deletion.sweep_pending_deletions(db, vector_store, doc_processor.storage,
+                                            min_age_seconds=min_age_seconds)
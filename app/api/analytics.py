@@ -1,58 +1,53 @@
-from fastapi import APIRouter, Depends
+import json
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from .. import models, auth
-from ..database import get_db
-from ..services.vector_store import VectorStore
+from .. import crud, models, auth
+from ..database import get_read_db
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
-vector_store = VectorStore()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/dashboard")
 def get_dashboard_stats(
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> dict:
-    # Get document statistics
-    total_docs = db.query(models.Document).filter(
-        models.Document.owner_id == current_user.id
-    ).count()
-    
-    processed_docs = db.query(models.Document).filter(
-        models.Document.owner_id == current_user.id,
-        models.Document.processed_at.isnot(None)
-    ).count()
-    
-    # Category distribution
-    category_stats = db.query(
-        models.Document.category,
-        func.count(models.Document.id).label('count')
-    ).filter(
-        models.Document.owner_id == current_user.id
-    ).group_by(models.Document.category).all()
-    
-    # Recent documents
-    recent_docs = db.query(models.Document).filter(
-        models.Document.owner_id == current_user.id
-    ).order_by(models.Document.created_at.desc()).limit(5).all()
-    
-    # Vector store stats
-    vector_stats = vector_store.get_collection_stats()
-    
+    # Single primary-key read of the per-user rollup maintained by crud
+    stats = crud.get_user_stats(db, current_user.id)
+    total_docs = stats.total_documents
+    processed_docs = stats.processed_documents
+
     return {
         "total_documents": total_docs,
         "processed_documents": processed_docs,
         "processing_rate": (processed_docs / max(total_docs, 1)) * 100,
         "category_distribution": [
-            {"category": cat, "count": count} for cat, count in category_stats
-        ],
-        "recent_documents": [
-            {
-                "id": doc.id,
-                "filename": doc.original_filename,
-                "category": doc.category,
-                "created_at": doc.created_at
-            } for doc in recent_docs
+            {"category": cat or None, "count": count}
+            for cat, count in json.loads(stats.category_counts).items()
         ],
-        "vector_store_stats": vector_stats
-    }
\ No newline at end of file
+        "recent_documents": json.loads(stats.recent_documents),
+        "vector_store_stats": {"total_documents": stats.vector_chunks, "scope": "user"}
+    }
+
+
+@router.get("/performance")
+def get_performance_stats(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db)
+) -> dict:
+    """Ingestion latency percentiles and throughput over the last ``hours`` hours."""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    by_stage = crud.get_stage_latencies(db, current_user.id, since)
+    for row in by_stage:
+        row["docs_per_hour"] = row["documents"] / hours
+
+    return {
+        "window_hours": hours,
+        "by_stage": by_stage,
+        "by_mime_type": crud.get_stage_latencies(db, current_user.id, since, group_by="mime_type"),
+        "by_size_bucket": crud.get_stage_latencies(db, current_user.id, since,
+                                                   group_by="size_bucket"),
+        "hourly_throughput": crud.get_hourly_throughput(db, current_user.id, since),
+    }
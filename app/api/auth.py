@@ -6,8 +6,9 @@ from sqlalchemy.orm import Session
 from .. import crud, schemas, auth
 from ..database import get_db
 from ..config import settings
+from ..profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/register", response_model=schemas.User)
 def register(user: schemas.UserCreate, db: Session = Depends(get_db)) -> schemas.User:
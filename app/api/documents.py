@@ -1,26 +1,37 @@
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+import json
+from contextlib import contextmanager
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, Tuple, Union,
+)
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Header,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
-from .. import crud, schemas, auth
-from ..database import get_db
+import numpy as np
+from .. import crud, models, schemas, auth
+from ..database import get_db, get_read_db
+from ..config import settings
+from ..dependencies import get_ai_service, get_document_processor, get_vector_store
+from ..profiling import ProfiledRoute, profiled
 from ..services.document_processor import DocumentProcessor
-from ..services.ai_service import AIService
-from ..services.vector_store import VectorStore
-import os
+from ..services.ai_service import DEFAULT_EMBEDDER, AIService
+from ..services.vector_store import VectorStore, merge_results
+from ..services.language import UNDETERMINED, dominant_language, get_detector
+from ..services import dedup, deletion, versioning
+from ..services.content_store import ContentStore
+from ..services.inference import InferenceSaturated, inference_limiter
+from ..utils.sse import Emit, event_stream
+from ..utils.timing import StageTimer
 from datetime import datetime
 
-router = APIRouter()
-doc_processor = DocumentProcessor()
-ai_service = AIService()
-vector_store = VectorStore()
+router = APIRouter(route_class=ProfiledRoute)
+content_store = ContentStore()
+MAX_BULK_DELETE = 1000
 
-@router.post("/upload", response_model=schemas.Document)
-async def upload_document(
-    file: UploadFile = File(...),
-    category: Optional[str] = Form(None),
-    current_user: schemas.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
-):
+
+def _check_upload(file: UploadFile) -> None:
     # Validate file type
     allowed_types = {
         'application/pdf', 'text/plain', 'image/jpeg', 'image/png',
@@ -32,11 +43,23 @@ async def upload_document(
             status_code=400,
             detail=f"File type {file.content_type} not supported"
         )
-    
-    # Save file
-    file_content = await file.read()
-    file_path = doc_processor.save_uploaded_file(file_content, file.filename)
-    
+    # Reject up front rather than storing a file we won't be able to process
+    inference_limiter.check("summarizer", "embedder")
+
+
+async def _accept_upload(
+    file: UploadFile,
+    category: Optional[str],
+    current_user: schemas.User,
+    db: Session,
+    doc_processor: DocumentProcessor,
+) -> models.Document:
+    """Validate, save and record an upload; processing happens afterwards."""
+    _check_upload(file)
+
+    # Save file (streamed to the storage backend in chunks)
+    key, file_size = await doc_processor.save_uploaded_file(file, file.filename)
+
     # Create document record
     document_create = schemas.DocumentCreate(
         original_filename=file.filename,
@@ -44,87 +67,312 @@ async def upload_document(
     )
     
     file_info: Dict[str, Any] = {
-        "filename": os.path.basename(file_path),
-        "file_path": file_path,
-        "file_size": len(file_content),
+        "filename": key,
+        "file_path": key,  # storage key; full paths in rows from before storage backends
+        "file_size": file_size,
         "mime_type": file.content_type
     }
     
-    document = crud.create_document(
+    return crud.create_document(
         db=db,
         document=document_create,
         user_id=current_user.id,
         file_info=file_info
     )
-    
-    # Process document asynchronously (simplified - normally would use Celery)
+
+
+def _discard_upload(db: Session, document: models.Document, doc_processor: DocumentProcessor,
+                    vector_store: VectorStore) -> None:
+    """Drop an upload that couldn't be processed so the client's retry doesn't duplicate it."""
+    deletion.delete_documents(db, document.owner_id, [document.id], vector_store,
+                              doc_processor.storage)
+
+
+@router.post("/upload", response_model=schemas.Document)
+async def upload_document(
+    file: UploadFile = File(...),
+    category: Optional[str] = Form(None),
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor),
+    ai_service: AIService = Depends(get_ai_service),
+    vector_store: VectorStore = Depends(get_vector_store)
+):
+    document = await _accept_upload(file, category, current_user, db, doc_processor)
+
+    # Process document (simplified - normally would use Celery). Runs in the threadpool so
+    # that waiting for an inference slot doesn't block the event loop.
+    try:
+        document = await run_in_threadpool(
+            profiled(_process_document), db, document, category, doc_processor, ai_service,
+            vector_store,
+        )
+    except InferenceSaturated:
+        # Nothing was indexed yet
+        _discard_upload(db, document, doc_processor, vector_store)
+        raise
+
+    return document
+
+
+@router.post("/upload/stream")
+async def upload_document_stream(
+    file: UploadFile = File(...),
+    category: Optional[str] = Form(None),
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor),
+    ai_service: AIService = Depends(get_ai_service),
+    vector_store: VectorStore = Depends(get_vector_store)
+):
+    """Like ``/upload``, but streams processing progress as server-sent events.
+
+    Events: ``accepted``, ``stage`` (started/done per stage), ``page`` (PDF extraction),
+    ``extracted``, ``duplicate`` (near-duplicate found), ``classification``, ``summary``,
+    ``language``, ``embedded``, ``indexed``, then ``done`` with the document or ``error``
+    with the status ``/upload`` would have returned.
+    """
+    document = await _accept_upload(file, category, current_user, db, doc_processor)
+
+    def work(emit: Emit) -> Dict[str, Any]:
+        emit("accepted", {"document_id": document.id, "filename": document.original_filename})
+        try:
+            processed = _process_document(
+                db, document, category, doc_processor, ai_service, vector_store, emit
+            )
+        except InferenceSaturated:
+            _discard_upload(db, document, doc_processor, vector_store)
+            raise
+        return schemas.Document.model_validate(processed).model_dump(mode="json")
+
+    return event_stream(work)
+
+
+@contextmanager
+def _stage(timer: StageTimer, emit: Emit, name: str) -> Iterator[None]:
+    """Time a processing stage and report its start and end."""
+    emit("stage", {"stage": name, "status": "started"})
+    with timer.stage(name):
+        yield
+    emit("stage", {"stage": name, "status": "done", "ms": round(timer.stages[name], 1)})
+
+
+def _process_document(
+    db: Session,
+    document: models.Document,
+    category: Optional[str],
+    doc_processor: DocumentProcessor,
+    ai_service: AIService,
+    vector_store: VectorStore,
+    emit: Optional[Emit] = None,
+) -> models.Document:
+    """Extract, classify, summarize, embed and index an uploaded document.
+
+    ``emit(event, data)`` receives stage transitions and partial results as they happen.
+    """
+    emit = emit or (lambda event, data: None)
+    timer = StageTimer()
     try:
         # Extract text
-        extraction_result = doc_processor.extract_text_from_file(file_path, file.content_type)
-        
+        with _stage(timer, emit, "extraction"):
+            extraction_result = doc_processor.extract_text(
+                document.file_path, document.mime_type,
+                progress=lambda page, pages: emit("page", {"page": page, "pages": pages}),
+            )
+        emit("extracted", {
+            "characters": len(extraction_result.get("text", "")),
+            "pages": extraction_result.get("pages"),
+            "error": extraction_result.get("error"),
+        })
+
         if extraction_result.get("text"):
             text = extraction_result["text"]
-            
+            page_breaks = extraction_result.get("page_breaks", [])
+
+            # Look for a near-duplicate among the owner's documents
+            duplicate: Optional[models.Document] = None
+            similarity = None
+            if settings.dedup_enabled:
+                with _stage(timer, emit, "deduplication"):
+                    signature = dedup.text_signature(text)
+                    match = dedup.find_duplicate(db, document.owner_id, signature, document.id)
+                if match:
+                    duplicate = crud.get_document(db, match[0], document.owner_id)
+                if duplicate is not None:
+                    similarity = match[1]
+                    emit("duplicate", {"document_id": duplicate.id, "similarity": similarity})
+            reuse = (duplicate is not None and duplicate.processed_at is not None
+                     and similarity is not None and similarity >= settings.dedup_reuse_similarity)
+
             # Classify document
-            classification = ai_service.classify_document(text)
-            
+            with _stage(timer, emit, "classification"):
+                if reuse:
+                    classification = {"category": duplicate.category,
+                                      "confidence": duplicate.confidence_score or 0.0,
+                                      "reused_from": duplicate.id}
+                else:
+                    classification = ai_service.classify_document(text)
+            emit("classification", {
+                "category": classification.get("category"),
+                "confidence": classification.get("confidence", 0.0),
+            })
+
             # Generate summary
-            summary_result = ai_service.summarize_text(text)
-            
-            # Generate embeddings
-            embeddings = ai_service.get_embeddings([text])
-            
+            with _stage(timer, emit, "summarization"):
+                if reuse:
+                    summary_result = {"summary": duplicate.summary or ""}
+                else:
+                    summary_result = ai_service.summarize_text(text)
+            emit("summary", {"summary": summary_result.get("summary", "")})
+
+            # Detect the language of each chunk
+            chunks = vector_store.split_text(text, page_breaks)
+            with _stage(timer, emit, "language"):
+                language, chunk_languages = _chunk_languages(chunks)
+            emit("language", {"language": language})
+
+            # Generate embeddings, one batch per embedder the chunks are routed to
+            with _stage(timer, emit, "embedding"):
+                embeddings, embedders = ai_service.embed_by_language(chunks, chunk_languages)
+            chunk_count = len(chunks)
+            emit("embedded", {"chunks": chunk_count, "embedders": sorted(set(embedders))})
+
+            # Add to vector store
+            final_category = classification.get("category", category)
+            with _stage(timer, emit, "indexing"):
+                indexed = vector_store.add_document(
+                    doc_id=str(document.id),
+                    text=text,
+                    embeddings=embeddings,
+                    metadata={
+                        "document_id": document.id,
+                        "filename": document.original_filename,
+                        "category": final_category,
+                        "user_id": document.owner_id
+                    },
+                    chunk_metadata=[
+                        {"language": lang, "embedding_model": model}
+                        for lang, model in zip(chunk_languages, embedders)
+                    ],
+                    page_breaks=page_breaks,
+                )
+            emit("indexed", {"chunks": chunk_count if indexed else 0, "indexed": indexed})
+
             # Update document with processed data
             update_data = {
-                "content": text,
-                "category": classification.get("category", category),
+                **_content_fields(document.filename, text, page_breaks),
+                "category": final_category,
+                "language": language,
+                "duplicate_of_id": duplicate.id if duplicate is not None else None,
+                "duplicate_similarity": similarity,
                 "confidence_score": classification.get("confidence", 0.0),
                 "summary": summary_result.get("summary", ""),
+                "chunk_count": chunk_count if indexed else 0,
                 "processed_at": datetime.utcnow()
             }
             
             document = crud.update_document(db, document.id, **update_data)
-            
-            # Add to vector store
-            vector_store.add_document(
-                doc_id=str(document.id),
-                text=text,
-                embeddings=embeddings[0] if embeddings else [],
-                metadata={
-                    "document_id": document.id,
-                    "filename": document.original_filename,
-                    "category": document.category,
-                    "user_id": current_user.id
-                }
-            )
-            
+            if settings.dedup_enabled:
+                dedup.index_document(db, document.id, document.owner_id, signature)
+
             # Store analysis results
             crud.create_document_analysis(
                 db=db,
                 document_id=document.id,
                 analysis_type="classification",
-                result=str(classification),
+                result=classification,
                 confidence=classification.get("confidence", 0.0)
             )
             
+            crud.record_processing_metrics(db, document,
+                                           {**timer.stages, "total": timer.total_ms()})
+
+    except InferenceSaturated:
+        raise
     except Exception as e:
         print(f"Error processing document: {e}")
     
     return document
 
-@router.get("/", response_model=List[schemas.Document])
+
+def _chunk_languages(chunks: List[str]) -> Tuple[str, List[str]]:
+    """The document's dominant language and the language of each chunk."""
+    chunk_languages = get_detector().detect_many(chunks)
+    language = dominant_language(chunk_languages, [len(c) for c in chunks])
+    # Chunks too short to tell (tables, numbers) follow the document
+    return language, [language if lang == UNDETERMINED else lang for lang in chunk_languages]
+
+
+def _content_fields(filename: str, text: str, page_breaks: List[int]) -> Dict[str, Any]:
+    """Column values for extracted text and its page offsets, offloading large texts to the
+    content store."""
+    fields = {"page_breaks": json.dumps(page_breaks) if page_breaks else None}
+    if content_store.should_offload(text):
+        return {**fields, "content": None, "content_blob": content_store.put(filename, text)}
+    return {**fields, "content": text, "content_blob": None}
+
+
+def _page_breaks(document: models.Document) -> List[int]:
+    return json.loads(document.page_breaks) if document.page_breaks else []
+
+
+def _parse_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single ``bytes=`` range into an inclusive (start, end) pair."""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if not start_s:
+            # Suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+@router.get("/", response_model=List[schemas.DocumentListItem])
 def get_documents(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from X-Next-Cursor"),
     category: Optional[str] = Query(None),
+    mime_type: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    count: Literal["none", "estimate", "exact"] = Query("none"),
     current_user: schemas.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    documents = crud.get_documents(db, user_id=current_user.id, skip=skip, limit=limit)
-    
-    if category:
-        documents = [doc for doc in documents if doc.category == category]
-    
+    filters: Dict[str, Any] = {
+        "category": category,
+        "mime_type": mime_type,
+        "created_after": created_after,
+        "created_before": created_before,
+    }
+    try:
+        documents = crud.get_documents(
+            db, user_id=current_user.id, skip=skip, limit=limit, cursor=cursor, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(documents) == limit:
+        response.headers["X-Next-Cursor"] = crud.encode_cursor(documents[-1])
+    if count != "none":
+        cap = settings.document_count_cap if count == "estimate" else None
+        total, exact = crud.count_documents(db, user_id=current_user.id, cap=cap, **filters)
+        response.headers["X-Total-Count"] = str(total)
+        response.headers["X-Total-Count-Exact"] = "true" if exact else "false"
+
     return documents
 
 @router.get("/{document_id}", response_model=schemas.Document)
@@ -136,69 +384,571 @@ def get_document(
     document = crud.get_document(db, document_id=document_id, user_id=current_user.id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    if document.content_blob:
+        result = schemas.Document.model_validate(document)
+        result.content = content_store.load_text(document)
+        return result
+    return document
+
+
+@router.put("/{document_id}", response_model=schemas.Document)
+async def upload_document_version(
+    document_id: int,
+    file: UploadFile = File(...),
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor),
+    ai_service: AIService = Depends(get_ai_service),
+    vector_store: VectorStore = Depends(get_vector_store)
+):
+    """Replace a document's file with a new version, keeping its id.
+
+    Only chunks whose text changed are re-indexed, and only text that is new is embedded;
+    the summary is refined or redone depending on how much changed (``/versions``).
+    """
+    document = crud.get_document(db, document_id=document_id, user_id=current_user.id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if document.processed_at is None:
+        raise HTTPException(status_code=409, detail="Document has not been processed yet")
+    _check_upload(file)
+    key, file_size = await doc_processor.save_uploaded_file(file, file.filename)
+    file_info = {
+        "filename": key,
+        "file_path": key,
+        "file_size": file_size,
+        "mime_type": file.content_type,
+        "original_filename": file.filename,
+    }
+    try:
+        return await run_in_threadpool(
+            profiled(_update_document), db, document, file_info, doc_processor, ai_service,
+            vector_store,
+        )
+    except Exception:
+        db.rollback()
+        current = crud.get_document(db, document_id=document_id, user_id=current_user.id)
+        if current is None or current.file_path != key:
+            # The previous version stays current
+            doc_processor.storage.delete(key)
+        raise
+
+
+def _update_document(
+    db: Session,
+    document: models.Document,
+    file_info: Dict[str, Any],
+    doc_processor: DocumentProcessor,
+    ai_service: AIService,
+    vector_store: VectorStore,
+) -> Union[models.Document, schemas.Document]:
+    """Process a new version of ``document`` against the chunks indexed for the old one."""
+    timer = StageTimer()
+    with timer.stage("extraction"):
+        extraction_result = doc_processor.extract_text(file_info["file_path"],
+                                                       file_info["mime_type"])
+    text = extraction_result.get("text")
+    page_breaks = extraction_result.get("page_breaks", [])
+    if not text:
+        raise HTTPException(
+            status_code=422,
+            detail=extraction_result.get("error") or "No text could be extracted"
+        )
+
+    # Chunks indexed for the previous version; rewritten in full if their layout is unknown
+    # or the previous version failed to index
+    previous_count = document.chunk_count or 0
+    versions = crud.get_document_versions(db, document.id)
+    old_chunks = vector_store.split_text(content_store.load_text(document) or "",
+                                         _page_breaks(document))
+    if (len(old_chunks) != previous_count
+            or (versions and (versions[-1].changes or {}).get("indexed") is False)):
+        old_chunks = []
+    chunks = vector_store.split_text(text, page_breaks)
+    with timer.stage("diff"):
+        diff = versioning.diff_chunks(old_chunks, chunks)
+        mode = versioning.update_mode(diff, len(text)) if old_chunks else "full"
+
+    with timer.stage("classification"):
+        if mode == "unchanged":
+            classification = {"category": document.category,
+                              "confidence": document.confidence_score or 0.0}
+        else:
+            classification = ai_service.classify_document(text)
+
+    with timer.stage("summarization"):
+        if mode == "full" or (mode == "incremental" and document.summary is None):
+            summary = ai_service.summarize_text(text).get("summary", "")
+        elif mode == "incremental" and diff["added_chars"]:
+            # Refine the previous summary with the text this version adds
+            added = "\n".join(chunks[i] for i in diff["embed"])
+            summary = ai_service.summarize_text(f"{document.summary}\n\n{added}").get("summary", "")
+        else:
+            summary = document.summary
+
+    with timer.stage("language"):
+        language, chunk_languages = _chunk_languages(chunks)
+
+    # Moved chunks take their stored vectors; only new text is embedded
+    stored = vector_store.get_chunks(str(document.id), set(diff["reuse"].values()),
+                                     document.owner_id)
+    reused = {i: stored[j] for i, j in diff["reuse"].items() if j in stored}
+    embed = [i for i in diff["changed"] if i not in reused]
+    with timer.stage("embedding"):
+        embeddings, embedders = ai_service.embed_by_language(
+            [chunks[i] for i in embed], [chunk_languages[i] for i in embed]
+        )
+    embedded = dict(zip(embed, zip(embeddings, embedders)))
+    vectors, chunk_metadata = [], []
+    for i in diff["changed"]:
+        if i in reused:
+            vector, meta = reused[i]
+            model = meta.get("embedding_model", DEFAULT_EMBEDDER)
+        else:
+            vector, model = embedded[i]
+        vectors.append(vector)
+        chunk_metadata.append({"language": chunk_languages[i], "embedding_model": model})
+
+    final_category = classification.get("category", document.category)
+    refresh_metadata = (file_info["original_filename"] != document.original_filename
+                        or final_category != document.category)
+
+    duplicate_fields: Dict[str, Any] = {}
+    if settings.dedup_enabled:
+        with timer.stage("deduplication"):
+            signature = dedup.text_signature(text)
+            match = dedup.find_duplicate(db, document.owner_id, signature, document.id)
+        duplicate_fields = {"duplicate_of_id": match[0] if match else None,
+                            "duplicate_similarity": match[1] if match else None}
+
+    # History starts with the version being replaced
+    if not versions:
+        crud.create_document_version(db, document)
+    previous_file, previous_blob = document.file_path, document.content_blob
+    content_fields = _content_fields(file_info["filename"], text, page_breaks)
+    # The new version is committed before the vector store is touched, so a failed database
+    # write leaves the old chunks in place. Until indexing succeeds, chunk_count covers the
+    # chunk ids of both versions, so a later version or delete still removes the old ones.
+    document = crud.update_document(
+        db, document.id,
+        **file_info,
+        **content_fields,
+        **duplicate_fields,
+        category=final_category,
+        language=language,
+        confidence_score=classification.get("confidence", 0.0),
+        summary=summary,
+        chunk_count=max(previous_count, len(chunks)),
+        processed_at=datetime.utcnow(),
+        version=(document.version or 1) + 1,
+    )
+    with timer.stage("indexing"):
+        indexed = vector_store.update_chunks(
+            doc_id=str(document.id),
+            chunks={i: chunks[i] for i in diff["changed"]},
+            embeddings=np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32),
+            metadata={
+                "document_id": document.id,
+                "filename": file_info["original_filename"],
+                "category": final_category,
+                "user_id": document.owner_id
+            },
+            chunk_metadata=chunk_metadata,
+            chunk_count=len(chunks),
+            previous_count=previous_count,
+            refresh_metadata=refresh_metadata,
+        )
+    if indexed and document.chunk_count != len(chunks):
+        document = crud.update_document(db, document.id, chunk_count=len(chunks))
+    if settings.dedup_enabled:
+        dedup.index_document(db, document.id, document.owner_id, signature)
+        if match:
+            crud.reassign_duplicates(db, document.id, match[0])
+    changes = {
+        "mode": mode,
+        "chunks": len(chunks),
+        "changed": len(diff["changed"]),
+        "embedded": len(embed),
+        "reused": len(reused),
+        "removed": max(previous_count - len(chunks), 0),
+    }
+    if not indexed:
+        changes["indexed"] = False
+    crud.create_document_version(db, document, changes)
+    if mode != "unchanged":
+        crud.create_document_analysis(
+            db=db,
+            document_id=document.id,
+            analysis_type="classification",
+            result=classification,
+            confidence=classification.get("confidence", 0.0)
+        )
+    crud.record_processing_metrics(db, document, {**timer.stages, "total": timer.total_ms()})
+
+    # Files of the replaced version (the garbage collector catches any left behind)
+    try:
+        doc_processor.storage.delete(previous_file)
+    except Exception as e:
+        print(f"Error removing previous version file: {e}")
+    if previous_blob != content_fields["content_blob"]:
+        content_store.delete(previous_blob)
+
+    if document.content_blob:
+        result = schemas.Document.model_validate(document)
+        result.content = text
+        return result
     return document
 
+
+@router.get("/{document_id}/versions", response_model=List[schemas.DocumentVersion])
+def get_document_versions(
+    document_id: int,
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Versions of a document, oldest first (just the current one until it is replaced)."""
+    document = crud.get_document(db, document_id=document_id, user_id=current_user.id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return crud.get_document_versions(db, document.id) or [
+        schemas.DocumentVersion(
+            version=document.version or 1,
+            original_filename=document.original_filename,
+            file_size=document.file_size,
+            mime_type=document.mime_type,
+            chunk_count=document.chunk_count,
+            summary=document.summary,
+            created_at=document.processed_at or document.created_at,
+        )
+    ]
+
+
+@router.get("/{document_id}/content")
+def get_document_content(
+    document_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Return the extracted text as UTF-8 bytes, honouring single ``Range`` requests."""
+    document = crud.get_document(db, document_id=document_id, user_id=current_user.id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    text = content_store.load_text(document)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Document not processed yet")
+
+    data = text.encode("utf-8")
+    headers = {"Accept-Ranges": "bytes"}
+    media_type = "text/plain; charset=utf-8"
+    if range_header:
+        byte_range = _parse_range(range_header, len(data))
+        if byte_range is None:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{len(data)}"},
+            )
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(data[start:end + 1], status_code=206, headers=headers,
+                        media_type=media_type)
+    return Response(data, headers=headers, media_type=media_type)
+
+
+@router.get("/{document_id}/file")
+async def download_document_file(
+    document_id: int,
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor)
+):
+    """Stream the originally uploaded file from the storage backend."""
+    document = crud.get_document(db, document_id=document_id, user_id=current_user.id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    filename = (document.original_filename or document.filename).replace('"', "")
+    chunks = doc_processor.storage.read(document.file_path)
+    try:
+        # Open (and read the first chunk) before committing to a 200
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except Exception:
+        raise HTTPException(status_code=404, detail="Stored file not found")
+
+    async def body() -> AsyncIterator[bytes]:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=document.mime_type or "application/octet-stream",
+        headers={
+            "Content-Length": str(document.file_size),
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        },
+    )
+
+
 @router.post("/{document_id}/query")
 def query_document(
     document_id: int,
     query: schemas.DocumentQuery,
     current_user: schemas.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    ai_service: AIService = Depends(get_ai_service)
 ):
+    document, content = _query_target(db, document_id, current_user)
+    return _answer(ai_service, query.query, document, content)
+
+
+@router.post("/{document_id}/query/stream")
+def query_document_stream(
+    document_id: int,
+    query: schemas.DocumentQuery,
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db),
+    ai_service: AIService = Depends(get_ai_service),
+    vector_store: VectorStore = Depends(get_vector_store)
+):
+    """Like ``/query``, streamed as server-sent events: ``document``, then ``passages`` (the
+    best-matching chunks, available long before the QA model finishes), then ``done`` with
+    the answer or ``error``.
+    """
+    document, content = _query_target(db, document_id, current_user)
+
+    def work(emit: Emit) -> Dict[str, Any]:
+        emit("document", {"document_id": document_id, "document_title": document.original_filename})
+        passages = _search(
+            ai_service, vector_store, query.query, 3,
+            {"user_id": current_user.id, "parent_doc_id": str(document_id)},
+        )
+        emit("passages", {"passages": [
+            {
+                "text": passage["document"],
+                "chunk_index": passage["metadata"].get("chunk_index"),
+                "distance": passage["distance"],
+            }
+            for passage in passages
+        ]})
+        return _answer(ai_service, query.query, document, content)
+
+    return event_stream(work)
+
+
+def _query_target(db: Session, document_id: int, current_user: schemas.User) -> tuple:
+    """The user's document and its extracted text, or the HTTP error explaining why not."""
     document = crud.get_document(db, document_id=document_id, user_id=current_user.id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    if not document.content:
+    content = content_store.load_text(document)
+    if not content:
         raise HTTPException(status_code=400, detail="Document not processed yet")
-    
+    return document, content
+
+
+def _answer(ai_service: AIService, question: str, document: models.Document,
+            content: str) -> Dict[str, Any]:
     # Answer question using AI
-    result = ai_service.answer_question(query.query, document.content)
-    
+    result = ai_service.answer_question(question, content)
+
     return {
-        "question": query.query,
+        "question": question,
         "answer": result.get("answer", ""),
         "confidence": result.get("confidence", 0.0),
-        "document_id": document_id,
+        "document_id": document.id,
         "document_title": document.original_filename
     }
 
 
+@router.post("/translate")
+def translate_text(
+    request: schemas.TextTranslation,
+    current_user: schemas.User = Depends(auth.get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """Translate text sentence by sentence; repeated sentences are served from the cache."""
+    return ai_service.translate_text(request.text, request.target_language,
+                                     request.source_language)
+
+
+@router.post("/translate/stream")
+def translate_text_stream(
+    request: schemas.TextTranslation,
+    current_user: schemas.User = Depends(auth.get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """Like ``/translate``, streamed as server-sent events: a ``segment`` per translated batch
+    of sentences, in order, then ``done`` with the whole translation or ``error``.
+    """
+    inference_limiter.check("translator")
+    return event_stream(lambda emit: ai_service.translate_text(
+        request.text, request.target_language, request.source_language,
+        on_segment=lambda segment: emit("segment", segment),
+    ))
+
+
+@router.post("/{document_id}/translate")
+def translate_document(
+    document_id: int,
+    request: schemas.DocumentTranslation,
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """Translate a document's extracted text; the result is stored as a translation analysis."""
+    document, content = _query_target(db, document_id, current_user)
+    return _translate_document(db, ai_service, document, content, request)
+
+
+@router.post("/{document_id}/translate/stream")
+def translate_document_stream(
+    document_id: int,
+    request: schemas.DocumentTranslation,
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """``/{id}/translate`` streamed as ``segment`` events, then ``done`` or ``error``."""
+    document, content = _query_target(db, document_id, current_user)
+    inference_limiter.check("translator")
+    return event_stream(lambda emit: _translate_document(
+        db, ai_service, document, content, request,
+        on_segment=lambda segment: emit("segment", segment),
+    ))
+
+
+def _translate_document(db: Session, ai_service: AIService, document: models.Document,
+                        content: str, request: schemas.DocumentTranslation,
+                        on_segment: Optional[Callable[[Dict[str, Any]], None]] = None
+                        ) -> Dict[str, Any]:
+    source = request.source_language
+    if not source and document.language and document.language != UNDETERMINED:
+        source = document.language
+    result = ai_service.translate_text(content, request.target_language, source, on_segment)
+    if result.get("available"):
+        crud.create_document_analysis(
+            db=db,
+            document_id=document.id,
+            analysis_type="translation",
+            result=result,
+            confidence=result.get("confidence", 0.0)
+        )
+    return {"document_id": document.id, "document_title": document.original_filename, **result}
+
+
+def _search(ai_service: AIService, vector_store: VectorStore, query: str, limit: int,
+            where: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Search every embedding space with the query embedded by that space's model."""
+    return merge_results([
+        vector_store.search_documents(query_embedding, n_results=limit, where=where,
+                                      embedding_model=model)
+        for model, query_embedding in ai_service.embed_query(query).items()
+    ], limit)
+
+
 @router.post("/search")
 def search_documents(
         search_request: schemas.DocumentSearch,  # Accept JSON body
         current_user: schemas.User = Depends(auth.get_current_user),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_db),
+        ai_service: AIService = Depends(get_ai_service),
+        vector_store: VectorStore = Depends(get_vector_store)
 ):
     query = search_request.query
-    limit = search_request.limit
-
-    # Generate query embeddings
-    query_embeddings = ai_service.get_embeddings([query])
+    limit = search_request.limit or 10
 
-    if not query_embeddings:
-        raise HTTPException(status_code=500, detail="Failed to generate query embeddings")
+    # Search the vector store with the query embedded by each embedder chunks are routed to
+    where = {"user_id": current_user.id}
+    if not search_request.collapse_duplicates:
+        results = _search(ai_service, vector_store, query, limit, where)
+        return {"query": query, "results": results, "total_found": len(results)}
 
-    # Search vector store
-    results = vector_store.search_documents(
-        query_embeddings=query_embeddings[0],
-        n_results=limit,
-        where={"user_id": current_user.id}
+    # Fetch extra results so that the page is still full after collapsing duplicates
+    results, collapsed = _collapse_duplicates(
+        db, current_user.id, _search(ai_service, vector_store, query, limit * 2, where)
     )
+    results = results[:limit]
+    return {"query": query, "results": results, "total_found": len(results),
+            "collapsed": collapsed}
 
-    return {"query": query, "results": results, "total_found": len(results)}
+
+def _collapse_duplicates(db: Session, user_id: int,
+                         results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Keep only the best-ranked document of each near-duplicate group.
+
+    Kept results list the group's dropped documents under ``duplicates``; returns the
+    results and the number of results dropped.
+    """
+    originals = crud.get_duplicate_originals(
+        db, user_id, [r["metadata"]["document_id"] for r in results
+                      if r["metadata"].get("document_id") is not None]
+    )
+    kept_document: Dict[int, int] = {}  # group -> document shown for it
+    duplicates: Dict[int, List[int]] = {}
+    kept: List[Dict[str, Any]] = []
+    for result in results:
+        document_id = result["metadata"].get("document_id")
+        group = originals.get(document_id, document_id)
+        shown = kept_document.setdefault(group, document_id)
+        if shown != document_id:
+            if document_id not in duplicates.setdefault(group, []):
+                duplicates[group].append(document_id)
+            continue
+        kept.append(result)
+    for result in kept:
+        document_id = result["metadata"].get("document_id")
+        group = originals.get(document_id, document_id)
+        if duplicates.get(group):
+            result["duplicates"] = duplicates[group]
+    return kept, len(results) - len(kept)
 
 @router.delete("/{document_id}")
 def delete_document(
     document_id: int,
+    background_tasks: BackgroundTasks,
     current_user: schemas.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor),
+    vector_store: VectorStore = Depends(get_vector_store)
 ):
-    success = crud.delete_document(db, document_id=document_id, user_id=current_user.id)
-    if not success:
+    # Row, vectors, then (after the response) the stored files
+    if not deletion.delete_documents(db, current_user.id, [document_id], vector_store,
+                                     doc_processor.storage, background_tasks):
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Remove from vector store
-    vector_store.delete_document(str(document_id))
-    
-    return {"message": "Document deleted successfully"}
\ No newline at end of file
+    return {"message": "Document deleted successfully"}
+
+
+@router.delete("/")
+def delete_documents(
+    background_tasks: BackgroundTasks,
+    ids: Optional[str] = Query(None, description="Comma-separated document ids"),
+    purge_all: bool = Query(False, alias="all", description="Delete all of your documents"),
+    current_user: schemas.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db),
+    doc_processor: DocumentProcessor = Depends(get_document_processor),
+    vector_store: VectorStore = Depends(get_vector_store)
+):
+    """Bulk delete: ``?ids=1,2,3`` (at most MAX_BULK_DELETE) or ``?all=true``."""
+    if purge_all == (ids is not None):
+        raise HTTPException(status_code=400, detail="Pass either ids or all=true")
+    document_ids = None
+    if ids is not None:
+        try:
+            document_ids = sorted({int(i) for i in ids.split(",") if i.strip()})
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if not document_ids or len(document_ids) > MAX_BULK_DELETE:
+            raise HTTPException(status_code=400,
+                                detail=f"Between 1 and {MAX_BULK_DELETE} ids per request")
+
+    deleted = deletion.delete_documents(db, current_user.id, document_ids, vector_store,
+                                        doc_processor.storage, background_tasks)
+    return {
+        "deleted": len(deleted),
+        "document_ids": deleted,
+        "not_found": sorted(set(document_ids or ()) - set(deleted)),
+    }
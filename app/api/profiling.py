@@ -0,0 +1,52 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from ..config import settings
+from ..profiling import (
+    ProfiledRoute, access_token, profile_store, profiler_arm, token_valid,
+)
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+class ProfilerArmRequest(BaseModel):
+    count: int = Field(1, ge=1, le=100)
+    threshold_ms: float = Field(0.0, ge=0)
+    mode: Literal["cprofile", "sample"] = "sample"
+
+
+def require_profiling_access(x_profile_token: Optional[str] = Header(None)) -> None:
+    if not settings.profiling_enabled or not access_token():
+        raise HTTPException(status_code=404, detail="Profiling disabled")
+    if not token_valid(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+@router.post("/arm", dependencies=[Depends(require_profiling_access)])
+def arm_profiler(request: ProfilerArmRequest) -> dict:
+    """Profile the next ``count`` requests that take at least ``threshold_ms``."""
+    profiler_arm.arm(request.count, request.threshold_ms, request.mode)
+    return profiler_arm.state()
+
+
+@router.delete("/arm", dependencies=[Depends(require_profiling_access)])
+def disarm_profiler() -> dict:
+    profiler_arm.disarm()
+    return profiler_arm.state()
+
+
+@router.get("/profiles", dependencies=[Depends(require_profiling_access)])
+def list_profiles() -> dict:
+    return {"armed": profiler_arm.state(), "profiles": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_profiling_access)])
+def download_profile(profile_id: str, format: Optional[str] = None):
+    """Download a stored profile (``.prof``/``.txt`` for cProfile, ``.folded`` for samples)."""
+    files = profile_store.files(profile_id)
+    if format:
+        files = [path for path in files if path.suffix == f".{format}"]
+    if not files:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(files[0], filename=files[0].name)
@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Dict, Optional
 try:
     from pydantic_settings import BaseSettings
 except ImportError:  # Fallback for environments without pydantic-settings
@@ -7,15 +7,152 @@ except ImportError:  # Fallback for environments without pydantic-settings
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./intellidoc.db"
+    # Optional read replica used by read-only endpoints; defaults to the primary
+    database_read_url: Optional[str] = None
     redis_url: str = "redis://localhost:6379"
     huggingface_api_key: Optional[str] = None
     secret_key: str = "your-secret-key-change-this"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     upload_dir: str = "./uploads"
+    # Uploaded files: local (upload_dir, fanned out into hash-prefix directories
+    # storage_shard_depth levels deep) or s3 (any S3-compatible endpoint, e.g. MinIO)
+    storage_backend: str = "local"
+    storage_shard_depth: int = 2
+    storage_s3_bucket: Optional[str] = None
+    storage_s3_prefix: str = "uploads/"
+    storage_s3_endpoint_url: Optional[str] = None
+    storage_s3_region: Optional[str] = None
+    # Orphaned files younger than this are kept by python -m app.utils.gc_uploads
+    storage_gc_grace_seconds: int = 3600
     chroma_persist_dir: str = "./chroma_db"
-    
+    vector_backend: str = "auto"  # auto (chroma if installed), chroma or memory
+    # Memory backend storage: none (float32), float16, int8 or binary. Lossy codes are
+    # re-ranked exactly on the top k * vector_rerank_factor candidates (0 disables that and
+    # the float32 spill file kept for it in vector_spill_dir, default: system temp dir)
+    vector_quantization: str = "none"
+    # Memory backend index: flat (exhaustive) or ivf (k-means inverted lists; exhaustive until
+    # vector_ivf_min_train chunks, nlist 0 = sqrt(chunks), nprobe lists scanned per query)
+    vector_index: str = "flat"
+    vector_ivf_nlist: int = 0
+    vector_ivf_nprobe: int = 8
+    vector_ivf_min_train: int = 10000
+    # Vectors are partitioned by owner so a user's search only touches their own: user (one
+    # sub-index / chroma collection each), shard (user_id % vector_shards) or none
+    vector_partitioning: str = "user"
+    vector_shards: int = 16
+    vector_search_workers: int = 4  # threads for cross-partition (admin) searches
+    vector_rerank_factor: int = 4
+    vector_spill_dir: Optional[str] = None
+    # Write-behind buffer: vector adds/deletes are batched until this many chunks are pending
+    # or the oldest is this old (seconds); 0 writes through immediately
+    vector_write_batch_size: int = 256
+    vector_write_flush_interval: float = 1.0
+    # Chunks are tagged with their detected language and embedded by the embedder routed to
+    # it in embedding_routes (language -> "embedder" or "multilingual_embedder"), others by
+    # embedding_default_route. Routed embedders must produce vectors of the same dimension.
+    # Disabling language_detection embeds everything with "embedder"
+    language_detection: bool = True
+    embedding_routes: Dict[str, str] = {"en": "embedder"}
+    embedding_default_route: str = "multilingual_embedder"
+    # Translation: one MarianMT model per language pair, loaded on first use (at most
+    # translation_max_models stay loaded); text is translated in batches of sentences and
+    # translations are cached per sentence (LRU of translation_cache_size entries)
+    translation_model_template: str = "Helsinki-NLP/opus-mt-{source}-{target}"
+    translation_backend: str = "torch"
+    translation_max_models: int = 4
+    translation_batch_size: int = 16
+    translation_cache_size: int = 20000
+    translation_max_sentence_chars: int = 400
+    warm_up_on_startup: bool = True  # build models in the background at startup
+
+    # Inference backend per model: torch (reference), torch-int8 (dynamic quantization)
+    # or onnx (ONNX Runtime via optimum; exported graphs are cached in onnx_cache_dir)
+    classifier_backend: str = "torch"
+    qa_backend: str = "torch"
+    summarizer_backend: str = "torch"
+    embedder_backend: str = "torch"
+    multilingual_embedder_backend: str = "torch"
+    onnx_cache_dir: str = "./onnx_models"
+
+    # CPU budget per worker process. torch's thread pools are process-wide; ONNX sessions
+    # can be given their own intra-op budget in inference_model_threads (e.g. {"qa": 2})
+    inference_intra_op_threads: int = 0  # 0 = cpu_count // server_workers
+    inference_inter_op_threads: int = 1
+    inference_model_threads: Dict[str, int] = {}
+    # Admission control: concurrent calls per model, calls allowed to wait for a slot
+    # (beyond that 429) and how long they wait (then 503); both answer with Retry-After
+    inference_max_concurrency: int = 1
+    inference_model_concurrency: Dict[str, int] = {}
+    inference_max_queue: int = 16  # 0 = unbounded
+    inference_queue_timeout: float = 30.0  # seconds; 0 = wait indefinitely
+
+    # Production pre-fork server (python run_app.py --prod / python -m app.server)
+    server_workers: int = 2
+    server_limit_concurrency: int = 64  # per worker; 0 = unlimited
+    server_graceful_timeout: int = 30
+    server_backlog: int = 2048
+    # Unix socket of a shared vector store process (python -m app.services.vector_service).
+    # The pre-fork server starts its own when unset; other multi-process setups need one
+    vector_store_address: Optional[str] = None
+    vector_store_authkey: Optional[str] = None
+    # Extracted text larger than this (bytes) is kept as a compressed blob outside the
+    # documents table; 0 keeps all content inline
+    content_blob_threshold: int = 0
+    # Large text columns (content, summary, analysis results) are stored compressed: zlib,
+    # zstd (needs the zstandard package) or none. Existing rows are rewritten by
+    # python -m app.utils.compress_columns
+    db_compression: str = "zlib"
+    db_compression_level: int = 6
+    db_compression_min_bytes: int = 256  # smaller values are kept as plain UTF-8
+    # Near-duplicate detection at upload: MinHash signatures over dedup_shingle_size-word
+    # shingles, cut into dedup_bands LSH bands. An upload estimated at least dedup_threshold
+    # similar to one of the owner's documents is marked as its duplicate; from
+    # dedup_reuse_similarity on, that document's classification and summary are reused
+    dedup_enabled: bool = True
+    dedup_shingle_size: int = 5
+    dedup_num_perm: int = 128
+    dedup_bands: int = 16
+    dedup_threshold: float = 0.8
+    dedup_reuse_similarity: float = 0.95  # above 1 never reuses
+    dedup_max_candidates: int = 50
+    # New versions (PUT /documents/{id}): when the text added or removed amounts to at most
+    # this fraction of the new text, the previous summary is refined with the added text
+    # instead of summarising the whole document again
+    version_incremental_ratio: float = 0.3
+    # "estimate" document counts stop scanning after this many rows
+    document_count_cap: int = 1000
+
+    # Connection pool (ignored for SQLite, which uses SQLAlchemy's default pooling)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+
+    # SQLite pragmas applied to every new connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 268435456  # 256 MB
+    sqlite_busy_timeout_ms: int = 5000
+
+    # Prometheus-style metrics at /metrics; disabling removes all instrumentation wrappers
+    metrics_enabled: bool = True
+
+    # Token for /api/admin endpoints (X-Admin-Token); unset disables them
+    admin_token: Optional[str] = None
+
+    # On-demand profiling (X-Profile header / admin arming) and slow-request logging
+    profiling_enabled: bool = False
+    # X-Profile-Token value; falls back to admin_token, and with neither set profiling is off
+    profiling_token: Optional[str] = None
+    profile_dir: str = "./profiles"
+    profile_max_files: int = 50
+    profile_sample_interval_ms: float = 5.0
+    slow_request_ms: float = 0.0  # 0 disables slow-request logging
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+
+settings = Settings()
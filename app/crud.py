@@ -1,6 +1,12 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+import base64
+import json
+from datetime import datetime
+from sqlalchemy.orm import Session, Query, defer
+from sqlalchemy import desc, and_, or_, func, case, literal
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from . import models, schemas
 from .auth import get_password_hash
 
@@ -21,10 +27,77 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     db.refresh(db_user)
     return db_user
 
-def get_documents(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[models.Document]:
-    return db.query(models.Document).filter(
-        models.Document.owner_id == user_id
-    ).order_by(desc(models.Document.created_at)).offset(skip).limit(limit).all()
+
+def encode_cursor(document: models.Document) -> str:
+    """Opaque keyset cursor pointing just after ``document`` in listing order."""
+    raw = f"{document.created_at.isoformat()}|{document.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of :func:`encode_cursor`; raises ValueError on malformed input."""
+    try:
+        created_at, _, doc_id = base64.urlsafe_b64decode(cursor.encode()).decode().rpartition("|")
+        return datetime.fromisoformat(created_at), int(doc_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _filtered_documents(db: Session, user_id: int, category: Optional[str] = None,
+                        mime_type: Optional[str] = None, created_after: Optional[datetime] = None,
+                        created_before: Optional[datetime] = None) -> Query:
+    query = db.query(models.Document).filter(models.Document.owner_id == user_id)
+    if category:
+        query = query.filter(models.Document.category == category)
+    if mime_type:
+        query = query.filter(models.Document.mime_type == mime_type)
+    if created_after:
+        query = query.filter(models.Document.created_at >= created_after)
+    if created_before:
+        query = query.filter(models.Document.created_at < created_before)
+    return query
+
+
+def get_documents(db: Session, user_id: int, skip: int = 0, limit: int = 100,
+                  cursor: Optional[str] = None, category: Optional[str] = None,
+                  mime_type: Optional[str] = None, created_after: Optional[datetime] = None,
+                  created_before: Optional[datetime] = None) -> List[models.Document]:
+    """List a user's documents newest first.
+
+    With ``cursor`` the page starts after the cursor's (created_at, id) position, which is
+    an index range scan regardless of depth; ``skip`` is kept for offset-based callers.
+    """
+    query = _filtered_documents(db, user_id, category, mime_type, created_after, created_before)
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            models.Document.created_at < created_at,
+            and_(models.Document.created_at == created_at, models.Document.id < doc_id),
+        ))
+    elif skip:
+        query = query.offset(skip)
+    # Large text columns are only loaded if a caller actually touches them
+    return query.options(
+        defer(models.Document.content),
+        defer(models.Document.summary),
+    ).order_by(
+        desc(models.Document.created_at), desc(models.Document.id)
+    ).limit(limit).all()
+
+
+def count_documents(db: Session, user_id: int, cap: Optional[int] = None,
+                    **filters) -> Tuple[int, bool]:
+    """Count matching documents; with ``cap`` stop after ``cap`` rows.
+
+    Returns ``(count, exact)`` where ``exact`` is False if the cap was reached.
+    """
+    query = _filtered_documents(db, user_id, **filters).with_entities(models.Document.id)
+    if cap is None:
+        return query.count(), True
+    # Counting a LIMITed subquery keeps the scan bounded on large accounts
+    bounded = query.limit(cap + 1).subquery()
+    count = db.query(func.count()).select_from(bounded).scalar() or 0
+    return min(count, cap), count <= cap
 
 def get_document(db: Session, document_id: int, user_id: int) -> Optional[models.Document]:
     return db.query(models.Document).filter(
@@ -34,38 +107,197 @@ def get_document(db: Session, document_id: int, user_id: int) -> Optional[models
 
 def create_document(db: Session, document: schemas.DocumentCreate, 
                    user_id: int, file_info: dict) -> models.Document:
+    # Before the insert, so a rollup created now is seeded without this document
+    stats = _locked_stats(db, user_id)
     db_document = models.Document(
         **document.dict(),
         **file_info,
         owner_id=user_id
     )
     db.add(db_document)
+    db.flush()
+    _apply_stats_delta(stats, _stats_snapshot(db_document), 1)
+    recent = json.loads(stats.recent_documents)
+    stats.recent_documents = json.dumps(
+        [_recent_entry(db_document)] + recent[:RECENT_DOCUMENTS - 1]
+    )
     db.commit()
     db.refresh(db_document)
     return db_document
 
 def update_document(db: Session, document_id: int, **kwargs) -> Optional[models.Document]:
+    document = db.query(models.Document).filter(
+        models.Document.id == document_id
+    ).first()
+    if document is None:
+        return None
+    before = _stats_snapshot(document)
+    stats = _locked_stats(db, document.owner_id)
     db.query(models.Document).filter(
         models.Document.id == document_id
     ).update(kwargs)
+    db.refresh(document)
+
+    _apply_stats_delta(stats, before, -1)
+    _apply_stats_delta(stats, _stats_snapshot(document), 1)
+    recent = json.loads(stats.recent_documents)
+    if any(entry["id"] == document_id for entry in recent):
+        stats.recent_documents = json.dumps([
+            _recent_entry(document) if entry["id"] == document_id else entry for entry in recent
+        ])
     db.commit()
     return db.query(models.Document).filter(
         models.Document.id == document_id
     ).first()
 
 def delete_document(db: Session, document_id: int, user_id: int) -> bool:
-    document = db.query(models.Document).filter(
-        models.Document.id == document_id,
-        models.Document.owner_id == user_id
-    ).first()
-    if document:
-        db.delete(document)
-        db.commit()
-        return True
-    return False
-
-def create_document_analysis(db: Session, document_id: int, 
-                           analysis_type: str, result: str, confidence: float) -> models.DocumentAnalysis:
+    return bool(delete_documents(db, user_id, [document_id]))
+
+
+def delete_documents(db: Session, user_id: int, document_ids: Optional[Iterable[int]] = None,
+                     batch_size: int = 500) -> List[int]:
+    """Delete a user's documents (all of them when ``document_ids`` is None); returns the ids.
+
+    Analyses and documents go with one set-based DELETE per batch of ids. In the same
+    transaction the owner's rollup is adjusted and a PendingDeletion is recorded for each
+    document's vectors and files, which live outside the database.
+    """
+    columns = db.query(
+        models.Document.id, models.Document.file_path, models.Document.content_blob,
+        models.Document.category, models.Document.processed_at, models.Document.chunk_count,
+    ).filter(models.Document.owner_id == user_id)
+    if document_ids is None:
+        rows = columns.all()
+    else:
+        ids = sorted(set(document_ids))
+        rows = [row for start in range(0, len(ids), batch_size)
+                for row in columns.filter(models.Document.id.in_(ids[start:start + batch_size]))]
+    if not rows:
+        return []
+
+    stats = _locked_stats(db, user_id)
+    _apply_stats_deltas(stats, [
+        (row.category, row.processed_at is not None, row.chunk_count or 0) for row in rows
+    ], -1)
+    deleted = [row.id for row in rows]
+    for start in range(0, len(deleted), batch_size):
+        batch = deleted[start:start + batch_size]
+        db.query(models.DocumentAnalysis).filter(
+            models.DocumentAnalysis.document_id.in_(batch)
+        ).delete(synchronize_session=False)
+        db.query(models.DocumentVersion).filter(
+            models.DocumentVersion.document_id.in_(batch)
+        ).delete(synchronize_session=False)
+        db.query(models.LSHBucket).filter(
+            models.LSHBucket.document_id.in_(batch)
+        ).delete(synchronize_session=False)
+        db.query(models.DocumentSignature).filter(
+            models.DocumentSignature.document_id.in_(batch)
+        ).delete(synchronize_session=False)
+        # Duplicates of a deleted original become originals themselves
+        db.query(models.Document).filter(
+            models.Document.duplicate_of_id.in_(batch)
+        ).update({"duplicate_of_id": None, "duplicate_similarity": None},
+                 synchronize_session=False)
+        db.query(models.Document).filter(
+            models.Document.id.in_(batch)
+        ).delete(synchronize_session=False)
+    db.add_all([
+        models.PendingDeletion(
+            document_id=row.id,
+            owner_id=user_id,
+            chunk_count=row.chunk_count or 0,
+            file_key=row.file_path,
+            content_blob=row.content_blob,
+        )
+        for row in rows
+    ])
+    removed = set(deleted)
+    if any(entry["id"] in removed for entry in json.loads(stats.recent_documents)):
+        stats.recent_documents = json.dumps(_recent_documents(db, user_id))
+    db.commit()
+    return deleted
+
+
+def get_document_versions(db: Session, document_id: int) -> List[models.DocumentVersion]:
+    return db.query(models.DocumentVersion).filter(
+        models.DocumentVersion.document_id == document_id
+    ).order_by(models.DocumentVersion.version).all()
+
+
+def create_document_version(db: Session, document: models.Document,
+                            changes: Optional[Dict[str, Any]] = None) -> models.DocumentVersion:
+    """Record ``document``'s current state as its version ``document.version``."""
+    db_version = models.DocumentVersion(
+        document_id=document.id,
+        version=document.version or 1,
+        original_filename=document.original_filename,
+        file_size=document.file_size,
+        mime_type=document.mime_type,
+        chunk_count=document.chunk_count or 0,
+        summary=document.summary,
+        changes=changes,
+    )
+    db.add(db_version)
+    db.commit()
+    db.refresh(db_version)
+    return db_version
+
+
+def get_lsh_candidates(db: Session, owner_id: int, buckets: List[int],
+                       exclude_id: Optional[int] = None,
+                       limit: int = 50) -> List[Tuple[int, Optional[int], bytes]]:
+    """(document id, duplicate_of_id, signature) of the owner's documents sharing a bucket."""
+    candidates = db.query(models.LSHBucket.document_id).filter(
+        models.LSHBucket.owner_id == owner_id,
+        models.LSHBucket.bucket.in_(buckets),
+    )
+    if exclude_id is not None:
+        candidates = candidates.filter(models.LSHBucket.document_id != exclude_id)
+    candidates = candidates.distinct().limit(limit)
+    return db.query(
+        models.DocumentSignature.document_id,
+        models.Document.duplicate_of_id,
+        models.DocumentSignature.signature,
+    ).join(
+        models.Document, models.Document.id == models.DocumentSignature.document_id
+    ).filter(models.DocumentSignature.document_id.in_(candidates)).all()
+
+
+def store_signature(db: Session, document_id: int, owner_id: int, signature: bytes,
+                    buckets: List[int]) -> None:
+    db.query(models.LSHBucket).filter(
+        models.LSHBucket.document_id == document_id
+    ).delete(synchronize_session=False)
+    db.merge(models.DocumentSignature(document_id=document_id, owner_id=owner_id,
+                                      signature=signature))
+    db.add_all([models.LSHBucket(owner_id=owner_id, bucket=bucket, document_id=document_id)
+                for bucket in buckets])
+    db.commit()
+
+
+def reassign_duplicates(db: Session, original_id: int, new_original_id: int) -> int:
+    """Point the duplicates of a document that became a duplicate itself at its original,
+    so groups stay one level deep."""
+    count = db.query(models.Document).filter(
+        models.Document.duplicate_of_id == original_id
+    ).update({"duplicate_of_id": new_original_id}, synchronize_session=False)
+    db.commit()
+    return count
+
+
+def get_duplicate_originals(db: Session, user_id: int,
+                            document_ids: Iterable[int]) -> Dict[int, int]:
+    """Map each of the user's documents to the original of its duplicate group (or itself)."""
+    rows = db.query(models.Document.id, models.Document.duplicate_of_id).filter(
+        models.Document.owner_id == user_id,
+        models.Document.id.in_(sorted(set(document_ids))),
+    )
+    return {row.id: row.duplicate_of_id or row.id for row in rows}
+
+
+def create_document_analysis(db: Session, document_id: int, analysis_type: str,
+                             result: Dict[str, Any], confidence: float) -> models.DocumentAnalysis:
     db_analysis = models.DocumentAnalysis(
         document_id=document_id,
         analysis_type=analysis_type,
@@ -75,4 +307,257 @@ def create_document_analysis(db: Session, document_id: int,
     db.add(db_analysis)
     db.commit()
     db.refresh(db_analysis)
-    return db_analysis
\ No newline at end of file
+    return db_analysis
+
+# Per-user dashboard rollups. Every document write above adjusts the owner's UserStats row
+# in the same transaction; rebuild_user_stats recomputes them from the documents table.
+
+
+RECENT_DOCUMENTS = 5
+
+
+def _stats_snapshot(document: models.Document) -> Tuple[Optional[str], bool, int]:
+    return document.category, document.processed_at is not None, document.chunk_count or 0
+
+
+def _recent_entry(document: models.Document) -> Dict[str, Any]:
+    return {
+        "id": document.id,
+        "filename": document.original_filename,
+        "category": document.category,
+        "created_at": document.created_at.isoformat() if document.created_at else None,
+    }
+
+
+def _recent_documents(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    documents = db.query(models.Document).options(
+        defer(models.Document.content),
+        defer(models.Document.summary),
+    ).filter(
+        models.Document.owner_id == user_id
+    ).order_by(
+        desc(models.Document.created_at), desc(models.Document.id)
+    ).limit(RECENT_DOCUMENTS).all()
+    return [_recent_entry(doc) for doc in documents]
+
+
+def _new_stats(user_id: int) -> models.UserStats:
+    return models.UserStats(
+        user_id=user_id,
+        total_documents=0,
+        processed_documents=0,
+        vector_chunks=0,
+        category_counts="{}",
+        recent_documents="[]",
+    )
+
+
+def _locked_stats(db: Session, user_id: int) -> models.UserStats:
+    """Fetch the user's rollup row for update, creating it if missing.
+
+    A missing row is seeded from the documents table, so callers must fetch it before
+    writing the document change they apply as a delta. Concurrent first writes both insert;
+    the loser's insert is ignored and it re-selects the winner's row.
+    """
+    query = db.query(models.UserStats).filter(
+        models.UserStats.user_id == user_id
+    ).with_for_update()
+    stats = query.first()
+    if stats is not None:
+        return stats
+    seed = _compute_user_stats(db, user_id)
+    values = {column.name: getattr(seed, column.name)
+              for column in models.UserStats.__table__.columns}
+    values["updated_at"] = datetime.utcnow()
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        db.execute(insert(models.UserStats).values(**values).on_conflict_do_nothing(
+            index_elements=["user_id"]
+        ))
+    else:
+        try:
+            with db.begin_nested():
+                db.add(models.UserStats(**values))
+        except IntegrityError:
+            pass
+    return query.one()
+
+
+def _apply_stats_delta(stats: models.UserStats, snapshot: Tuple[Optional[str], bool, int],
+                       sign: int) -> None:
+    _apply_stats_deltas(stats, [snapshot], sign)
+
+
+def _apply_stats_deltas(stats: models.UserStats,
+                        snapshots: List[Tuple[Optional[str], bool, int]], sign: int) -> None:
+    counts = json.loads(stats.category_counts)
+    for category, processed, chunks in snapshots:
+        stats.total_documents += sign
+        stats.processed_documents += sign if processed else 0
+        stats.vector_chunks += sign * chunks
+        # JSON object keys can't be null; uncategorized documents are counted under ""
+        key = category or ""
+        counts[key] = counts.get(key, 0) + sign
+        if counts[key] <= 0:
+            counts.pop(key)
+    stats.category_counts = json.dumps(counts)
+
+
+def _compute_user_stats(db: Session, user_id: int) -> models.UserStats:
+    """Build a (transient) rollup for ``user_id`` straight from the documents table."""
+    total, processed, chunks = db.query(
+        func.count(models.Document.id),
+        func.count(models.Document.processed_at),
+        func.coalesce(func.sum(models.Document.chunk_count), 0),
+    ).filter(models.Document.owner_id == user_id).one()
+    categories = db.query(
+        models.Document.category, func.count(models.Document.id)
+    ).filter(models.Document.owner_id == user_id).group_by(models.Document.category).all()
+
+    stats = _new_stats(user_id)
+    stats.total_documents = total
+    stats.processed_documents = processed
+    stats.vector_chunks = chunks
+    stats.category_counts = json.dumps({category or "": count for category, count in categories})
+    stats.recent_documents = json.dumps(_recent_documents(db, user_id))
+    return stats
+
+
+def get_user_stats(db: Session, user_id: int) -> models.UserStats:
+    """Return the user's rollup; computed on the fly if it hasn't been materialized yet."""
+    stats = db.get(models.UserStats, user_id)
+    return stats if stats is not None else _compute_user_stats(db, user_id)
+
+
+def rebuild_user_stats(db: Session, user_id: Optional[int] = None, batch_size: int = 100) -> int:
+    """Recompute rollups from scratch for one user or all users; returns users rebuilt."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [uid for (uid,) in db.query(models.User.id).order_by(models.User.id)]
+
+    for i, uid in enumerate(user_ids, start=1):
+        fresh = _compute_user_stats(db, uid)
+        stats = _locked_stats(db, uid)
+        stats.total_documents = fresh.total_documents
+        stats.processed_documents = fresh.processed_documents
+        stats.vector_chunks = fresh.vector_chunks
+        stats.category_counts = fresh.category_counts
+        stats.recent_documents = fresh.recent_documents
+        if i % batch_size == 0:
+            db.commit()
+    db.commit()
+    return len(user_ids)
+
+
+# Processing metrics
+
+PERCENTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+
+
+def record_processing_metrics(db: Session, document: models.Document,
+                              stages: Dict[str, float]) -> None:
+    """Store one ProcessingMetric row per stage duration (milliseconds)."""
+    db.add_all([
+        models.ProcessingMetric(
+            document_id=document.id,
+            owner_id=document.owner_id,
+            stage=stage,
+            duration_ms=duration_ms,
+            mime_type=document.mime_type,
+            file_size=document.file_size,
+        )
+        for stage, duration_ms in stages.items()
+    ])
+    db.commit()
+
+
+def _size_bucket(column):
+    return case(
+        (column < 100 * 1024, "<100KB"),
+        (column < 1024 * 1024, "100KB-1MB"),
+        (column < 10 * 1024 * 1024, "1MB-10MB"),
+        else_=">10MB",
+    )
+
+
+def _hour_bucket(db: Session, column):
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00", column)
+    return func.date_trunc("hour", column)
+
+
+def get_stage_latencies(db: Session, user_id: int, since: datetime,
+                        group_by: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per-stage latency percentiles and document counts since ``since``.
+
+    Percentiles use the nearest-rank method over ROW_NUMBER()/COUNT() windows, so the
+    whole aggregation is one pass over the (owner_id, created_at) index range.
+    ``group_by`` additionally splits each stage by ``"mime_type"`` or ``"size_bucket"``.
+    """
+    metric = models.ProcessingMetric
+    if group_by == "mime_type":
+        group_col = metric.mime_type
+    elif group_by == "size_bucket":
+        group_col = _size_bucket(metric.file_size)
+    else:
+        group_col = literal("all")
+    partition = [metric.stage, group_col]
+
+    ranked = db.query(
+        metric.stage.label("stage"),
+        group_col.label("group_key"),
+        metric.document_id.label("document_id"),
+        metric.duration_ms.label("duration_ms"),
+        func.row_number().over(partition_by=partition, order_by=metric.duration_ms).label("rn"),
+        func.count().over(partition_by=partition).label("n"),
+    ).filter(
+        metric.owner_id == user_id,
+        metric.created_at >= since,
+    ).subquery()
+
+    percentile_cols = [
+        func.min(case((ranked.c.rn >= fraction * ranked.c.n, ranked.c.duration_ms))).label(name)
+        for name, fraction in PERCENTILES
+    ]
+    rows = db.query(
+        ranked.c.stage,
+        ranked.c.group_key,
+        func.count(func.distinct(ranked.c.document_id)).label("documents"),
+        func.avg(ranked.c.duration_ms).label("mean"),
+        *percentile_cols,
+    ).group_by(
+        ranked.c.stage, ranked.c.group_key
+    ).order_by(ranked.c.stage, ranked.c.group_key).all()
+
+    return [
+        {
+            "stage": row.stage,
+            **({group_by: row.group_key} if group_by else {}),
+            "documents": row.documents,
+            "mean_ms": row.mean,
+            **{f"{name}_ms": getattr(row, name) for name, _ in PERCENTILES},
+        }
+        for row in rows
+    ]
+
+
+def get_hourly_throughput(db: Session, user_id: int, since: datetime,
+                          stage: str = "total") -> List[Dict[str, Any]]:
+    """Documents completing ``stage`` per hour since ``since``."""
+    metric = models.ProcessingMetric
+    hour = _hour_bucket(db, metric.created_at).label("hour")
+    rows = db.query(
+        hour,
+        func.count(func.distinct(metric.document_id)).label("documents"),
+        func.avg(metric.duration_ms).label("mean"),
+    ).filter(
+        metric.owner_id == user_id,
+        metric.created_at >= since,
+        metric.stage == stage,
+    ).group_by(hour).order_by(hour).all()
+    return [
+        {"hour": str(row.hour), "documents": row.documents, "mean_ms": row.mean}
+        for row in rows
+    ]
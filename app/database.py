@@ -1,10 +1,54 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+
+def _engine_kwargs(url: str) -> Dict[str, Any]:
+    """Build ``create_engine`` keyword arguments for the given database URL."""
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite connections are cheap and local; pool sizing and pre-ping don't apply
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _apply_sqlite_pragmas(target: Engine) -> None:
+    """Enable WAL journaling and relaxed fsync so readers don't block on writers."""
+
+    @event.listens_for(target, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        finally:
+            cursor.close()
+
+
+def create_db_engine(url: str) -> Engine:
+    """Create an engine tuned for the backend behind ``url``."""
+    db_engine = create_engine(url, **_engine_kwargs(url))
+    if db_engine.dialect.name == "sqlite":
+        _apply_sqlite_pragmas(db_engine)
+    return db_engine
+
+
+engine = create_db_engine(settings.database_url)
+read_engine = (
+    create_db_engine(settings.database_read_url) if settings.database_read_url else engine
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
 def get_db():
@@ -12,4 +56,13 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db():
+    """Session for read-only endpoints; routed to the replica when one is configured."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,113 @@
+"""Column types that keep large text and JSON values compressed in the database.
+
+Values are stored as bytes: a NUL byte and a codec tag followed by the compressed payload, or
+plain UTF-8 when compression wouldn't pay off. UTF-8 text never starts with NUL, so untagged
+values, including TEXT written before these types existed, read back unchanged.
+"""
+import ast
+import json
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from .config import settings
+
+
+def _zstd() -> Any:
+    import zstandard  # optional: pip install zstandard
+
+    return zstandard
+
+
+# name -> (tag, compress(data, level), decompress(data))
+CODECS: Dict[str, Tuple[bytes, Callable[[bytes, int], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (b"\x00z", zlib.compress, zlib.decompress),
+    "zstd": (
+        b"\x00s",
+        lambda data, level: _zstd().ZstdCompressor(level=level).compress(data),
+        lambda data: _zstd().ZstdDecompressor().decompress(data),
+    ),
+}
+_DECOMPRESSORS = {tag: decompress for tag, _, decompress in CODECS.values()}
+
+
+def compress_text(text: str, codec: Optional[str] = None) -> bytes:
+    """Encode ``text`` for storage with ``codec`` (default: settings.db_compression)."""
+    codec = codec or settings.db_compression
+    data = text.encode("utf-8")
+    if codec == "none" or len(data) < settings.db_compression_min_bytes:
+        return data
+    tag, compress, _ = CODECS[codec]
+    packed = tag + compress(data, settings.db_compression_level)
+    return packed if len(packed) < len(data) else data
+
+
+def decompress_text(value: Any) -> Optional[str]:
+    """Decode a stored value: tagged compressed bytes, plain UTF-8 or legacy TEXT."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    decompress = _DECOMPRESSORS.get(value[:2])
+    return (decompress(value[2:]) if decompress else value).decode("utf-8")
+
+
+def stored_codec(value: Any) -> str:
+    """Codec a stored value was written with: a CODECS name, "none" or "text" (legacy)."""
+    if isinstance(value, str):
+        return "text"
+    tag = bytes(value[:2])
+    return next((name for name, (t, _, _) in CODECS.items() if t == tag), "none")
+
+
+def dump_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def load_json(text: Optional[str]) -> Any:
+    """Parse a stored JSON object; rows written as ``str(dict)`` before JSON storage parse
+    too. Anything else (other legacy text, or a value that isn't an object) is returned as
+    ``{"raw": value}`` so readers still get an object."""
+    if text is None:
+        return None
+    try:
+        value = json.loads(text)
+    except ValueError:
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            value = text
+    return value if isinstance(value, dict) else {"raw": value}
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored compressed once it is larger than settings.db_compression_min_bytes."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    @property
+    def python_type(self) -> type:
+        return str
+
+    def process_bind_param(self, value: Optional[str], dialect: Any) -> Optional[bytes]:
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value: Any, dialect: Any) -> Optional[str]:
+        return decompress_text(value)
+
+
+class CompressedJSON(CompressedText):
+    """JSON value serialized compactly, then stored like :class:`CompressedText`."""
+
+    cache_ok = True
+
+    @property
+    def python_type(self) -> type:
+        return object
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Optional[bytes]:
+        return None if value is None else compress_text(dump_json(value))
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        return load_json(decompress_text(value))
@@ -0,0 +1,117 @@
+"""Process-wide service singletons, built lazily or during startup warm-up.
+
+Importing the API modules no longer constructs services (and therefore no longer imports
+torch, transformers or chromadb); endpoints receive them through ``Depends``.
+"""
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional
+
+from .config import settings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .services.ai_service import AIService
+    from .services.document_processor import DocumentProcessor
+    from .services.vector_store import VectorStore
+
+
+class ServiceRegistry:
+    """Builds each registered service once per process, thread-safely."""
+
+    def __init__(self) -> None:
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            if name not in self._instances:
+                try:
+                    self._instances[name] = self._factories[name]()
+                    self._errors.pop(name, None)
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+            return self._instances[name]
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> None:
+        """Build the given (default: all) services, recording failures instead of raising."""
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Error initializing {name}: {e}")
+
+    def status(self) -> Dict[str, str]:
+        return {
+            name: "ready" if name in self._instances
+            else f"failed: {self._errors[name]}" if name in self._errors
+            else "pending"
+            for name in self._factories
+        }
+
+    def is_ready(self) -> bool:
+        return all(name in self._instances for name in self._factories)
+
+    def close(self) -> None:
+        """Let built services release resources / flush buffers (shutdown)."""
+        for name, instance in list(self._instances.items()):
+            close = getattr(instance, "close", None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing {name}: {e}")
+
+    def reset(self) -> None:
+        """Drop built instances (tests)."""
+        self._instances.clear()
+        self._errors.clear()
+
+
+def _document_processor() -> "DocumentProcessor":
+    from .services.document_processor import DocumentProcessor
+
+    return DocumentProcessor()
+
+
+def _ai_service() -> "AIService":
+    from .services.ai_service import AIService
+
+    return AIService()
+
+
+def _vector_store() -> "VectorStore":
+    if settings.vector_store_address:
+        from .services.vector_service import connect
+
+        return connect(settings.vector_store_address)
+    from .services.vector_store import VectorStore
+
+    return VectorStore()
+
+
+services = ServiceRegistry()
+services.register("document_processor", _document_processor)
+services.register("ai_service", _ai_service)
+services.register("vector_store", _vector_store)
+
+
+def get_document_processor() -> "DocumentProcessor":
+    return services.get("document_processor")
+
+
+def get_ai_service() -> "AIService":
+    return services.get("ai_service")
+
+
+def get_vector_store() -> "VectorStore":
+    return services.get("vector_store")
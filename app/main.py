@@ -1,19 +1,39 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 import os
-from .database import engine
-from . import models
+import threading
+from .database import engine, read_engine
+from . import metrics, profiling
 from .api import auth, documents, analytics
+from .api import admin as admin_api
+from .api import profiling as profiling_api
 from .config import settings
+from .dependencies import services
+from .migrations import upgrade_schema
+from .services.inference import InferenceSaturated, inference_limiter
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Create missing tables and add columns/indexes introduced since the database was created
+upgrade_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models in the background so liveness probes answer immediately;
+    # /health/ready reports 503 until every service is built.
+    if settings.warm_up_on_startup:
+        threading.Thread(target=services.warm_up, name="intellidoc-warmup", daemon=True).start()
+    yield
+    # Flushes the vector store's write-behind buffer
+    services.close()
 
 app = FastAPI(
     title="IntelliDoc API",
     description="AI-Powered Document Intelligence Platform",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -25,6 +45,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.profiling_enabled or settings.slow_request_ms:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+if metrics.REGISTRY.enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.register_pool_gauges(engine)
+    if read_engine is not engine:
+        metrics.register_pool_gauges(read_engine, name="replica")
+
+
+@app.exception_handler(InferenceSaturated)
+async def inference_saturated_handler(request: Request, exc: InferenceSaturated) -> JSONResponse:
+    """429 when a model's queue is full, 503 when a request waited too long for a slot."""
+    return JSONResponse(
+        {"detail": f"Inference capacity for {exc.model} exhausted; retry later"},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # Mount static files if directory exists (avoid startup error)
 static_dir = os.path.join(os.getcwd(), "static")
 if os.path.isdir(static_dir):
@@ -34,6 +73,8 @@ if os.path.isdir(static_dir):
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(admin_api.router, prefix="/api/admin", tags=["admin"])
+app.include_router(profiling_api.router, prefix="/api/admin/profiling", tags=["profiling"])
 
 @app.get("/")
 def read_root() -> dict:
@@ -43,4 +84,29 @@ def read_root() -> dict:
 @app.get("/health")
 def health_check() -> dict:
     """Simple health check endpoint."""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/health/live")
+def liveness_check() -> dict:
+    """The process is up and serving requests (models may still be loading)."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def readiness_check() -> JSONResponse:
+    """Ready once all services (models, vector store) are built; 503 until then."""
+    ready = services.is_ready()
+    return JSONResponse(
+        {"status": "ready" if ready else "starting", "services": services.status(),
+         "inference": inference_limiter.state()},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus text exposition of the process metrics."""
+    if not metrics.REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,333 @@
+"""Minimal Prometheus-compatible metrics: counters, gauges and histograms.
+
+Instrumentation is decided at import/decoration time: with ``METRICS_ENABLED=0`` the
+``timed`` decorator returns the original function and the HTTP middleware is not
+installed, so disabled metrics cost nothing on the hot path.
+"""
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from .config import settings
+from .utils.timing import record_stage
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, **labels: Any):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def _exposed_name(self) -> str:
+        return self.name
+
+    def render(self) -> str:
+        name = self._exposed_name()
+        header = f"# HELP {name} {self.documentation}\n# TYPE {name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self._samples())
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _exposed_name(self) -> str:
+        return f"{self.name}_total"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self.labels(**labels).inc(amount)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in sorted(self._children.items()):
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_total{labels} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    """Gauge whose value is either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def set(self, value: float, **labels: Any) -> None:
+        self.labels(**labels).set(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self.labels(**labels).inc(amount)
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.labels(**labels).inc(-amount)
+
+    def _samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            try:
+                yield f"{self.name} {_format_value(self.callback())}"
+            except Exception:
+                pass
+            return
+        for key, child in sorted(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        self.labels(**labels).observe(value)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + [float("inf")], child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics: List[_Metric] = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry(enabled=settings.metrics_enabled)
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "intellidoc_http_requests", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "intellidoc_http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("intellidoc_http_requests_in_flight", "Requests being served")
+STAGE_LATENCY = REGISTRY.histogram(
+    "intellidoc_operation_duration_seconds",
+    "Latency of instrumented service operations",
+    ("component", "operation"),
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "intellidoc_operation_errors", "Exceptions raised by instrumented operations",
+    ("component", "operation"),
+)
+INFERENCE_WAITING = REGISTRY.gauge(
+    "intellidoc_inference_waiting", "Inference calls queued for a model slot", ("model",)
+)
+INFERENCE_REJECTED = REGISTRY.counter(
+    "intellidoc_inference_rejected", "Inference calls rejected by admission control",
+    ("model", "status"),
+)
+
+
+def timed(component: str, operation: str) -> Callable[[Callable], Callable]:
+    """Decorator recording the wrapped call's latency under (component, operation)."""
+
+    def decorator(func: Callable) -> Callable:
+        if not REGISTRY.enabled:
+            return func
+        latency = STAGE_LATENCY.labels(component=component, operation=operation)
+        errors = STAGE_ERRORS.labels(component=component, operation=operation)
+        stage_name = f"{component}.{operation}"
+
+        def observe(start: float) -> None:
+            elapsed = time.perf_counter() - start
+            latency.observe(elapsed)
+            record_stage(stage_name, elapsed * 1000)
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    observe(start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                observe(start)
+
+        return wrapper
+
+    return decorator
+
+
+def register_pool_gauges(engine: Any, name: str = "primary") -> None:
+    """Expose SQLAlchemy QueuePool usage for ``engine`` (no-op for pools without stats)."""
+    pool = engine.pool
+    if not REGISTRY.enabled or not hasattr(pool, "checkedout"):
+        return
+    REGISTRY.gauge(f"intellidoc_db_pool_{name}_checked_out", "DB connections in use",
+                   callback=pool.checkedout)
+    REGISTRY.gauge(f"intellidoc_db_pool_{name}_size", "DB pool size", callback=pool.size)
+    REGISTRY.gauge(f"intellidoc_db_pool_{name}_overflow", "DB pool overflow connections",
+                   callback=pool.overflow)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and observing latency per route template."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self._route_paths: Dict[Any, str] = {}
+
+    def _route_label(self, scope: Dict[str, Any]) -> str:
+        # The router stores the matched endpoint in the scope; map it back to its path template
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self._route_paths:
+            app = scope.get("app")
+            for route in getattr(app, "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    self._route_paths[endpoint] = route.path
+                    break
+            else:
+                self._route_paths[endpoint] = getattr(endpoint, "__name__", "unknown")
+        return self._route_paths[endpoint]
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = self._route_label(scope)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=scope["method"], route=route)
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status["code"])
@@ -0,0 +1,87 @@
+"""Idempotent schema upgrades, run at start-up.
+
+``create_all`` creates missing tables (with their indexes) but never alters existing ones.
+:func:`upgrade_schema` also adds the columns and indexes models gained after a database was
+created, and on PostgreSQL converts TEXT columns that are now stored compressed to BYTEA
+(SQLite stores either in any column). Every step checks the live schema first, so it runs
+on every start and is a no-op once the database is current.
+
+Usage: python -m app.migrations
+"""
+from typing import Any, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Dialect, Engine
+from sqlalchemy.schema import Column
+from sqlalchemy.types import LargeBinary
+
+from . import models  # noqa: F401  (registers the tables)
+from .database import Base
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _add_column_sql(table: str, column: Column, dialect: Dialect) -> str:
+    quote = dialect.identifier_preparer.quote
+    sql = (f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column.name)} "
+           f"{column.type.compile(dialect=dialect)}")
+    # Existing rows get the model's scalar default (e.g. chunk_count 0, version 1)
+    default = column.default
+    if default is not None and default.is_scalar:
+        sql += f" DEFAULT {_literal(default.arg)}"
+    elif not column.nullable and column.server_default is None:
+        raise RuntimeError(f"Cannot add NOT NULL column {table}.{column.name} without a default")
+    return sql
+
+
+def _stored_as_binary(column: Column) -> bool:
+    return isinstance(getattr(column.type, "impl", column.type), LargeBinary)
+
+
+def upgrade_connection(conn: Connection) -> List[str]:
+    """Bring the schema behind ``conn`` up to the models; returns the DDL executed."""
+    Base.metadata.create_all(bind=conn)
+    inspector = inspect(conn)
+    dialect = conn.dialect
+    quote = dialect.identifier_preparer.quote
+    executed: List[str] = []
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"]: c for c in inspector.get_columns(table.name)}
+        statements = []
+        for column in table.columns:
+            if column.name not in existing:
+                statements.append(_add_column_sql(table.name, column, dialect))
+            elif (dialect.name == "postgresql" and _stored_as_binary(column)
+                  and not isinstance(existing[column.name]["type"], LargeBinary)):
+                name = quote(column.name)
+                statements.append(f"ALTER TABLE {quote(table.name)} ALTER COLUMN {name} "
+                                  f"TYPE BYTEA USING convert_to({name}, 'UTF8')")
+        for sql in statements:
+            conn.execute(text(sql))
+        executed.extend(statements)
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(bind=conn)
+                executed.append(f"CREATE INDEX {index.name}")
+    return executed
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    with engine.begin() as conn:
+        executed = upgrade_connection(conn)
+    if executed:
+        print(f"Schema upgraded: {'; '.join(executed)}")
+    return executed
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    upgrade_schema(engine)
@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float
+from datetime import datetime
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String,
+    Text,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+from .db_types import CompressedJSON, CompressedText
 
 class User(Base):
     __tablename__ = "users"
@@ -13,6 +18,7 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     documents = relationship("Document", back_populates="owner")
+    stats = relationship("UserStats", uselist=False, cascade="all, delete-orphan")
 
 class Document(Base):
     __tablename__ = "documents"
@@ -23,26 +29,143 @@ class Document(Base):
     file_path = Column(String)
     file_size = Column(Integer)
     mime_type = Column(String)
-    content = Column(Text)
-    summary = Column(Text)
+    content = Column(CompressedText)
+    content_blob = Column(String)  # path of compressed content when stored out of row
+    page_breaks = Column(Text)  # JSON list of the offsets in content where PDF pages start
+    summary = Column(CompressedText)
     category = Column(String)
     confidence_score = Column(Float)
     language = Column(String)
+    chunk_count = Column(Integer, default=0)  # chunks indexed in the vector store
+    version = Column(Integer, default=1)  # incremented by each uploaded version
+    # Near-duplicate of this (original) document of the same owner, with estimated similarity
+    duplicate_of_id = Column(Integer, index=True)
+    duplicate_similarity = Column(Float)
     owner_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set client-side as well so keyset cursors compare against identical precision
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
     processed_at = Column(DateTime(timezone=True))
     
     owner = relationship("User", back_populates="documents")
     analyses = relationship("DocumentAnalysis", back_populates="document", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination: WHERE owner_id = ? AND (created_at, id) < (?, ?)
+        # ORDER BY created_at DESC, id DESC
+        Index("ix_documents_owner_created_id", "owner_id", "created_at", "id"),
+        Index("ix_documents_owner_category_created", "owner_id", "category", "created_at"),
+        Index("ix_documents_owner_mime_created", "owner_id", "mime_type", "created_at"),
+    )
+
+
 class DocumentAnalysis(Base):
     __tablename__ = "document_analyses"
     
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
     analysis_type = Column(String)  # classification, translation, etc.
-    result = Column(Text)
+    result = Column(CompressedJSON)  # JSON object
     confidence = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    document = relationship("Document", back_populates="analyses")
\ No newline at end of file
+    document = relationship("Document", back_populates="analyses")
+
+
+class DocumentVersion(Base):
+    """One uploaded version of a document, recorded once a document gets a second version.
+
+    The newest row describes the document's current state; older files are not kept.
+    """
+    __tablename__ = "document_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    original_filename = Column(String)
+    file_size = Column(Integer)
+    mime_type = Column(String)
+    chunk_count = Column(Integer, default=0)
+    summary = Column(CompressedText)
+    changes = Column(CompressedJSON)  # chunk diff against the previous version
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_document_versions_document_version", "document_id", "version", unique=True),
+    )
+
+
+class DocumentSignature(Base):
+    """MinHash signature of a document's extracted text (see services/dedup.py)."""
+    __tablename__ = "document_signatures"
+
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+    owner_id = Column(Integer, nullable=False)
+    signature = Column(LargeBinary, nullable=False)  # dedup_num_perm uint32 values
+
+
+class LSHBucket(Base):
+    """One LSH band of a signature; documents sharing a bucket are near-duplicate candidates."""
+    __tablename__ = "lsh_buckets"
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, nullable=False)
+    bucket = Column(BigInteger, nullable=False)  # hash of the band number and its values
+    document_id = Column(Integer, nullable=False, index=True)
+
+    __table_args__ = (
+        Index("ix_lsh_buckets_owner_bucket", "owner_id", "bucket"),
+    )
+
+
+class PendingDeletion(Base):
+    """Vectors and files of a deleted document that still have to be removed.
+
+    Written in the transaction that deletes the document row and dropped once both are gone,
+    so failures outside the database are retried by the deletion sweep.
+    """
+    __tablename__ = "pending_deletions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Not a foreign key: the document row is already gone (and SQLite may reuse its id)
+    document_id = Column(Integer, index=True)
+    owner_id = Column(Integer, index=True)
+    chunk_count = Column(Integer, default=0, nullable=False)
+    file_key = Column(String)
+    content_blob = Column(String)
+    vectors_removed = Column(Boolean, default=False, nullable=False)
+    files_removed = Column(Boolean, default=False, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+
+class UserStats(Base):
+    """Per-user dashboard rollup, maintained incrementally by the crud layer."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_documents = Column(Integer, default=0, nullable=False)
+    processed_documents = Column(Integer, default=0, nullable=False)
+    vector_chunks = Column(Integer, default=0, nullable=False)
+    category_counts = Column(Text, default="{}", nullable=False)  # JSON: {category: count}
+    recent_documents = Column(Text, default="[]", nullable=False)  # JSON: newest first
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ProcessingMetric(Base):
+    """Duration of one ingestion stage for one document."""
+    __tablename__ = "processing_metrics"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Not a foreign key: metrics outlive deleted documents for throughput history
+    document_id = Column(Integer, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    stage = Column(String, nullable=False)  # extraction, classification, summarization, ...
+    duration_ms = Column(Float, nullable=False)
+    mime_type = Column(String)
+    file_size = Column(Integer)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_processing_metrics_owner_created_stage", "owner_id", "created_at", "stage"),
+    )
@@ -0,0 +1,320 @@
+"""On-demand request profiling and slow-request logging.
+
+A request is profiled when it carries ``X-Profile: cprofile|sample`` (and the
+``X-Profile-Token`` when one is configured), or while the profiler is armed for the next N
+requests slower than a threshold. ``cprofile`` hooks the event-loop thread and, through
+:func:`profiled`, each threadpool call the request makes (sync endpoints are wrapped by
+:class:`ProfiledRoute`); the per-thread profiles are merged. ``sample`` periodically
+snapshots the stacks of the event-loop thread and of the threadpool threads working for
+the request. One profiler of each kind runs at a time; requests arriving meanwhile are not
+profiled. The middleware is only installed with profiling or slow-request logging enabled.
+"""
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Set
+from fastapi.routing import APIRoute
+from .config import settings
+from .utils.timing import StageTimer, reset_request_timer, set_request_timer
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+class SamplingProfiler:
+    """Collects folded stack samples at a fixed interval, of the threads in ``threads`` (a
+    set that may change while sampling) or of all threads."""
+
+    def __init__(self, interval_ms: float, threads: Optional[Set[int]] = None) -> None:
+        self.interval = max(interval_ms, 0.5) / 1000
+        self.threads = threads
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="intellidoc-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            threads = None if self.threads is None else self.threads.copy()
+            for thread_id, top in sys._current_frames().items():
+                if thread_id == own_id or (threads is not None and thread_id not in threads):
+                    continue
+                stack = []
+                frame: Optional[FrameType] = top
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """Collapsed-stack output, loadable by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """Writes profiles and their metadata to ``settings.profile_dir``."""
+
+    def __init__(self, directory: str, max_profiles: int) -> None:
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profile_id: str, mode: str, profiler: Any, meta: Dict[str, Any]) -> None:
+        """Store a profile: ``profiler`` is a ``pstats.Stats`` (cprofile) or a sampler."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if mode == "cprofile":
+            profiler.dump_stats(str(self.directory / f"{profile_id}.prof"))
+            report = io.StringIO()
+            profiler.stream = report
+            profiler.sort_stats("cumulative").print_stats(50)
+            (self.directory / f"{profile_id}.txt").write_text(report.getvalue())
+        else:
+            (self.directory / f"{profile_id}.folded").write_text(profiler.folded())
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(meta, default=str))
+        self._prune()
+
+    def _prune(self) -> None:
+        metas = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for meta_path in metas[: max(len(metas) - self.max_profiles, 0)]:
+            for path in self.directory.glob(f"{meta_path.stem}.*"):
+                path.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.directory.is_dir():
+            return []
+        metas = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [json.loads(path.read_text()) for path in metas]
+
+    def files(self, profile_id: str) -> List[Path]:
+        """Artifact files (excluding metadata) for ``profile_id``."""
+        if not all(c.isalnum() or c == "-" for c in profile_id):
+            return []
+        return sorted(p for p in self.directory.glob(f"{profile_id}.*") if p.suffix != ".json")
+
+
+class ProfilerArm:
+    """Profile the next ``remaining`` requests slower than ``threshold_ms``."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.remaining = 0
+        self.threshold_ms = 0.0
+        self.mode = "sample"
+
+    def arm(self, count: int, threshold_ms: float, mode: str) -> None:
+        with self._lock:
+            self.remaining = count
+            self.threshold_ms = threshold_ms
+            self.mode = mode
+
+    def disarm(self) -> None:
+        self.arm(0, 0.0, self.mode)
+
+    @property
+    def armed(self) -> bool:
+        return self.remaining > 0
+
+    def claim(self) -> bool:
+        """Consume one slot; returns False if another request took the last one."""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def state(self) -> Dict[str, Any]:
+        return {"remaining": self.remaining, "threshold_ms": self.threshold_ms, "mode": self.mode}
+
+
+profile_store = ProfileStore(settings.profile_dir, settings.profile_max_files)
+profiler_arm = ProfilerArm()
+
+
+def access_token() -> Optional[str]:
+    """Token required for profiling: PROFILING_TOKEN, else ADMIN_TOKEN; unset disables it."""
+    return settings.profiling_token or settings.admin_token
+
+
+def token_valid(token: Optional[str]) -> bool:
+    expected = access_token()
+    if not expected:
+        return False
+    return hmac.compare_digest((token or "").encode(), expected.encode())
+
+
+# Only one cProfile profiler can hook the event-loop thread at a time, and only one sampler
+# runs (each would otherwise walk every thread's stack on its own)
+_profiler_locks = {"cprofile": threading.Lock(), "sample": threading.Lock()}
+
+
+class RequestProfile:
+    """The threads working for the request being profiled, and their cProfile profilers."""
+
+    def __init__(self, mode: str) -> None:
+        self.mode = mode
+        self.threads: Set[int] = {threading.get_ident()}  # the event loop's
+        self.thread_profilers: List[cProfile.Profile] = []
+
+
+_request_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "intellidoc_request_profile", default=None
+)
+
+
+def profiled(func: Callable) -> Callable:
+    """Wrap ``func`` (run in the threadpool) so the current request's profile covers it:
+    cProfile only sees the thread that enabled it, the sampler only the request's threads."""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        profile = _request_profile.get()
+        ident = threading.get_ident()
+        if profile is None or ident in profile.threads:
+            return func(*args, **kwargs)
+        if profile.mode == "sample":
+            profile.threads.add(ident)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.threads.discard(ident)
+        if sys.getprofile() is not None:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profile.thread_profilers.append(profiler)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """API route whose sync endpoint (run in the threadpool) is wrapped with :func:`profiled`."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _start_profiler(mode: str) -> Any:
+    """Start profiling the current request; None while another profiler of the kind runs."""
+    if not _profiler_locks[mode].acquire(blocking=False):
+        return None
+    profile = RequestProfile(mode)
+    _request_profile.set(profile)
+    profiler: Any
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = SamplingProfiler(settings.profile_sample_interval_ms, profile.threads)
+        profiler.start()
+    return profiler
+
+
+def _stop_profiler(mode: str, profiler: Any) -> Any:
+    """Stop ``profiler``; returns what :meth:`ProfileStore.save` stores."""
+    profile = _request_profile.get()
+    _request_profile.set(None)
+    if mode == "cprofile":
+        profiler.disable()
+        result = pstats.Stats(profiler, *(profile.thread_profilers if profile else []))
+    else:
+        profiler.stop()
+        result = profiler
+    _profiler_locks[mode].release()
+    return result
+
+
+class ProfilingMiddleware:
+    """ASGI middleware collecting per-request stage breakdowns and optional profiles."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    def _requested_mode(self, scope: Dict[str, Any]) -> Optional[str]:
+        if not settings.profiling_enabled:
+            return None
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        requested = headers.get("x-profile")
+        if requested is None:
+            return None
+        if not token_valid(headers.get("x-profile-token")):
+            return None
+        return requested if requested in PROFILE_MODES else "cprofile"
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        explicit_mode = self._requested_mode(scope)
+        mode = explicit_mode or (profiler_arm.mode if profiler_arm.armed else None)
+        profile_id = str(uuid.uuid4())
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if explicit_mode and profiler is not None and message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        timer = StageTimer()
+        token = set_request_timer(timer)
+        profiler = _start_profiler(mode) if mode else None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if mode is not None and profiler is not None:
+                profiler = _stop_profiler(mode, profiler)
+            reset_request_timer(token)
+            elapsed_ms = timer.total_ms()
+            meta = {
+                "id": profile_id if mode else None,
+                "mode": mode,
+                "method": scope["method"],
+                "path": scope["path"],
+                "elapsed_ms": round(elapsed_ms, 2),
+                "stages_ms": {name: round(ms, 2) for name, ms in timer.stages.items()},
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            if mode is not None and profiler is not None and (
+                explicit_mode
+                or (elapsed_ms >= profiler_arm.threshold_ms and profiler_arm.claim())
+            ):
+                try:
+                    profile_store.save(profile_id, mode, profiler, meta)
+                except Exception as e:
+                    print(f"Error saving profile: {e}")
+            if settings.slow_request_ms and elapsed_ms >= settings.slow_request_ms:
+                breakdown = ", ".join(
+                    f"{name}={ms:.1f}ms"
+                    for name, ms in sorted(timer.stages.items(), key=lambda kv: -kv[1])
+                )
+                print(
+                    f"Slow request {scope['method']} {scope['path']}: "
+                    f"{elapsed_ms:.1f}ms ({breakdown or 'no stages recorded'})"
+                )
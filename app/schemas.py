@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -32,21 +32,76 @@ class Document(DocumentBase):
     summary: Optional[str] = None
     confidence_score: Optional[float] = None
     language: Optional[str] = None
+    duplicate_of_id: Optional[int] = None
+    duplicate_similarity: Optional[float] = None
+    version: Optional[int] = 1
     created_at: datetime
     processed_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+
+class DocumentListItem(DocumentBase):
+    """Listing projection without the large text columns."""
+    id: int
+    filename: str
+    file_size: int
+    mime_type: str
+    confidence_score: Optional[float] = None
+    language: Optional[str] = None
+    duplicate_of_id: Optional[int] = None
+    duplicate_similarity: Optional[float] = None
+    created_at: datetime
+    processed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DocumentVersion(BaseModel):
+    version: int
+    original_filename: Optional[str] = None
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
+    chunk_count: Optional[int] = None
+    summary: Optional[str] = None
+    # mode (unchanged, incremental or full), chunks, changed, embedded, reused, removed;
+    # indexed is False when the version's chunks could not be written
+    changes: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class DocumentQuery(BaseModel):
     query: str
     document_ids: Optional[List[int]] = None
 
 class DocumentAnalysisResult(BaseModel):
     analysis_type: str
-    result: str
+    result: Dict[str, Any]
     confidence: float
 
+
+class DocumentTranslation(BaseModel):
+    target_language: str  # ISO 639-1, e.g. "de"
+    # Detected from the text (or the document's language) when omitted
+    source_language: Optional[str] = None
+
+
+class TextTranslation(DocumentTranslation):
+    text: str
+
+
 class DocumentSearch(BaseModel):
     query: str
-    limit: Optional[int] = 10
\ No newline at end of file
+    limit: Optional[int] = 10
+    # Keep only the best-ranked document of each near-duplicate group
+    collapse_duplicates: bool = True
+
+
+class AdminSearch(DocumentSearch):
+    # Restrict the cross-tenant search to these owners; all partitions when omitted
+    user_ids: Optional[List[int]] = None
@@ -0,0 +1,266 @@
+"""Pre-fork production server.
+
+The parent process imports the app and loads the models once, then forks the workers.
+Model weights are shared copy-on-write between workers, so N workers cost roughly one copy
+of the models instead of N. ``gc.freeze()`` moves the preloaded objects out of the
+collector's generations so garbage collection in the workers doesn't write to (and thereby
+copy) their pages.
+
+The vector store is not shared that way: its index and write buffer would diverge between
+workers. Unless VECTOR_STORE_ADDRESS points at one, the parent first forks a vector store
+process (see :mod:`app.services.vector_service`) that every worker talks to, and restarts it
+if it exits.
+
+Signals sent to the parent:
+    SIGTERM / SIGINT  graceful shutdown (workers finish in-flight requests)
+    SIGHUP            rolling restart, one worker at a time
+Workers that exit unexpectedly are replaced.
+"""
+import gc
+import os
+import secrets
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from .config import settings
+
+# Built in the parent and shared copy-on-write; the vector store lives in its own process
+PRELOADED_SERVICES = ("document_processor", "ai_service")
+
+
+def _bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    def __init__(self, host: str = "0.0.0.0", port: int = 8000, workers: Optional[int] = None,
+                 limit_concurrency: Optional[int] = None, graceful_timeout: Optional[int] = None,
+                 backlog: Optional[int] = None, preload: bool = True) -> None:
+        self.host = host
+        self.port = port
+        self.workers = workers or settings.server_workers
+        self.limit_concurrency = limit_concurrency or settings.server_limit_concurrency or None
+        self.graceful_timeout = graceful_timeout or settings.server_graceful_timeout
+        self.backlog = backlog or settings.server_backlog
+        self.preload = preload
+        self.children: Dict[int, int] = {}  # pid -> worker slot
+        self.vector_pid: Optional[int] = None
+        self._vector_dir: Optional[tempfile.TemporaryDirectory] = None
+        self._stopping = False
+        self._reload_requested = False
+
+    # -- parent -------------------------------------------------------------------------
+
+    def _load_app(self):
+        from .main import app
+        from .dependencies import services
+
+        if self.preload:
+            services.warm_up(PRELOADED_SERVICES)
+            print(f"Preloaded services: {services.status()}")
+        # Objects created so far are shared with the workers; keep GC from touching them
+        gc.collect()
+        gc.freeze()
+        return app
+
+    def run(self) -> None:
+        if not settings.vector_store_address:
+            # Set before forking, so the workers connect to the process started here
+            self._vector_dir = tempfile.TemporaryDirectory(prefix="intellidoc-vectors-")
+            settings.vector_store_address = os.path.join(self._vector_dir.name, "vectors.sock")
+            settings.vector_store_authkey = secrets.token_hex(16)
+            self._spawn_vector_store(settings.vector_store_address)
+        self.app = self._load_app()
+        self.sock = _bind_socket(self.host, self.port, self.backlog)
+        print(f"Serving on {self.host}:{self.port} with {self.workers} workers (pid {os.getpid()})")
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+        try:
+            self._supervise()
+        finally:
+            self.sock.close()
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame) -> None:
+        self._reload_requested = True
+
+    def _spawn_vector_store(self, address: str) -> int:
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            from .services.vector_service import serve
+
+            try:
+                serve(address)
+            finally:
+                os._exit(0)
+        self.vector_pid = pid
+        return pid
+
+    def _spawn(self, slot: int) -> int:
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            self._run_worker(slot)
+            os._exit(0)
+        self.children[pid] = slot
+        return pid
+
+    def _reap(self) -> List[int]:
+        """Collect exited workers; returns their slots."""
+        slots = []
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid == self.vector_pid:
+                self.vector_pid = None
+            slot = self.children.pop(pid, None)
+            if slot is not None:
+                slots.append(slot)
+        return slots
+
+    def _supervise(self) -> None:
+        while not self._stopping:
+            for slot in self._reap():
+                if not self._stopping:
+                    print(f"Worker {slot} exited; restarting")
+                    self._spawn(slot)
+            if (self.vector_pid is None and settings.vector_store_address
+                    and self._vector_dir is not None and not self._stopping):
+                # A memory-backend index is lost with the process; chroma data is on disk
+                print("Vector store process exited; restarting")
+                self._spawn_vector_store(settings.vector_store_address)
+            if self._reload_requested:
+                self._reload_requested = False
+                self._rolling_restart()
+            time.sleep(0.2)
+        self._shutdown()
+
+    def _stop_worker(self, pid: int) -> None:
+        """SIGTERM one worker and wait for it, escalating to SIGKILL after the timeout."""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if done:
+                return
+            time.sleep(0.1)
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+
+    def _rolling_restart(self) -> None:
+        print("Rolling restart of workers")
+        for pid, slot in list(self.children.items()):
+            # Start the replacement first so capacity never drops by more than one worker
+            self._spawn(slot)
+            self.children.pop(pid, None)
+            self._stop_worker(pid)
+
+    def _shutdown(self) -> None:
+        print("Shutting down workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.children.clear()
+        if self.vector_pid is not None:
+            # Last, so it can flush writes the workers made while shutting down
+            self._stop_worker(self.vector_pid)
+            self.vector_pid = None
+
+    # -- worker -------------------------------------------------------------------------
+
+    def _run_worker(self, slot: int) -> None:  # pragma: no cover - runs in the child
+        import uvicorn
+
+        from .database import engine, read_engine
+
+        # Connections the parent opened while preloading must not be shared across processes:
+        # drop them from this worker's pools without closing them (the parent still owns them)
+        engine.dispose(close=False)
+        if read_engine is not engine:
+            read_engine.dispose(close=False)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        # Connect to the shared vector store (waiting for it to start) before taking requests
+        from .dependencies import services
+
+        services.warm_up(["vector_store"])
+        config = uvicorn.Config(
+            self.app,
+            limit_concurrency=self.limit_concurrency,
+            timeout_graceful_shutdown=self.graceful_timeout,
+            backlog=self.backlog,
+            log_level="info",
+        )
+        server = uvicorn.Server(config)
+        # uvicorn installs its own SIGTERM/SIGINT handlers for graceful shutdown
+        server.run(sockets=[self.sock])
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: Optional[int] = None,
+          limit_concurrency: Optional[int] = None, preload: bool = True) -> None:
+    """Run the production server; falls back to uvicorn's own workers where fork is missing."""
+    if not hasattr(os, "fork"):
+        import uvicorn
+
+        if (workers or settings.server_workers) > 1 and not settings.vector_store_address:
+            raise SystemExit("Several workers without os.fork need a shared vector store: "
+                             "run python -m app.services.vector_service and set "
+                             "VECTOR_STORE_ADDRESS")
+        print("os.fork unavailable; models will be loaded once per worker")
+        uvicorn.run("app.main:app", host=host, port=port,
+                    workers=workers or settings.server_workers,
+                    limit_concurrency=(limit_concurrency or settings.server_limit_concurrency
+                                       or None))
+        return
+    PreforkServer(host, port, workers, limit_concurrency, preload=preload).run()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="IntelliDoc pre-fork API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--limit-concurrency", type=int, default=None,
+                        help="Max concurrent connections per worker before 503s")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Load models in each worker instead of the parent")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.limit_concurrency, preload=not args.no_preload)
+    sys.exit(0)
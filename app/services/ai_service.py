@@ -1,16 +1,34 @@
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+import numpy as np
 from ..config import settings
+from ..metrics import timed
+from .inference import InferenceSaturated, inference_limiter
+from .language import UNDETERMINED
+from .translation import TranslationService
+
+MODEL_NAMES = {
+    "classifier": "distilbert-base-uncased-finetuned-sst-2-english",
+    "qa": "deepset/roberta-base-squad2",
+    "summarizer": "facebook/bart-large-cnn",
+    "embedder": "all-MiniLM-L6-v2",
+    # Same 384 dimensions as the English embedder; used for languages routed to it
+    "multilingual_embedder": "paraphrase-multilingual-MiniLM-L12-v2",
+}
+DEFAULT_EMBEDDER = "embedder"
+
+
+def routed_embedders() -> List[str]:
+    """Embedders chunks can be routed to under the current settings."""
+    if not settings.language_detection:
+        return [DEFAULT_EMBEDDER]
+    return sorted({DEFAULT_EMBEDDER, settings.embedding_default_route,
+                   *settings.embedding_routes.values()})
 
 class AIService:
     def __init__(self) -> None:
-        # Determine device if torch is available, else default to CPU
-        try:
-            import torch  # type: ignore
-
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        except Exception:
-            self.device = "cpu"
+        # torch is only imported (and the device detected) when models are actually loaded
+        self.device = "cpu"
         self.models: Dict[str, Any] = {}
         self.use_api: bool = False
         # Allow tests and constrained environments to skip heavyweight model init
@@ -19,38 +37,30 @@ class AIService:
             self.setup_models()
         else:
             self.use_api = True
-        
+        # Translation models are per language pair and only loaded when a pair is requested
+        self.translator = TranslationService(enabled=not fast_init, device=self.device)
+
+    @timed("ai_service", "setup_models")
     def setup_models(self) -> None:
         """Initialize local AI models. Falls back to API-backed stubs on failure."""
         try:
-            from transformers import pipeline  # type: ignore
-            from sentence_transformers import SentenceTransformer  # type: ignore
-            import torch  # type: ignore
+            import torch
+            from .inference import MODEL_LOADERS, configure_torch_threads, intra_op_threads
+
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            configure_torch_threads()
+
+            # Classification, question answering, summarization and sentence embeddings;
+            # each on the backend configured for it in Settings
+            embedders = routed_embedders()
+            for name, model_name in MODEL_NAMES.items():
+                if name.endswith("embedder") and name not in embedders:
+                    continue
+                backend = getattr(settings, f"{name}_backend")
+                self.models[name] = MODEL_LOADERS[name](
+                    model_name, backend, self.device, intra_op_threads(name)
+                )
 
-            # Text classification
-            self.models['classifier'] = pipeline(
-                "text-classification",
-                model="distilbert-base-uncased-finetuned-sst-2-english",
-                device=0 if self.device == "cuda" else -1
-            )
-            
-            # Question answering
-            self.models['qa'] = pipeline(
-                "question-answering",
-                model="deepset/roberta-base-squad2",
-                device=0 if self.device == "cuda" else -1
-            )
-            
-            # Summarization
-            self.models['summarizer'] = pipeline(
-                "summarization",
-                model="facebook/bart-large-cnn",
-                device=0 if self.device == "cuda" else -1
-            )
-            
-            # Sentence embeddings
-            self.models['embedder'] = SentenceTransformer('all-MiniLM-L6-v2')
-            
             # Translation
             # Translator is optional; only initialize when API key/model available
             
@@ -59,6 +69,7 @@ class AIService:
             # Fallback to API-based models
             self.use_api = True
     
+    @timed("ai_service", "classify_document")
     def classify_document(self, text: str) -> Dict[str, Any]:
         """Classify document into categories using simple keyword heuristics."""
         try:
@@ -103,11 +114,13 @@ class AIService:
                 "error": str(e)
             }
     
+    @timed("ai_service", "answer_question")
     def answer_question(self, question: str, context: str) -> Dict[str, Any]:
         """Answer questions about document content using a QA model or fallback heuristic."""
         try:
             if 'qa' in self.models:
-                result = self.models['qa'](question=question, context=context)
+                with inference_limiter.slot('qa'):
+                    result = self.models['qa'](question=question, context=context)
                 return {
                     "answer": result['answer'],
                     "confidence": result['score'],
@@ -139,6 +152,8 @@ class AIService:
                     "end": len(best_sentence)
                 }
                 
+        except InferenceSaturated:
+            raise
         except Exception as e:
             return {
                 "answer": "Unable to answer question",
@@ -146,6 +161,7 @@ class AIService:
                 "error": str(e)
             }
     
+    @timed("ai_service", "summarize_text")
     def summarize_text(self, text: str, max_length: int = 150) -> Dict[str, Any]:
         """Generate text summary via abstractive model or simple extractive fallback."""
         try:
@@ -156,12 +172,13 @@ class AIService:
                 }
             
             if 'summarizer' in self.models:
-                result = self.models['summarizer'](
-                    text, 
-                    max_length=max_length, 
-                    min_length=30,
-                    do_sample=False
-                )
+                with inference_limiter.slot('summarizer'):
+                    result = self.models['summarizer'](
+                        text,
+                        max_length=max_length,
+                        min_length=30,
+                        do_sample=False
+                    )
                 return {
                     "summary": result[0]['summary_text'],
                     "confidence": 0.8
@@ -182,6 +199,8 @@ class AIService:
                     "confidence": 0.6
                 }
                 
+        except InferenceSaturated:
+            raise
         except Exception as e:
             return {
                 "summary": text[:200] + "..." if len(text) > 200 else text,
@@ -189,43 +208,88 @@ class AIService:
                 "error": str(e)
             }
     
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for texts."""
+    @timed("ai_service", "get_embeddings")
+    def get_embeddings(self, texts: List[str], model: str = DEFAULT_EMBEDDER) -> np.ndarray:
+        """Generate embeddings for texts as a float32 array with one row per text."""
         try:
-            if 'embedder' in self.models:
-                embeddings = self.models['embedder'].encode(texts)
-                return embeddings.tolist()
+            if model in self.models:
+                with inference_limiter.slot(model):
+                    embeddings = self.models[model].encode(texts)
+                return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
             else:
-                # Fallback: simple hash-based embeddings
+                # Fallback: simple hash-based embeddings (not semantic), one bit of the
+                # MD5 digest per dimension, least significant bit first
                 import hashlib
-                embeddings = []
-                for text in texts:
-                    # Simple hash-based embedding (not semantic)
-                    hash_obj = hashlib.md5(text.encode())
-                    hash_int = int(hash_obj.hexdigest(), 16)
-                    # Convert to fixed-size vector
-                    embedding = [(hash_int >> i) & 1 for i in range(128)]
-                    embeddings.append(embedding)
-                return embeddings
+                digests = b"".join(hashlib.md5(text.encode()).digest()[::-1] for text in texts)
+                bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8), bitorder="little")
+                return bits.reshape(len(texts), 128).astype(np.float32)
+        except InferenceSaturated:
+            raise
         except Exception as e:
             print(f"Error generating embeddings: {e}")
-            return [[0.0] * 128 for _ in texts]
-    
-    def translate_text(self, text: str, target_lang: str = "es") -> Dict[str, Any]:
-        """Translate text to target language. Optional; falls back to passthrough."""
+            return np.zeros((len(texts), 128), dtype=np.float32)
+
+    def embedder_for(self, language: str) -> str:
+        """Embedder that chunks in ``language`` are routed to."""
+        if not settings.language_detection:
+            return DEFAULT_EMBEDDER
+        model = settings.embedding_routes.get(language, settings.embedding_default_route)
+        if model not in self.models and DEFAULT_EMBEDDER in self.models:
+            # Keep vectors in one space if the routed model failed to load
+            return DEFAULT_EMBEDDER
+        return model
+
+    def embed_by_language(self, texts: Sequence[str],
+                          languages: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+        """Embed each text with the embedder for its language, one batch per embedder.
+
+        Returns the vectors (in input order) and the embedder used for each text.
+        """
+        models = [self.embedder_for(language) for language in languages]
+        batches: Dict[str, List[int]] = {}
+        for position, model in enumerate(models):
+            batches.setdefault(model, []).append(position)
+        vectors = None
+        for model, positions in batches.items():
+            embedded = self.get_embeddings([texts[p] for p in positions], model=model)
+            if vectors is None:
+                vectors = np.empty((len(texts), embedded.shape[1]), dtype=np.float32)
+            vectors[positions] = embedded
+        if vectors is None:
+            vectors = np.empty((0, 0), dtype=np.float32)
+        return vectors, models
+
+    def embed_query(self, query: str) -> Dict[str, np.ndarray]:
+        """The query embedded by every routed embedder, to search each embedding space."""
+        # The default embedder is always searched: chunks indexed before routing used it
+        models = {DEFAULT_EMBEDDER}
+        if settings.language_detection:
+            languages = [*settings.embedding_routes, UNDETERMINED]  # und: the default route
+            models |= {self.embedder_for(language) for language in languages}
+        return {model: self.get_embeddings([query], model=model)[0] for model in sorted(models)}
+
+    @timed("ai_service", "translate_text")
+    def translate_text(self, text: str, target_lang: str = "es", source_lang: Optional[str] = None,
+                       on_segment: Optional[Callable[[Dict[str, Any]], None]] = None
+                       ) -> Dict[str, Any]:
+        """Translate text sentence by sentence (see TranslationService.translate).
+
+        Falls back to passthrough when there is no model for the language pair, the source
+        language can't be detected or a batch fails; ``note`` says which.
+        """
         try:
-            if 'translator' in self.models and target_lang == "es":
-                result = self.models['translator'](text)
-                return {
-                    "translated_text": result[0]['translation_text'],
-                    "confidence": 0.8,
-                    "target_language": target_lang,
-                }
-            return {
-                "translated_text": text,
-                "confidence": 0.5,
-                "target_language": "en",
-                "note": "Translation not available for this language",
-            }
+            result = self.translator.translate(text, target_lang, source_lang, on_segment)
+            if result["source_language"] == UNDETERMINED:
+                result["note"] = ("Source language could not be detected; "
+                                  "pass source_language to translate this text")
+            elif result["failed"]:
+                result["note"] = (f"{result['failed']} of {result['sentences']} sentences "
+                                  "could not be translated and were left as is")
+            elif not result["available"]:
+                result["note"] = "Translation not available for this language pair"
+            result["confidence"] = 0.8 if result["available"] else 0.5
+            return result
+        except InferenceSaturated:
+            raise
         except Exception as e:
-            return {"translated_text": text, "confidence": 0.0, "error": str(e)}
\ No newline at end of file
+            return {"translated_text": text, "confidence": 0.0, "error": str(e)}
@@ -0,0 +1,49 @@
+import os
+import zlib
+from pathlib import Path
+from typing import Optional
+from ..config import settings
+
+
+class ContentStore:
+    """Keeps large extracted document text as zlib-compressed blobs on disk."""
+
+    def __init__(self) -> None:
+        self.blob_dir = Path(settings.upload_dir) / "content"
+        self.threshold = settings.content_blob_threshold
+
+    def should_offload(self, text: str) -> bool:
+        """Return True if ``text`` is large enough to be stored out of row."""
+        return self.threshold > 0 and len(text.encode("utf-8")) > self.threshold
+
+    def put(self, key: str, text: str) -> str:
+        """Compress and write ``text``; returns the blob path."""
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        blob_path = self.blob_dir / f"{Path(key).stem}.txt.z"
+        tmp_path = blob_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(text.encode("utf-8"), 6))
+        os.replace(tmp_path, blob_path)
+        return str(blob_path)
+
+    def get(self, blob_path: str) -> str:
+        """Read and decompress a blob written by :meth:`put`."""
+        with open(blob_path, "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def delete(self, blob_path: Optional[str]) -> None:
+        if blob_path:
+            try:
+                os.remove(blob_path)
+            except FileNotFoundError:
+                pass
+
+    def load_text(self, document) -> Optional[str]:
+        """Return a document's full text, whether stored inline or as a blob."""
+        if document.content_blob:
+            try:
+                return self.get(document.content_blob)
+            except Exception as e:
+                print(f"Error reading content blob: {e}")
+                return None
+        return document.content
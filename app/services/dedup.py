@@ -0,0 +1,156 @@
+"""Near-duplicate detection with MinHash signatures and an LSH index in the database.
+
+A document's extracted text is reduced to the set of its word shingles (``k`` consecutive
+normalised words, hashed to 32 bits), and that set to a MinHash signature of
+``settings.dedup_num_perm`` values: the fraction of positions two signatures agree on
+estimates the Jaccard similarity of their shingle sets. Signatures are cut into
+``settings.dedup_bands`` bands; each band's hash is stored in ``lsh_buckets``, so documents
+sharing any bucket are found with one indexed ``IN`` query and only those candidates are
+compared.
+"""
+import hashlib
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .. import crud, models
+from ..config import settings
+from ..metrics import timed
+
+_WORD = re.compile(r"\w+")
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32: values fit uint32
+_BLOCK = 4096  # shingles hashed per permutation block (bounds the temporary matrix)
+
+
+def shingle_hashes(text: str, k: int = 5) -> np.ndarray:
+    """Distinct 32-bit hashes of the text's ``k``-word shingles (the text if shorter)."""
+    tokens = _WORD.findall(text.lower())
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    words = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64,
+                        count=len(tokens))
+    k = min(k, len(words))
+    count = len(words) - k + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(k):
+        # Polynomial rolling combination; uint64 wraps, the low 32 bits are kept
+        shingles = shingles * np.uint64(1000003) + words[offset:offset + count]
+    return np.unique(shingles & np.uint64(0xFFFFFFFF))
+
+
+class MinHasher:
+    """MinHash over ``num_perm`` universal hash functions ``(a * x + b) mod p``."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint64)
+        for start in range(0, len(shingles), _BLOCK):
+            block = shingles[None, start:start + _BLOCK]
+            # a, x < 2**32, so a * x + b cannot overflow uint64
+            hashed = (self._a * block + self._b) % _PRIME
+            signature = np.minimum(signature, hashed.min(axis=1))
+        return signature.astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def band_buckets(signature: np.ndarray, bands: int) -> List[int]:
+    """One signed 64-bit bucket per band (band number included, so bands never collide)."""
+    rows = len(signature) // bands
+    return [
+        int.from_bytes(hashlib.blake2b(
+            bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8
+        ).digest(), "big", signed=True)
+        for band in range(bands)
+    ]
+
+
+_hasher: Optional[MinHasher] = None
+
+
+def get_hasher() -> MinHasher:
+    global _hasher
+    if _hasher is None or _hasher.num_perm != settings.dedup_num_perm:
+        _hasher = MinHasher(settings.dedup_num_perm)
+    return _hasher
+
+
+def text_signature(text: str) -> np.ndarray:
+    return get_hasher().signature(shingle_hashes(text, settings.dedup_shingle_size))
+
+
+@timed("dedup", "find_duplicate")
+def find_duplicate(db: Session, owner_id: int, signature: np.ndarray,
+                   exclude_id: Optional[int] = None) -> Optional[Tuple[int, float]]:
+    """The owner's most similar indexed document at or above ``settings.dedup_threshold``.
+
+    Returns ``(document_id, similarity)``; the id is the original of a duplicate group.
+    Duplicates of ``exclude_id`` (the document being re-indexed) are not candidates: their
+    original would be the document itself.
+    """
+    buckets = band_buckets(signature, settings.dedup_bands)
+    best: Optional[Tuple[int, float]] = None
+    for document_id, original_id, stored in crud.get_lsh_candidates(
+        db, owner_id, buckets, exclude_id, limit=settings.dedup_max_candidates
+    ):
+        if exclude_id is not None and original_id == exclude_id:
+            continue
+        score = similarity(signature, np.frombuffer(stored, dtype=np.uint32))
+        if score >= settings.dedup_threshold and (best is None or score > best[1]):
+            best = (original_id or document_id, score)
+    return best
+
+
+def index_document(db: Session, document_id: int, owner_id: int, signature: np.ndarray) -> None:
+    """Store the signature and its LSH buckets (replacing any previous ones)."""
+    crud.store_signature(db, document_id, owner_id, signature.astype(np.uint32).tobytes(),
+                         band_buckets(signature, settings.dedup_bands))
+
+
+def index_existing(db: Session, user_id: Optional[int] = None,
+                   batch_size: int = 100) -> Dict[str, int]:
+    """Sign and index processed documents that have no signature yet, oldest first (so the
+    oldest of a group stays its original), marking the near-duplicates found on the way.
+    """
+    from .content_store import ContentStore
+
+    content_store = ContentStore()
+    report = {"indexed": 0, "duplicates": 0}
+    last_id = 0
+    while True:
+        query = db.query(models.Document).outerjoin(
+            models.DocumentSignature,
+            models.DocumentSignature.document_id == models.Document.id,
+        ).filter(
+            models.DocumentSignature.document_id.is_(None),
+            models.Document.processed_at.isnot(None),
+            models.Document.id > last_id,
+        )
+        if user_id is not None:
+            query = query.filter(models.Document.owner_id == user_id)
+        batch = query.order_by(models.Document.id).limit(batch_size).all()
+        if not batch:
+            return report
+        for document in batch:
+            last_id = document.id
+            text = content_store.load_text(document)
+            if not text:
+                continue
+            signature = text_signature(text)
+            match = find_duplicate(db, document.owner_id, signature, document.id)
+            if match and document.duplicate_of_id is None:
+                document.duplicate_of_id, document.duplicate_similarity = match
+                report["duplicates"] += 1
+            index_document(db, document.id, document.owner_id, signature)
+            report["indexed"] += 1
@@ -0,0 +1,131 @@
+"""Cascade deletion of documents across the database, the vector store and file storage.
+
+crud.delete_documents removes the rows set-based and records a PendingDeletion per document
+in the same transaction. Vectors are then removed right away (so searches stop returning
+the documents), stored files and content blobs in a background task. Whatever fails stays
+pending and is retried by :func:`sweep_pending_deletions`.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import crud, models
+from .content_store import ContentStore
+from .file_storage import FileStorage
+from .vector_store import VectorStore
+
+BATCH_SIZE = 500
+
+
+def _pending(db: Session, document_ids: List[int], **flags: bool) -> List[models.PendingDeletion]:
+    query = db.query(models.PendingDeletion).filter_by(**flags)
+    return [row for start in range(0, len(document_ids), BATCH_SIZE)
+            for row in query.filter(models.PendingDeletion.document_id.in_(
+                document_ids[start:start + BATCH_SIZE]))]
+
+
+def _finish(db: Session, rows: List[models.PendingDeletion]) -> None:
+    for row in rows:
+        if row.vectors_removed and row.files_removed:
+            db.delete(row)
+    db.commit()
+
+
+def _failed(row: models.PendingDeletion, step: str, error: Exception) -> None:
+    row.attempts += 1
+    row.last_error = f"{step}: {error}"[:500]
+
+
+def remove_vectors(db: Session, document_ids: List[int], vector_store: VectorStore) -> int:
+    """Delete the documents' chunks, one batched call per owner; returns documents done."""
+    rows = _pending(db, document_ids, vectors_removed=False)
+    by_owner: Dict[Optional[int], List[models.PendingDeletion]] = defaultdict(list)
+    for row in rows:
+        by_owner[row.owner_id].append(row)
+    done = 0
+    for owner, owned in by_owner.items():
+        try:
+            vector_store.delete_documents(
+                {str(row.document_id): row.chunk_count for row in owned}, user_id=owner
+            )
+        except Exception as e:
+            print(f"Error deleting vectors: {e}")
+            for row in owned:
+                _failed(row, "vectors", e)
+            continue
+        for row in owned:
+            row.vectors_removed = True
+        done += len(owned)
+    _finish(db, rows)
+    return done
+
+
+def remove_files(db: Session, document_ids: List[int], storage: FileStorage,
+                 content_store: Optional[ContentStore] = None) -> int:
+    """Delete the documents' uploads and content blobs; returns documents done."""
+    content_store = content_store or ContentStore()
+    rows = _pending(db, document_ids, files_removed=False)
+    done = 0
+    for row in rows:
+        try:
+            storage.delete(row.file_key)
+            content_store.delete(row.content_blob)
+        except Exception as e:
+            print(f"Error deleting stored files: {e}")
+            _failed(row, "files", e)
+            continue
+        row.files_removed = True
+        done += 1
+    _finish(db, rows)
+    return done
+
+
+def remove_files_later(document_ids: List[int], storage: FileStorage) -> None:
+    """Background-task form of :func:`remove_files` with its own session."""
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        remove_files(db, document_ids, storage)
+    finally:
+        db.close()
+
+
+def delete_documents(db: Session, user_id: int, document_ids: Optional[Iterable[int]],
+                     vector_store: VectorStore, storage: FileStorage,
+                     background: Optional[Any] = None) -> List[int]:
+    """Delete documents (all of the user's when ``document_ids`` is None); returns their ids.
+
+    With ``background`` (FastAPI BackgroundTasks) file removal runs after the response.
+    """
+    deleted = crud.delete_documents(db, user_id, document_ids)
+    if deleted:
+        remove_vectors(db, deleted, vector_store)
+        if background is not None:
+            background.add_task(remove_files_later, deleted, storage)
+        else:
+            remove_files(db, deleted, storage)
+    return deleted
+
+
+def sweep_pending_deletions(db: Session, vector_store: Optional[VectorStore],
+                            storage: FileStorage, min_age_seconds: float = 60.0) -> Dict[str, int]:
+    """Retry the cleanup of deletions older than ``min_age_seconds`` (younger ones may still
+    be in progress); without ``vector_store`` only files are retried.
+
+    Returns pending/vectors/files/remaining counts.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=min_age_seconds)
+    ids = sorted({document_id for (document_id,) in db.query(
+        models.PendingDeletion.document_id
+    ).filter(models.PendingDeletion.created_at <= cutoff)})
+    report = {"pending": len(ids), "vectors": 0, "files": 0}
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        if vector_store is not None:
+            report["vectors"] += remove_vectors(db, batch, vector_store)
+        report["files"] += remove_files(db, batch, storage)
+    report["remaining"] = len(_pending(db, ids))
+    return report
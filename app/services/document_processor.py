@@ -1,34 +1,63 @@
-import os
-import uuid
-from typing import Dict, Any
-from pathlib import Path
-import PyPDF2
-import docx
-from ..config import settings
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from ..metrics import timed
+from .file_storage import CHUNK_SIZE, FileStorage, build_storage
+
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def join_pages(pages: List[str]) -> Tuple[str, List[int]]:
+    """Text of ``pages`` joined by newlines, and the offset in it where each page after the
+    first starts; chunking never crosses a page (see VectorStore.split_text)."""
+    text, page_breaks = "", []
+    for page in (page.strip() for page in pages):
+        if not page:
+            continue
+        if text:
+            text += "\n"
+            page_breaks.append(len(text))
+        text += page
+    return text, page_breaks
+
 
 class DocumentProcessor:
-    def __init__(self) -> None:
-        self.upload_dir = Path(settings.upload_dir)
-        self.upload_dir.mkdir(parents=True, exist_ok=True)
-        
-    def save_uploaded_file(self, file_content: bytes, filename: str) -> str:
-        """Save uploaded file and return file path."""
-        # Generate unique filename
-        file_ext = Path(filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = self.upload_dir / unique_filename
-        
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-            
-        return str(file_path)
-    
-    def extract_text_from_file(self, file_path: str, mime_type: str) -> Dict[str, Any]:
-        """Extract text from various file types."""
+    def __init__(self, storage: Optional[FileStorage] = None) -> None:
+        self.storage = storage or build_storage()
+
+    @timed("document_processor", "save_uploaded_file")
+    async def save_uploaded_file(self, upload: Any, filename: str) -> Tuple[str, int]:
+        """Stream an upload (anything with ``async read(n)``) to storage; returns key and size."""
+        async def chunks() -> AsyncIterator[bytes]:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+        key = self.storage.new_key(filename)
+        return key, await self.storage.save(key, chunks())
+
+    @timed("document_processor", "extract_text")
+    def extract_text(self, key: str, mime_type: str,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Extract text from a stored upload."""
+        try:
+            with self.storage.local_path(key) as path:
+                return self.extract_text_from_file(str(path), mime_type, progress)
+        except Exception as e:
+            return {
+                "text": "",
+                "error": f"Error reading stored file: {str(e)}"
+            }
+
+    @timed("document_processor", "extract_text_from_file")
+    def extract_text_from_file(self, file_path: str, mime_type: str,
+                               progress: Optional[Callable[[int, int], None]] = None
+                               ) -> Dict[str, Any]:
+        """Extract text from various file types; PDFs report ``progress(page, pages)``."""
         try:
             if mime_type == "application/pdf":
-                return self._extract_from_pdf(file_path)
-            elif mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+                return self._extract_from_pdf(file_path, progress)
+            elif mime_type == DOCX_MIME_TYPE:
                 return self._extract_from_docx(file_path)
             elif mime_type.startswith("image/"):
                 return self._extract_from_image(file_path)
@@ -45,17 +74,26 @@ class DocumentProcessor:
                 "error": f"Error extracting text: {str(e)}"
             }
     
-    def _extract_from_pdf(self, file_path: str) -> Dict[str, Any]:
-        """Extract text from PDF."""
-        text = ""
+    def _extract_from_pdf(self, file_path: str,
+                          progress: Optional[Callable[[int, int], None]] = None
+                          ) -> Dict[str, Any]:
+        """Extract text from PDF, with the offsets where its pages start."""
+        texts = []
         try:
+            import PyPDF2  # imported lazily to keep application start-up fast
+
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            
+                pages = len(pdf_reader.pages)
+                for number, page in enumerate(pdf_reader.pages, 1):
+                    texts.append(page.extract_text())
+                    if progress:
+                        progress(number, pages)
+
+            text, page_breaks = join_pages(texts)
             return {
-                "text": text.strip(),
+                "text": text,
+                "page_breaks": page_breaks,
                 "pages": len(pdf_reader.pages),
                 "method": "pdf_extraction"
             }
@@ -68,6 +106,8 @@ class DocumentProcessor:
     def _extract_from_docx(self, file_path: str) -> Dict[str, Any]:
         """Extract text from DOCX."""
         try:
+            import docx
+
             doc = docx.Document(file_path)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
             
@@ -85,9 +125,8 @@ class DocumentProcessor:
     def _extract_from_image(self, file_path: str) -> Dict[str, Any]:
         """Extract text from image using OCR."""
         try:
-            import cv2  # type: ignore
-            import numpy as np  # type: ignore
-            import pytesseract  # type: ignore
+            import cv2
+            import pytesseract
             # Load and preprocess image
             image = cv2.imread(file_path)
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -0,0 +1,264 @@
+"""Where uploaded files live: sharded local directories or an S3-compatible bucket.
+
+Files are addressed by opaque keys (``<uuid><ext>``) kept in ``Document.file_path``. Both
+backends fan keys out under a hash prefix (``ab/cd/<key>``) so no directory or listing
+prefix grows unbounded. Reads and writes are async and streamed in chunks; extraction,
+which needs a real file, goes through :meth:`FileStorage.local_path`.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    Any, AsyncIterable, AsyncIterator, ContextManager, Iterator, List, Optional, Tuple,
+)
+
+import anyio
+import anyio.to_thread
+
+from ..config import settings
+
+CHUNK_SIZE = 1024 * 1024
+# S3 multipart uploads need parts of at least 5 MiB (except the last)
+S3_PART_SIZE = 8 * 1024 * 1024
+
+
+class FileStorage:
+    """Backend interface; keys come from :meth:`new_key`."""
+
+    name = "base"
+
+    def __init__(self, shard_depth: int = 2) -> None:
+        self.shard_depth = shard_depth
+
+    def new_key(self, filename: str) -> str:
+        return f"{uuid.uuid4().hex}{Path(filename).suffix}"
+
+    def shard(self, key: str) -> str:
+        """Hash-prefix directories for ``key``: ``ab/cd`` for depth 2."""
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        return "/".join(digest[2 * i:2 * i + 2] for i in range(self.shard_depth))
+
+    async def save(self, key: str, chunks: AsyncIterable[bytes]) -> int:
+        """Write the stream under ``key``; returns the bytes written."""
+        raise NotImplementedError
+
+    def read(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Stream the file's contents."""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> ContextManager[Path]:
+        """A filesystem path with the file's contents for the duration of the block."""
+        raise NotImplementedError
+
+    def delete(self, key: Optional[str]) -> None:
+        raise NotImplementedError
+
+    def list(self) -> Iterator[Tuple[str, float]]:
+        """Every stored key with its modification time (for garbage collection)."""
+        raise NotImplementedError
+
+
+class LocalStorage(FileStorage):
+    """Files under ``root/<shard>/<key>``, written to a temp file and renamed into place."""
+
+    name = "local"
+
+    def __init__(self, root: str, shard_depth: int = 2) -> None:
+        super().__init__(shard_depth)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        if os.sep in key or "/" in key:
+            # Rows from before sharding store the full path of a file directly in root
+            return Path(key)
+        return self.root / self.shard(key) / key
+
+    async def save(self, key: str, chunks: AsyncIterable[bytes]) -> int:
+        path = self.path(key)
+        await anyio.to_thread.run_sync(lambda: path.parent.mkdir(parents=True, exist_ok=True))
+        tmp_path = path.with_name(f".{key}.tmp")
+        size = 0
+        try:
+            async with await anyio.open_file(tmp_path, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    size += len(chunk)
+            await anyio.to_thread.run_sync(os.replace, tmp_path, path)
+        except BaseException:
+            await anyio.to_thread.run_sync(lambda: tmp_path.unlink(missing_ok=True))
+            raise
+        return size
+
+    async def read(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async with await anyio.open_file(self.path(key), "rb") as f:
+            while True:
+                chunk = await f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[Path]:
+        yield self.path(key)
+
+    def delete(self, key: Optional[str]) -> None:
+        if key:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def list(self) -> Iterator[Tuple[str, float]]:
+        for entry in os.scandir(self.root):
+            # Legacy flat files are listed under the path their rows store
+            if entry.is_file() and not entry.name.startswith("."):
+                yield str(self.root / entry.name), entry.stat().st_mtime
+        for path in self.root.glob("/".join(["[0-9a-f][0-9a-f]"] * self.shard_depth) + "/*"):
+            if path.is_file() and not path.name.startswith("."):
+                yield path.name, path.stat().st_mtime
+
+
+class S3Storage(FileStorage):
+    """Objects under ``prefix<shard>/<key>`` in an S3-compatible bucket (AWS, MinIO, ...)."""
+
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, shard_depth: int = 2,
+                 client: Optional[Any] = None) -> None:
+        super().__init__(shard_depth)
+        if client is None:
+            import boto3  # optional: pip install boto3
+
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}{self.shard(key)}/{key}"
+
+    async def save(self, key: str, chunks: AsyncIterable[bytes]) -> int:
+        object_key = self.object_key(key)
+        buffer = bytearray()
+        size = 0
+        upload_id: Optional[str] = None
+        parts: List[dict] = []
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                if len(buffer) >= S3_PART_SIZE:
+                    if upload_id is None:
+                        upload_id = (await anyio.to_thread.run_sync(lambda: (
+                            self.client.create_multipart_upload(Bucket=self.bucket, Key=object_key)
+                        )))["UploadId"]
+                    parts.append(await self._upload_part(object_key, upload_id, len(parts) + 1,
+                                                         bytes(buffer)))
+                    buffer.clear()
+            if upload_id is None:
+                await anyio.to_thread.run_sync(lambda: self.client.put_object(
+                    Bucket=self.bucket, Key=object_key, Body=bytes(buffer)))
+                return size
+            if buffer:
+                parts.append(await self._upload_part(object_key, upload_id, len(parts) + 1,
+                                                     bytes(buffer)))
+            await anyio.to_thread.run_sync(lambda: self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts}))
+        except BaseException:
+            if upload_id is not None:
+                await anyio.to_thread.run_sync(lambda: self.client.abort_multipart_upload(
+                    Bucket=self.bucket, Key=object_key, UploadId=upload_id))
+            raise
+        return size
+
+    async def _upload_part(self, object_key: str, upload_id: str, number: int,
+                           data: bytes) -> dict:
+        response = await anyio.to_thread.run_sync(lambda: self.client.upload_part(
+            Bucket=self.bucket, Key=object_key, UploadId=upload_id, PartNumber=number, Body=data))
+        return {"ETag": response["ETag"], "PartNumber": number}
+
+    async def read(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        response = await anyio.to_thread.run_sync(lambda: self.client.get_object(
+            Bucket=self.bucket, Key=self.object_key(key)))
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await anyio.to_thread.run_sync(body.read, chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            body.close()
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[Path]:
+        fd, name = tempfile.mkstemp(suffix=Path(key).suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                body = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))["Body"]
+                shutil.copyfileobj(body, f, CHUNK_SIZE)
+            yield Path(name)
+        finally:
+            os.remove(name)
+
+    def delete(self, key: Optional[str]) -> None:
+        if key:
+            self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def list(self) -> Iterator[Tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"].rsplit("/", 1)[-1], item["LastModified"].timestamp()
+
+
+def build_storage() -> FileStorage:
+    """The backend selected by settings.storage_backend."""
+    if settings.storage_backend == "s3":
+        if not settings.storage_s3_bucket:
+            raise ValueError("storage_backend=s3 requires storage_s3_bucket")
+        return S3Storage(
+            settings.storage_s3_bucket,
+            prefix=settings.storage_s3_prefix,
+            endpoint_url=settings.storage_s3_endpoint_url,
+            region=settings.storage_s3_region,
+            shard_depth=settings.storage_shard_depth,
+        )
+    if settings.storage_backend != "local":
+        raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+    return LocalStorage(settings.upload_dir, shard_depth=settings.storage_shard_depth)
+
+
+def collect_garbage(db: Any, storage: FileStorage, grace_seconds: Optional[float] = None,
+                    dry_run: bool = False) -> dict:
+    """Delete stored files no document references.
+
+    Files younger than ``grace_seconds`` are kept: their upload may not be committed yet.
+    """
+    from .. import models
+
+    grace = settings.storage_gc_grace_seconds if grace_seconds is None else grace_seconds
+    referenced = {
+        key for (key,) in db.query(models.Document.file_path).yield_per(10000) if key
+    }
+    # Legacy rows may spell the same path differently ("./uploads/x" vs "uploads/x")
+    referenced |= {os.path.normpath(key) for key in referenced}
+    cutoff = time.time() - grace
+    report = {"scanned": 0, "orphaned": 0, "deleted": 0}
+    for key, modified in storage.list():
+        report["scanned"] += 1
+        if key in referenced or os.path.normpath(key) in referenced or modified > cutoff:
+            continue
+        report["orphaned"] += 1
+        if not dry_run:
+            storage.delete(key)
+            report["deleted"] += 1
+    return report
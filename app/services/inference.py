@@ -0,0 +1,346 @@
+"""Inference backends for the AIService models.
+
+Each model can run as:
+    torch       the reference full-precision PyTorch pipeline
+    torch-int8  the same pipeline with nn.Linear layers dynamically quantized to int8
+    onnx        an ONNX Runtime session exported with optimum (cached under onnx_cache_dir)
+
+Backends are chosen per model in Settings (``qa_backend``, ``summarizer_backend``, ...).
+``parity_report`` compares a candidate backend's outputs against the reference.
+
+``inference_limiter`` caps concurrent calls per model so that concurrent requests queue for
+a model instead of oversubscribing the CPU; when a model's queue is full (or a call waits
+too long) it raises ``InferenceSaturated``, which the API turns into 429/503 + Retry-After.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from ..config import settings
+from ..metrics import INFERENCE_REJECTED, INFERENCE_WAITING
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+_ORT_MODEL_CLASSES = {
+    "text-classification": "ORTModelForSequenceClassification",
+    "question-answering": "ORTModelForQuestionAnswering",
+    "summarization": "ORTModelForSeq2SeqLM",
+    "translation": "ORTModelForSeq2SeqLM",
+    "feature-extraction": "ORTModelForFeatureExtraction",
+}
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {BACKENDS}")
+
+
+def _quantize_dynamic(module: Any) -> Any:
+    import torch
+
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def intra_op_threads(model: Optional[str] = None) -> int:
+    """Intra-op thread budget for ``model``: its override, the global setting, or auto.
+
+    Auto splits the machine's cores between the server workers so that each process
+    doesn't assume it owns every core.
+    """
+    if model and settings.inference_model_threads.get(model):
+        return settings.inference_model_threads[model]
+    if settings.inference_intra_op_threads:
+        return settings.inference_intra_op_threads
+    return max(1, (os.cpu_count() or 1) // max(settings.server_workers, 1))
+
+
+def configure_torch_threads() -> None:
+    """Apply the global thread budget to torch (its pools are process-wide)."""
+    import torch
+
+    torch.set_num_threads(intra_op_threads())
+    try:
+        torch.set_num_interop_threads(settings.inference_inter_op_threads)
+    except RuntimeError:
+        # Only settable before torch runs its first parallel op in this process
+        pass
+
+
+def _session_options(threads: Optional[int]) -> Any:
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    options.inter_op_num_threads = settings.inference_inter_op_threads
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def _load_ort_model(task: str, model_name: str, threads: Optional[int]) -> Any:
+    """Load an optimum ORT model, exporting and caching the ONNX graph on first use."""
+    import optimum.onnxruntime as ort
+
+    model_cls = getattr(ort, _ORT_MODEL_CLASSES[task])
+    cache_dir = Path(settings.onnx_cache_dir) / model_name.replace("/", "--")
+    options = _session_options(threads)
+    if cache_dir.is_dir():
+        return model_cls.from_pretrained(cache_dir, session_options=options)
+    model = model_cls.from_pretrained(model_name, export=True, session_options=options)
+    model.save_pretrained(cache_dir)
+    return model
+
+
+def load_pipeline(task: str, model_name: str, backend: str = "torch", device: str = "cpu",
+                  threads: Optional[int] = None) -> Any:
+    """Build a transformers pipeline for ``task`` on the requested backend."""
+    _check_backend(backend)
+    from transformers import AutoTokenizer, pipeline
+
+    if backend == "onnx":
+        model = _load_ort_model(task, model_name, threads)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        return pipeline(task, model=model, tokenizer=tokenizer)
+
+    pipe = pipeline(task, model=model_name, device=0 if device == "cuda" else -1)
+    if backend == "torch-int8":
+        if device != "cpu":
+            print(f"Dynamic int8 quantization is CPU-only; keeping {model_name} in full precision")
+        else:
+            pipe.model = _quantize_dynamic(pipe.model)
+    return pipe
+
+
+class OnnxSentenceEmbedder:
+    """``SentenceTransformer.encode``-compatible embedder on ONNX Runtime (mean pooling)."""
+
+    def __init__(self, model_name: str, threads: Optional[int] = None,
+                 normalize: bool = True, max_length: int = 256) -> None:
+        from transformers import AutoTokenizer
+
+        self.model = _load_ort_model("feature-extraction", model_name, threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.normalize = normalize
+        self.max_length = max_length
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **kwargs: Any) -> Any:
+        import numpy as np
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                list(texts[start:start + batch_size]), padding=True, truncation=True,
+                max_length=self.max_length, return_tensors="np",
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            hidden = np.asarray(hidden)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(batches)
+
+
+def load_embedder(model_name: str, backend: str = "torch", device: str = "cpu",
+                  threads: Optional[int] = None) -> Any:
+    """Build a sentence embedder exposing ``encode(texts) -> ndarray``."""
+    _check_backend(backend)
+    if backend == "onnx":
+        return OnnxSentenceEmbedder(model_name, threads)
+    from sentence_transformers import SentenceTransformer
+
+    embedder = SentenceTransformer(model_name, device=device)
+    if backend == "torch-int8" and device == "cpu":
+        embedder = _quantize_dynamic(embedder)
+    return embedder
+
+
+# -- parity ------------------------------------------------------------------------------
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def _token_f1(a: str, b: str) -> float:
+    ta, tb = a.lower().split(), b.lower().split()
+    if not ta or not tb:
+        return float(ta == tb)
+    common = sum(min(ta.count(t), tb.count(t)) for t in set(ta))
+    if not common:
+        return 0.0
+    precision, recall = common / len(tb), common / len(ta)
+    return 2 * precision * recall / (precision + recall)
+
+
+def run_model(kind: str, model: Any, sample: Any) -> Any:
+    """Output of ``model`` for one parity sample, in a JSON-serialisable form."""
+    if kind == "embedder":
+        return [list(map(float, row)) for row in model.encode(list(sample))]
+    if kind == "qa":
+        return model(question=sample["question"], context=sample["context"])
+    if kind == "summarizer":
+        return model(sample, max_length=150, min_length=30, do_sample=False)[0]["summary_text"]
+    return model(sample)[0]
+
+
+def compare_outputs(kind: str, expected: Sequence[Any], actual: Sequence[Any]) -> Dict[str, Any]:
+    """Parity of candidate outputs against the reference outputs for the same samples.
+
+    ``kind`` is one of ``embedder`` (samples are lists of texts), ``qa`` (dicts with
+    question/context), ``summarizer`` or ``classifier`` (texts).
+    """
+    scores: List[float] = []
+    agreements: List[bool] = []
+    for ref, out in zip(expected, actual):
+        if kind == "embedder":
+            sims = [_cosine(e, a) for e, a in zip(ref, out)]
+            scores.extend(sims)
+            agreements.extend(sim >= 0.99 for sim in sims)
+        elif kind == "qa":
+            scores.append(_token_f1(ref["answer"], out["answer"]))
+            agreements.append(ref["answer"].strip() == out["answer"].strip())
+        elif kind == "summarizer":
+            scores.append(_token_f1(ref, out))
+            agreements.append(ref.strip() == out.strip())
+        else:
+            scores.append(1.0 - abs(ref["score"] - out["score"]))
+            agreements.append(ref["label"] == out["label"])
+    return {
+        "kind": kind,
+        "samples": len(scores),
+        # cosine similarity (embedder), token F1 (qa/summarizer) or 1 - |score delta|
+        "mean_similarity": sum(scores) / len(scores) if scores else None,
+        "min_similarity": min(scores) if scores else None,
+        "agreement": sum(agreements) / len(agreements) if agreements else None,
+    }
+
+
+def parity_report(kind: str, reference: Any, candidate: Any,
+                  samples: Sequence[Any]) -> Dict[str, Any]:
+    """Run both models on ``samples`` and compare the candidate with the reference."""
+    expected = [run_model(kind, reference, sample) for sample in samples]
+    actual = [run_model(kind, candidate, sample) for sample in samples]
+    return compare_outputs(kind, expected, actual)
+
+
+class InferenceSaturated(Exception):
+    """A model's inference queue is full (429) or a call waited too long for a slot (503)."""
+
+    def __init__(self, model: str, status_code: int, retry_after: int) -> None:
+        super().__init__(f"Inference capacity for {model} exhausted")
+        self.model = model
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class InferenceLimiter:
+    """Per-model concurrency caps with a bounded wait queue."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float,
+                 overrides: Optional[Dict[str, int]] = None) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.overrides = overrides or {}
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._waiting: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._avg_seconds: Dict[str, float] = {}
+
+    def concurrency(self, model: str) -> int:
+        return max(self.overrides.get(model, self.max_concurrency), 1)
+
+    def _semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._slots:
+                self._slots[model] = threading.BoundedSemaphore(self.concurrency(model))
+            return self._slots[model]
+
+    def retry_after(self, model: str) -> int:
+        """Seconds until the queue ahead is likely drained, from the observed call time."""
+        backlog = self._waiting.get(model, 0) + self._running.get(model, 0)
+        estimate = self._avg_seconds.get(model, 1.0) * backlog / self.concurrency(model)
+        return max(1, math.ceil(estimate))
+
+    def _reject(self, model: str, status_code: int) -> InferenceSaturated:
+        INFERENCE_REJECTED.inc(model=model, status=str(status_code))
+        return InferenceSaturated(model, status_code, self.retry_after(model))
+
+    def check(self, *models: str) -> None:
+        """Fail fast with 429 if any of ``models`` has a full queue."""
+        for model in models:
+            if self.max_queue and self._waiting.get(model, 0) >= self.max_queue:
+                raise self._reject(model, 429)
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        semaphore = self._semaphore(model)
+        with self._lock:
+            if self.max_queue and self._waiting.get(model, 0) >= self.max_queue:
+                raise self._reject(model, 429)
+            self._waiting[model] = self._waiting.get(model, 0) + 1
+        INFERENCE_WAITING.inc(model=model)
+        try:
+            acquired = semaphore.acquire(timeout=self.queue_timeout or None)
+        finally:
+            with self._lock:
+                self._waiting[model] -= 1
+            INFERENCE_WAITING.dec(model=model)
+        if not acquired:
+            raise self._reject(model, 503)
+
+        with self._lock:
+            self._running[model] = self._running.get(model, 0) + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._running[model] -= 1
+                previous = self._avg_seconds.get(model)
+                # exponentially weighted, so Retry-After follows the current load
+                self._avg_seconds[model] = (elapsed if previous is None
+                                            else 0.8 * previous + 0.2 * elapsed)
+            semaphore.release()
+
+    def state(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            model: {
+                "concurrency": self.concurrency(model),
+                "running": self._running.get(model, 0),
+                "waiting": self._waiting.get(model, 0),
+                "avg_ms": round(self._avg_seconds.get(model, 0.0) * 1000, 2),
+            }
+            for model in self._slots
+        }
+
+
+inference_limiter = InferenceLimiter(
+    settings.inference_max_concurrency,
+    settings.inference_max_queue,
+    settings.inference_queue_timeout,
+    settings.inference_model_concurrency,
+)
+
+
+MODEL_LOADERS: Dict[str, Callable[..., Any]] = {
+    "classifier": lambda name, backend, device, threads=None: load_pipeline(
+        "text-classification", name, backend, device, threads),
+    "qa": lambda name, backend, device, threads=None: load_pipeline(
+        "question-answering", name, backend, device, threads),
+    "summarizer": lambda name, backend, device, threads=None: load_pipeline(
+        "summarization", name, backend, device, threads),
+    "embedder": load_embedder,
+    "multilingual_embedder": load_embedder,
+}
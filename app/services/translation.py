@@ -0,0 +1,218 @@
+"""Sentence-level batch translation with per-sentence caching.
+
+Text is split into sentences, which are translated in batches by a MarianMT model for the
+language pair (``settings.translation_model_template``, loaded on first use; at most
+``translation_max_models`` stay loaded). Translations are cached per sentence hash, so
+boilerplate that recurs within or across documents (clauses, headers, footers) is only
+run through the model once.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..metrics import timed
+from .inference import InferenceSaturated, inference_limiter
+from .language import UNDETERMINED, detect_language
+
+# Sentence ends (Latin and CJK punctuation) followed by whitespace, or line breaks
+_SENTENCE_END = re.compile(r"(?<=[.!?\u2026])\s+|(?<=[\u3002\uff01\uff1f])\s*|\s*\n\s*")
+
+
+def split_sentences(text: str, max_chars: int = 400) -> List[Tuple[str, str]]:
+    """Split ``text`` into (sentence, following whitespace) pairs that rejoin to ``text``.
+
+    Sentences longer than ``max_chars`` are cut at whitespace so they fit the model.
+    """
+    segments: List[Tuple[str, str]] = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() > start and match.start() >= start:
+            segments.extend(_cut(text[start:match.start()], match.group(0), max_chars))
+            start = match.end()
+    if start < len(text):
+        segments.extend(_cut(text[start:], "", max_chars))
+    return [(sentence, gap) for sentence, gap in segments if sentence or gap]
+
+
+def _cut(sentence: str, gap: str, max_chars: int) -> List[Tuple[str, str]]:
+    pieces: List[Tuple[str, str]] = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        pieces.append((sentence[:cut], " " if sentence[cut:cut + 1] == " " else ""))
+        sentence = sentence[cut:].lstrip(" ")
+    pieces.append((sentence, gap))
+    return pieces
+
+
+class TranslationCache:
+    """Thread-safe LRU of translations keyed by (source, target, sentence) hash."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(source: str, target: str, sentence: str) -> str:
+        return hashlib.sha1(f"{source}>{target}\0{sentence}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _load_marian(model_name: str, device: str) -> Any:
+    from .inference import intra_op_threads, load_pipeline
+
+    return load_pipeline("translation", model_name, settings.translation_backend, device,
+                         intra_op_threads("translator"))
+
+
+class TranslationService:
+    """Translates text sentence by sentence; without a model for a pair it passes through."""
+
+    def __init__(self, enabled: bool = True, device: str = "cpu",
+                 loader: Optional[Callable[[str, str], Any]] = None,
+                 batch_size: Optional[int] = None, cache_size: Optional[int] = None) -> None:
+        self.enabled = enabled
+        self.device = device
+        self.loader = loader or _load_marian
+        self.batch_size = batch_size or settings.translation_batch_size
+        self.cache = TranslationCache(
+            settings.translation_cache_size if cache_size is None else cache_size
+        )
+        # Loaded pipelines per pair, least recently used first; pairs that failed to load
+        self._models: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._unavailable: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def model_name(self, source: str, target: str) -> str:
+        return settings.translation_model_template.format(source=source, target=target)
+
+    def _model(self, source: str, target: str) -> Optional[Any]:
+        """The pair's pipeline, loaded on first use, or None if it can't be loaded."""
+        pair = (source, target)
+        if not self.enabled or pair in self._unavailable:
+            return None
+        with self._lock:
+            if pair in self._models:
+                self._models.move_to_end(pair)
+                return self._models[pair]
+            try:
+                model = self.loader(self.model_name(source, target), self.device)
+            except Exception as e:
+                print(f"Error loading translation model {self.model_name(source, target)}: {e}")
+                self._unavailable[pair] = str(e)
+                return None
+            self._models[pair] = model
+            while len(self._models) > max(settings.translation_max_models, 1):
+                self._models.popitem(last=False)
+            return model
+
+    @timed("translation", "translate_batch")
+    def _run(self, model: Any, sentences: List[str]) -> List[str]:
+        with inference_limiter.slot("translator"):
+            results = model(sentences, batch_size=len(sentences))
+        return [result["translation_text"] for result in results]
+
+    def translate(self, text: str, target: str, source: Optional[str] = None,
+                  on_segment: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Translate ``text`` batch by batch (``source`` is detected when not given).
+
+        ``on_segment`` receives each batch's output as soon as it is ready, in order:
+        ``index`` (of its first sentence), ``sentences`` and ``text`` (the translated
+        sentences with their original spacing). Returns the whole ``translated_text`` with
+        the language pair and sentence counts (``cached``: repeats or served from the cache,
+        ``translated``: run through the model, ``failed``: left untranslated because their
+        batch failed, see ``error``). ``available`` is False when any of the text was passed
+        through: there is no model for the pair, the source language could not be detected
+        (``source_language`` is ``und``) or a batch failed.
+        """
+        on_segment = on_segment or (lambda segment: None)
+        source = source or detect_language(text)[0]
+        segments = split_sentences(text, settings.translation_max_sentence_chars)
+        stats: Dict[str, Any] = {
+            "source_language": source, "target_language": target, "sentences": len(segments),
+            "cached": 0, "translated": 0, "failed": 0, "available": source != UNDETERMINED,
+        }
+        passthrough = source in (target, UNDETERMINED)
+        model = None if passthrough else self._model(source, target)
+        if model is None and not passthrough:
+            stats["available"] = False
+        parts: List[str] = []
+        for start in range(0, len(segments), self.batch_size):
+            batch = segments[start:start + self.batch_size]
+            if model is None:
+                parts.append("".join(s + gap for s, gap in batch))
+                on_segment({"index": start, "sentences": len(batch), "text": parts[-1]})
+                continue
+            translated: Dict[str, str] = {}
+            missing: Dict[str, str] = {}  # cache key -> sentence, each sentence once
+            for sentence, _ in batch:
+                if not sentence.strip():
+                    continue
+                key = self.cache.key(source, target, sentence)
+                if key in translated or key in missing:
+                    stats["cached"] += 1
+                    continue
+                cached = self.cache.get(key)
+                if cached is None:
+                    missing[key] = sentence
+                else:
+                    translated[key] = cached
+                    stats["cached"] += 1
+            if missing:
+                try:
+                    outputs = self._run(model, list(missing.values()))
+                except InferenceSaturated:
+                    raise
+                except Exception as e:
+                    print(f"Error translating batch: {e}")
+                    outputs = list(missing.values())
+                    stats["failed"] += len(outputs)
+                    stats["available"] = False
+                    stats["error"] = str(e)
+                else:
+                    stats["translated"] += len(outputs)
+                    for key, output in zip(missing, outputs):
+                        self.cache.put(key, output)
+                translated.update(zip(missing, outputs))
+            parts.append("".join(
+                (translated[self.cache.key(source, target, s)] if s.strip() else s) + gap
+                for s, gap in batch
+            ))
+            on_segment({"index": start, "sentences": len(batch), "text": parts[-1]})
+        return {"translated_text": "".join(parts), **stats}
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "loaded": [f"{s}-{t}" for s, t in self._models],
+            "unavailable": sorted(f"{s}-{t}" for s, t in self._unavailable),
+            "cache_entries": len(self.cache),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }
@@ -0,0 +1,649 @@
+"""In-memory vector index used by the ``memory`` VectorStore backend.
+
+``PartitionedIndex`` keeps one sub-index per owner (or per shard of owners), so a search
+filtered by owner only touches that owner's vectors.
+
+Vectors are L2-normalised on insert so inner products are cosine similarities, and stored
+with a ``VectorCodec``:
+
+    none     float32                                    4 bytes / dim
+    float16  half precision                             2 bytes / dim   (2x smaller)
+    int8     symmetric scalar quantization per vector   1 byte  / dim   (4x smaller)
+    binary   sign bits, scored by Hamming distance      1 bit   / dim   (32x smaller)
+
+With a lossy codec the top ``k * rerank_factor`` candidates are re-ranked exactly against
+the float32 vectors, which live in a memory-mapped spill file (page cache, not heap).
+"""
+import tempfile
+import zlib
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rows scored per block, bounding the temporary float32 copies made while searching
+SCORE_BLOCK = 16384
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize(vectors: Any) -> np.ndarray:
+    """Float32 copy of ``vectors`` as a 2-d array with unit-length rows."""
+    array = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(array, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return array / norms
+
+
+class VectorCodec:
+    """Stores unit vectors compactly and scores a query against stored codes."""
+
+    name = "none"
+    lossy = False
+    scaled = False  # encode() returns per-vector scales
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+
+    def code_shape(self) -> Tuple[int, ...]:
+        return (self.dim,)
+
+    @property
+    def code_dtype(self) -> Any:
+        return np.float32
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Codes for ``vectors`` plus optional per-vector scales."""
+        return vectors.astype(self.code_dtype), None
+
+    def decode(self, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        return codes.astype(np.float32)
+
+    def prepare_query(self, query: np.ndarray) -> Any:
+        return query
+
+    def scores(self, query: Any, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        """Approximate cosine similarity of the query with each row of ``codes``."""
+        return codes.astype(np.float32, copy=False) @ query
+
+    def bytes_per_vector(self) -> int:
+        return int(np.prod(self.code_shape())) * np.dtype(self.code_dtype).itemsize
+
+
+class Float16Codec(VectorCodec):
+    name = "float16"
+    lossy = True
+
+    @property
+    def code_dtype(self) -> Any:
+        return np.float16
+
+
+class Int8Codec(VectorCodec):
+    name = "int8"
+    lossy = True
+    scaled = True
+
+    @property
+    def code_dtype(self) -> Any:
+        return np.int8
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def decode(self, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        return codes.astype(np.float32) * scales[:, None]
+
+    def scores(self, query: Any, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        return (codes.astype(np.float32) @ query) * scales
+
+    def bytes_per_vector(self) -> int:
+        return self.dim + 4  # codes + float32 scale
+
+
+class BinaryCodec(VectorCodec):
+    name = "binary"
+    lossy = True
+
+    def code_shape(self) -> Tuple[int, ...]:
+        return ((self.dim + 7) // 8,)
+
+    @property
+    def code_dtype(self) -> Any:
+        return np.uint8
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return np.packbits(vectors > 0, axis=1), None
+
+    def decode(self, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        bits = np.unpackbits(codes, axis=1, count=self.dim)
+        return bits.astype(np.float32) * 2 - 1
+
+    def prepare_query(self, query: np.ndarray) -> Any:
+        return np.packbits(query > 0)
+
+    def scores(self, query: Any, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        hamming = _POPCOUNT[np.bitwise_xor(codes, query)].sum(axis=1, dtype=np.int32)
+        # Angle estimate from the fraction of differing sign bits
+        return np.cos(np.pi * hamming / self.dim).astype(np.float32)
+
+
+CODECS = {codec.name: codec for codec in (VectorCodec, Float16Codec, Int8Codec, BinaryCodec)}
+
+
+def get_codec(name: str, dim: int) -> VectorCodec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown vector quantization {name!r}; expected one of {tuple(CODECS)}")
+    return CODECS[name](dim)
+
+
+class _GrowableArray:
+    """Append-only 2-d array with amortised growth, optionally backed by a spill file."""
+
+    def __init__(self, row_shape: Tuple[int, ...], dtype: Any, spill: bool = False,
+                 spill_dir: Optional[str] = None) -> None:
+        self.row_shape = row_shape
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._file = (
+            tempfile.TemporaryFile(dir=spill_dir, prefix="intellidoc-vectors-") if spill else None
+        )
+        self._data = self._allocate(0)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        shape = (capacity, *self.row_shape)
+        if self._file is None:
+            data = np.empty(shape, dtype=self.dtype)
+            if capacity and self.size:
+                data[: self.size] = self._data[: self.size]
+            return data
+        row_bytes = int(np.prod(self.row_shape)) * self.dtype.itemsize
+        if capacity == 0:
+            return np.empty(shape, dtype=self.dtype)
+        self._file.truncate(capacity * row_bytes)
+        return np.memmap(self._file, dtype=self.dtype, mode="r+", shape=shape)
+
+    def append(self, rows: np.ndarray) -> None:
+        needed = self.size + len(rows)
+        if needed > len(self._data):
+            self._data = self._allocate(max(needed, 2 * len(self._data), 1024))
+        self._data[self.size:needed] = rows
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self._data[: self.size]
+
+    def take(self, keep: np.ndarray) -> None:
+        """Keep only the rows selected by the boolean mask ``keep``."""
+        kept = self._data[: self.size][keep].copy()
+        self.size = 0
+        self._data = self._allocate(max(len(kept), 1024))
+        self.append(kept)
+
+    def nbytes(self) -> int:
+        return self.size * int(np.prod(self.row_shape)) * self.dtype.itemsize
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class FlatIndex:
+    """Exhaustive (optionally quantized) index over chunk vectors and their metadata."""
+
+    def __init__(self, quantization: str = "none", rerank_factor: int = 4,
+                 spill_dir: Optional[str] = None) -> None:
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self.spill_dir = spill_dir
+        get_codec(quantization, 1)  # validate early
+        self.codec: Optional[VectorCodec] = None
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metas: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self._alive = _GrowableArray((), np.bool_)
+        self._codes: Optional[_GrowableArray] = None
+        self._scales: Optional[_GrowableArray] = None
+        self._full: Optional[_GrowableArray] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.codec.dim if self.codec else None
+
+    @property
+    def reranks(self) -> bool:
+        return bool(self.codec and self.codec.lossy and self.rerank_factor > 0)
+
+    def _init_storage(self, dim: int) -> None:
+        self.codec = get_codec(self.quantization, dim)
+        self._codes = _GrowableArray(self.codec.code_shape(), self.codec.code_dtype)
+        if self.codec.scaled:
+            self._scales = _GrowableArray((), np.float32)
+        if self.reranks:
+            self._full = _GrowableArray((dim,), np.float32, spill=True, spill_dir=self.spill_dir)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], vectors: Any,
+            metas: Sequence[Dict[str, Any]]) -> None:
+        vectors = normalize(vectors)
+        if self.codec is None:
+            self._init_storage(vectors.shape[1])
+        if vectors.shape[1] != self.codec.dim:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} != index dimension {self.codec.dim}"
+            )
+        self.remove(ids)
+        codes, scales = self.codec.encode(vectors)
+        start = len(self.ids)
+        self._codes.append(codes)
+        if self._scales is not None:
+            self._scales.append(scales)
+        if self._full is not None:
+            self._full.append(vectors)
+        self._alive.append(np.ones(len(vectors), dtype=np.bool_))
+        for offset, (chunk_id, text, meta) in enumerate(zip(ids, texts, metas)):
+            self.ids.append(chunk_id)
+            self.texts.append(text)
+            self.metas.append(meta)
+            self.rows[chunk_id] = start + offset
+        self._after_add(vectors)
+
+    def _after_add(self, vectors: np.ndarray) -> None:
+        """Hook for subclasses; ``vectors`` are the unit vectors just appended."""
+
+    def remove(self, ids: Iterable[str]) -> int:
+        alive = self._alive.view()
+        removed = 0
+        for chunk_id in ids:
+            row = self.rows.pop(chunk_id, None)
+            if row is not None:
+                alive[row] = False
+                removed += 1
+        if removed and len(self.ids) > 1024 and len(self.rows) < len(self.ids) // 2:
+            self._compact()
+        return removed
+
+    def _compact(self) -> None:
+        keep = self._alive.view().copy()
+        positions = np.flatnonzero(keep)
+        self.ids = [self.ids[i] for i in positions]
+        self.texts = [self.texts[i] for i in positions]
+        self.metas = [self.metas[i] for i in positions]
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        for array in self._row_arrays():
+            array.take(keep)
+
+    def _row_arrays(self) -> List[_GrowableArray]:
+        """Per-row arrays that compaction must keep aligned with ``ids``."""
+        return [a for a in (self._alive, self._codes, self._scales, self._full) if a is not None]
+
+    def rows_where(self, predicate: Any) -> List[str]:
+        """Ids of live chunks whose metadata satisfies ``predicate``."""
+        return [chunk_id for chunk_id, row in self.rows.items() if predicate(self.metas[row])]
+
+    def get(self, ids: Iterable[str]) -> Dict[str, Tuple[np.ndarray, Dict[str, Any]]]:
+        """Vector (see :meth:`vectors`) and metadata of the live chunks among ``ids``."""
+        found = [(chunk_id, self.rows[chunk_id]) for chunk_id in ids if chunk_id in self.rows]
+        if not found:
+            return {}
+        vectors = self.vectors(np.array([row for _, row in found]))
+        return {chunk_id: (vectors[i], self.metas[row]) for i, (chunk_id, row) in enumerate(found)}
+
+    def update_metadata(self, ids: Iterable[str], values: Dict[str, Any]) -> None:
+        """Set ``values`` in the metadata of the live chunks among ``ids``."""
+        for chunk_id in ids:
+            row = self.rows.get(chunk_id)
+            if row is not None:
+                self.metas[row] = {**self.metas[row], **values}
+
+    def _filter_rows(self, rows: np.ndarray, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        rows = rows[self._alive.view()[rows]]
+        for key, value in (where or {}).items():
+            # Chunks without the key are not filtered out, as in the original store
+            keep = np.fromiter((self.metas[row].get(key, value) == value for row in rows),
+                               dtype=np.bool_, count=len(rows))
+            rows = rows[keep]
+        return rows
+
+    def _score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Approximate scores of ``rows``, in blocks to bound temporary copies."""
+        prepared = self.codec.prepare_query(query)
+        codes = self._codes.view()
+        scales = self._scales.view() if self._scales is not None else None
+        if len(rows) == len(codes):  # every row: score contiguous slices, no gather
+            blocks = [slice(start, start + SCORE_BLOCK)
+                      for start in range(0, len(rows), SCORE_BLOCK)]
+        else:
+            blocks = [rows[start:start + SCORE_BLOCK] for start in range(0, len(rows), SCORE_BLOCK)]
+        return np.concatenate([
+            self.codec.scores(prepared, codes[block], scales[block] if scales is not None else None)
+            for block in blocks
+        ]) if blocks else np.empty(0, dtype=np.float32)
+
+    def _candidate_rows(self, query: np.ndarray, nprobe: Optional[int]) -> np.ndarray:
+        """Rows worth scoring for ``query``; all rows for the exhaustive index."""
+        return np.arange(len(self.ids))
+
+    def search(self, query: Any, k: int, where: Optional[Dict[str, Any]] = None,
+               nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        if self.codec is None or not self.rows or k <= 0:
+            return []
+        query = normalize(query)[0]
+        if len(query) != self.codec.dim:
+            return []
+        rows = self._filter_rows(self._candidate_rows(query, nprobe), where)
+        if not len(rows):
+            return []
+        scores = self._score_rows(query, rows)
+
+        n_candidates = min(k * self.rerank_factor if self.reranks else k, len(rows))
+        shortlist = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        rows, scores = rows[shortlist], scores[shortlist]
+        if self.reranks:
+            # Exact cosine on the float32 vectors of the shortlisted rows
+            scores = self._full.view()[rows] @ query
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [
+            {
+                "id": self.ids[row],
+                "document": self.texts[row],
+                "distance": float(1.0 - score),
+                "metadata": self.metas[row],
+            }
+            for row, score in zip(rows[order], scores[order])
+        ]
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Best available float32 reconstruction of the vectors at ``rows``."""
+        if self._full is not None:
+            return np.asarray(self._full.view()[rows])
+        scales = self._scales.view()[rows] if self._scales is not None else None
+        return normalize(self.codec.decode(self._codes.view()[rows], scales))
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held by vector codes (and index structures) in RAM and by the spill file."""
+        codes = self._codes.nbytes() if self._codes else 0
+        if self._scales is not None:
+            codes += self._scales.nbytes()
+        return {"codes_bytes": codes, "spill_bytes": self._full.nbytes() if self._full else 0}
+
+    def describe(self) -> Dict[str, Any]:
+        return {"index": "flat", "quantization": self.quantization, **self.memory_usage()}
+
+    def close(self) -> None:
+        if self._full is not None:
+            self._full.close()
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit centroids maximising cosine similarity."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        # Re-seed empty clusters with random points so every list stays useful
+        sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[start:start + SCORE_BLOCK] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), SCORE_BLOCK)
+    ]).astype(np.int32) if len(vectors) else np.empty(0, dtype=np.int32)
+
+
+class IVFIndex(FlatIndex):
+    """Inverted-file index: k-means coarse quantizer, queries scan the ``nprobe`` nearest lists.
+
+    Until ``min_train_size`` chunks are stored the index searches exhaustively. It is trained
+    then, and retrained on the live vectors whenever the corpus has grown ``retrain_growth``
+    times since the last training; in between, inserts go to their nearest list and deletes
+    are filtered out at query time (and dropped on compaction).
+    """
+
+    def __init__(self, quantization: str = "none", rerank_factor: int = 4,
+                 spill_dir: Optional[str] = None, nlist: int = 0, nprobe: int = 8,
+                 min_train_size: int = 10000, retrain_growth: float = 4.0) -> None:
+        super().__init__(quantization, rerank_factor, spill_dir)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._assign = _GrowableArray((), np.int32)
+        self._lists: List[_GrowableArray] = []
+
+    def _row_arrays(self) -> List[_GrowableArray]:
+        return super()._row_arrays() + [self._assign]
+
+    def _after_add(self, vectors: np.ndarray) -> None:
+        if self.centroids is None:
+            self._assign.append(np.full(len(vectors), -1, dtype=np.int32))
+            if len(self.rows) >= self.min_train_size:
+                self.train()
+            return
+        assign = _nearest(vectors, self.centroids)
+        start = len(self.ids) - len(vectors)
+        self._assign.append(assign)
+        for c in np.unique(assign):
+            self._lists[c].append(start + np.flatnonzero(assign == c).astype(np.int64))
+        if len(self.rows) >= self.retrain_growth * self.trained_size:
+            self.train()
+
+    def train(self, sample_size: int = 256, iterations: int = 10, seed: int = 0) -> None:
+        """(Re)build the coarse quantizer from the live vectors and re-assign every row."""
+        live = np.flatnonzero(self._alive.view())
+        if not len(live):
+            return
+        nlist = min(self.nlist or max(int(np.sqrt(len(live))), 1), len(live))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(live, size=min(len(live), sample_size * nlist), replace=False))
+        self.centroids = kmeans(self.vectors(sample), nlist, iterations, seed)
+        assign = np.full(len(self.ids), -1, dtype=np.int32)
+        for start in range(0, len(live), SCORE_BLOCK):
+            block = live[start:start + SCORE_BLOCK]
+            assign[block] = _nearest(self.vectors(block), self.centroids)
+        self._assign.size = 0
+        self._assign.append(assign)
+        self._rebuild_lists()
+        self.trained_size = len(live)
+
+    def _rebuild_lists(self) -> None:
+        assign = self._assign.view()
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+        self._lists = []
+        for c in range(len(self.centroids)):
+            rows = _GrowableArray((), np.int64)
+            rows.append(order[bounds[c]:bounds[c + 1]].astype(np.int64))
+            self._lists.append(rows)
+
+    def _compact(self) -> None:
+        super()._compact()
+        if self.centroids is not None:
+            self._rebuild_lists()
+
+    def _candidate_rows(self, query: np.ndarray, nprobe: Optional[int]) -> np.ndarray:
+        if self.centroids is None:
+            return super()._candidate_rows(query, nprobe)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.sort(np.concatenate([self._lists[c].view() for c in probe]))
+
+    def memory_usage(self) -> Dict[str, int]:
+        usage = super().memory_usage()
+        usage["index_bytes"] = (
+            (self.centroids.nbytes if self.centroids is not None else 0)
+            + self._assign.nbytes() + sum(rows.nbytes() for rows in self._lists)
+        )
+        return usage
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **super().describe(),
+            "index": "ivf",
+            "nlist": len(self.centroids) if self.centroids is not None else 0,
+            "nprobe": self.nprobe,
+            "trained_size": self.trained_size,
+        }
+
+
+def build_index(kind: str, quantization: str = "none", rerank_factor: int = 4,
+                spill_dir: Optional[str] = None, **ivf_options: Any) -> FlatIndex:
+    """``flat`` (exhaustive) or ``ivf`` index; ``ivf_options`` are IVFIndex parameters."""
+    if kind == "flat":
+        return FlatIndex(quantization, rerank_factor, spill_dir)
+    if kind == "ivf":
+        return IVFIndex(quantization, rerank_factor, spill_dir, **ivf_options)
+    raise ValueError(f"Unknown vector index {kind!r}; expected 'flat' or 'ivf'")
+
+
+PARTITIONINGS = ("none", "user", "shard")
+
+
+def partition_key(owner: Any, mode: str, shards: int) -> str:
+    """Partition holding an owner's vectors: one per owner, per shard of owners, or one."""
+    if mode == "none":
+        return "all"
+    if owner is None:
+        return "shared"
+    if mode == "user":
+        return f"u{owner}"
+    if mode == "shard":
+        number = owner if isinstance(owner, int) else zlib.crc32(str(owner).encode())
+        return f"s{number % max(shards, 1)}"
+    raise ValueError(f"Unknown vector partitioning {mode!r}; expected one of {PARTITIONINGS}")
+
+
+class PartitionedIndex:
+    """Sub-indexes keyed by ``partition_key`` of each chunk's ``key`` metadata value."""
+
+    def __init__(self, factory: Callable[[], FlatIndex], key: str = "user_id",
+                 mode: str = "user", shards: int = 16) -> None:
+        partition_key(1, mode, shards)  # validate early
+        self.factory = factory
+        self.key = key
+        self.mode = mode
+        self.shards = shards
+        self.partitions: Dict[str, FlatIndex] = {}
+        self._partition_of: Dict[str, str] = {}  # chunk id -> partition
+
+    def __len__(self) -> int:
+        return len(self._partition_of)
+
+    def partition_for(self, owner: Any) -> str:
+        return partition_key(owner, self.mode, self.shards)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], vectors: Any,
+            metas: Sequence[Dict[str, Any]]) -> None:
+        vectors = normalize(vectors)
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for position, meta in enumerate(metas):
+            groups[self.partition_for(meta.get(self.key))].append(position)
+        for name, positions in groups.items():
+            chunk_ids = [ids[p] for p in positions]
+            # A chunk re-added under another owner must leave its old partition
+            self.remove([c for c in chunk_ids if self._partition_of.get(c, name) != name])
+            if name not in self.partitions:
+                self.partitions[name] = self.factory()
+            self.partitions[name].add(
+                chunk_ids, [texts[p] for p in positions], vectors[positions],
+                [metas[p] for p in positions],
+            )
+            for chunk_id in chunk_ids:
+                self._partition_of[chunk_id] = name
+
+    def remove(self, ids: Iterable[str]) -> int:
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for chunk_id in ids:
+            name = self._partition_of.pop(chunk_id, None)
+            if name is not None:
+                groups[name].append(chunk_id)
+        removed = 0
+        for name, chunk_ids in groups.items():
+            removed += self.partitions[name].remove(chunk_ids)
+            if not len(self.partitions[name]):
+                self.partitions.pop(name).close()
+        return removed
+
+    def _by_partition(self, ids: Iterable[str]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for chunk_id in ids:
+            name = self._partition_of.get(chunk_id)
+            if name is not None:
+                groups[name].append(chunk_id)
+        return groups
+
+    def get(self, ids: Iterable[str]) -> Dict[str, Tuple[np.ndarray, Dict[str, Any]]]:
+        found: Dict[str, Tuple[np.ndarray, Dict[str, Any]]] = {}
+        for name, chunk_ids in self._by_partition(ids).items():
+            found.update(self.partitions[name].get(chunk_ids))
+        return found
+
+    def update_metadata(self, ids: Iterable[str], values: Dict[str, Any]) -> None:
+        # The partition key itself is not expected to change
+        for name, chunk_ids in self._by_partition(ids).items():
+            self.partitions[name].update_metadata(chunk_ids, values)
+
+    def rows_where(self, predicate: Any, owner: Any = None) -> List[str]:
+        """Ids of live chunks matching ``predicate``, only in ``owner``'s partition if given."""
+        if owner is not None:
+            partition = self.partitions.get(self.partition_for(owner))
+            return partition.rows_where(predicate) if partition else []
+        return [chunk_id for partition in list(self.partitions.values())
+                for chunk_id in partition.rows_where(predicate)]
+
+    def partition_names(self) -> List[str]:
+        return list(self.partitions)
+
+    def search_partition(self, name: str, query: Any, k: int,
+                         where: Optional[Dict[str, Any]] = None,
+                         nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        partition = self.partitions.get(name)
+        return partition.search(query, k, where, nprobe=nprobe) if partition else []
+
+    def search(self, query: Any, k: int, where: Optional[Dict[str, Any]] = None,
+               nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Search the owner's partition when ``where`` names one, otherwise every partition."""
+        if where and self.key in where:
+            rest = dict(where)
+            owner = rest.pop(self.key) if self.mode == "user" else rest[self.key]
+            return self.search_partition(self.partition_for(owner), query, k, rest or None, nprobe)
+        results = [r for name in self.partition_names()
+                   for r in self.search_partition(name, query, k, where, nprobe)]
+        return sorted(results, key=lambda r: r["distance"])[:k]
+
+    def train(self) -> None:
+        for partition in list(self.partitions.values()):
+            if hasattr(partition, "train"):
+                partition.train()
+
+    def memory_usage(self) -> Dict[str, int]:
+        usage: Dict[str, int] = defaultdict(int)
+        for partition in list(self.partitions.values()):
+            for name, value in partition.memory_usage().items():
+                usage[name] += value
+        return dict(usage)
+
+    def describe(self) -> Dict[str, Any]:
+        sample = self.factory().describe()
+        sample.update(self.memory_usage())
+        if "nlist" in sample:
+            sample["nlist"] = sum(p.describe()["nlist"] for p in self.partitions.values())
+        return {**sample, "partitioning": self.mode, "partitions": len(self.partitions)}
+
+    def close(self) -> None:
+        for partition in self.partitions.values():
+            partition.close()
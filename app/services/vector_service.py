@@ -0,0 +1,140 @@
+"""The vector store as a shared process, for API servers with several worker processes.
+
+A :class:`VectorStore` keeps its index (memory backend), its write-behind buffer and its
+Chroma client in the process that built it. With several workers each would hold its own
+copy, and Chroma does not support several processes writing one persist directory. The
+pre-fork server therefore runs a single vector store process that owns the store and serves
+it over a Unix socket; workers talk to it through :class:`VectorStoreProxy`, so an upload
+handled by one worker is searchable from every other.
+
+Set ``VECTOR_STORE_ADDRESS`` to connect to a store served separately:
+
+    python -m app.services.vector_service --address /run/intellidoc/vectors.sock
+"""
+import os
+import signal
+import sys
+import time
+from multiprocessing.managers import BaseManager, BaseProxy
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+from .vector_store import VectorStore
+
+_store: Optional[VectorStore] = None
+
+
+def _get_store() -> Optional[VectorStore]:
+    return _store
+
+
+class VectorStoreProxy(BaseProxy):
+    """Client side of the shared store, with the methods the API uses.
+
+    Chunking is pure text processing and runs locally.
+    """
+
+    _exposed_ = ("add_document", "update_chunks", "get_chunks", "search_documents",
+                 "search_all", "delete_document", "delete_documents", "flush",
+                 "get_collection_stats", "train_index")
+
+    split_text = VectorStore.split_text
+    _split_text = VectorStore._split_text
+    chunk_count = VectorStore.chunk_count
+
+    def _call(self, name: str, args: Any = (), kwargs: Any = None) -> Any:
+        return self._callmethod(name, args, kwargs or {})
+
+    def add_document(self, *args: Any, **kwargs: Any) -> bool:
+        return self._call("add_document", args, kwargs)
+
+    def update_chunks(self, *args: Any, **kwargs: Any) -> bool:
+        return self._call("update_chunks", args, kwargs)
+
+    def get_chunks(self, *args: Any, **kwargs: Any) -> Dict[int, Any]:
+        return self._call("get_chunks", args, kwargs)
+
+    def search_documents(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        return self._call("search_documents", args, kwargs)
+
+    def search_all(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        return self._call("search_all", args, kwargs)
+
+    def delete_document(self, *args: Any, **kwargs: Any) -> bool:
+        return self._call("delete_document", args, kwargs)
+
+    def delete_documents(self, *args: Any, **kwargs: Any) -> None:
+        return self._call("delete_documents", args, kwargs)
+
+    def flush(self) -> int:
+        return self._call("flush")
+
+    def get_collection_stats(self) -> Dict[str, Any]:
+        return self._call("get_collection_stats")
+
+    def train_index(self) -> None:
+        return self._call("train_index")
+
+    def close(self) -> None:
+        """Nothing to release: the store process flushes its buffer when it stops."""
+
+
+class VectorStoreManager(BaseManager):
+    pass
+
+
+VectorStoreManager.register("vector_store", callable=_get_store, proxytype=VectorStoreProxy)
+
+
+def authkey() -> bytes:
+    return (settings.vector_store_authkey or "").encode()
+
+
+def serve(address: str) -> None:
+    """Build the vector store and serve it on the Unix socket ``address`` until SIGTERM."""
+    global _store
+
+    def stop(signum: int, frame: Any) -> None:
+        raise SystemExit(0)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    if os.path.exists(address):
+        os.unlink(address)
+    _store = VectorStore()
+    server = VectorStoreManager(address=address, authkey=authkey()).get_server()
+    print(f"Vector store ({_store.backend}) serving on {address} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        # serve_forever ends with sys.exit; flush the write-behind buffer first
+        _store.close()
+
+
+def connect(address: str, timeout: float = 30.0) -> VectorStore:
+    """Proxy for the store served at ``address`` (a :class:`VectorStoreProxy`, used like the
+    store itself), waiting up to ``timeout`` for it to start."""
+    deadline = time.monotonic() + timeout
+    while True:
+        manager = VectorStoreManager(address=address, authkey=authkey())
+        try:
+            manager.connect()
+            return manager.vector_store()  # type: ignore[attr-defined]
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="IntelliDoc shared vector store process")
+    parser.add_argument("--address", default=settings.vector_store_address,
+                        help="Unix socket path to serve on")
+    args = parser.parse_args()
+    if not args.address:
+        parser.error("--address (or VECTOR_STORE_ADDRESS) is required")
+    serve(args.address)
+    sys.exit(0)
@@ -1,14 +1,87 @@
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Dict, Any, Optional, Sequence, Tuple
+import functools
 import os
+import threading
+import time
+import numpy as np
 from ..config import settings
+from ..metrics import timed
+from .ai_service import DEFAULT_EMBEDDER
+from .vector_index import PartitionedIndex, build_index, partition_key
+
+# Chroma rejects very large add/upsert calls; batches are split to this many chunks
+CHROMA_MAX_BATCH = 5000
+# Searches restricted to one embedding space fetch this many times the results, since chunks
+# indexed before routing (no embedding_model key) can only be told apart afterwards
+SPACE_OVERFETCH = 2
+_ALL = object()  # flush(): every owner
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _search_executor() -> ThreadPoolExecutor:
+    # Created on first use so pre-forked workers each get their own threads
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.vector_search_workers,
+                                           thread_name_prefix="intellidoc-vector-search")
+        return _executor
+
+
+def _space_where(where: Optional[Dict[str, Any]], embedding_model: str) -> Optional[Dict[str, Any]]:
+    # Chunks of the default embedder may predate the key, so they are only post-filtered
+    if embedding_model == DEFAULT_EMBEDDER:
+        return where
+    return {**(where or {}), "embedding_model": embedding_model}
+
+
+def _in_space(results: List[Dict[str, Any]], embedding_model: str) -> List[Dict[str, Any]]:
+    return [r for r in results
+            if r["metadata"].get("embedding_model", DEFAULT_EMBEDDER) == embedding_model]
+
+
+def merge_results(result_lists: List[List[Dict[str, Any]]], n_results: int) -> List[Dict[str, Any]]:
+    """Merge searches of several embedding spaces by distance (all cosine)."""
+    return sorted((r for results in result_lists for r in results),
+                  key=lambda r: r["distance"])[:n_results]
+
 
 class VectorStore:
-    def __init__(self) -> None:
-        # Try chromadb; if unavailable, fall back to a minimal in-memory store
+    def __init__(self, backend: Optional[str] = None, collection_name: str = "documents",
+                 quantization: Optional[str] = None, index: Optional[str] = None,
+                 partitioning: Optional[str] = None, batch_size: Optional[int] = None) -> None:
+        # Try chromadb; if unavailable, fall back to a minimal in-memory store.
+        # ``backend`` ("auto", "chroma" or "memory") overrides settings.vector_backend;
+        # ``quantization`` and ``index`` override settings.vector_quantization and
+        # settings.vector_index (memory backend only); ``partitioning`` overrides
+        # settings.vector_partitioning and ``batch_size`` settings.vector_write_batch_size.
+        backend = backend or settings.vector_backend
+        self.partitioning = partitioning or settings.vector_partitioning
+        partition_key(1, self.partitioning, settings.vector_shards)  # validate early
+        self.collection_name = collection_name
         self._use_memory = False
+        # Write-behind buffer: pending adds per document and pending deletes (doc -> owner),
+        # flushed in batches by size, age (background thread), owner reads, flush() or close()
+        self.batch_size = settings.vector_write_batch_size if batch_size is None else batch_size
+        self.flush_interval = settings.vector_write_flush_interval
+        self._pending_adds: Dict[str, Dict[str, Any]] = {}
+        self._pending_deletes: Dict[str, Optional[int]] = {}
+        self._pending_chunks = 0
+        self._oldest_pending: Optional[float] = None
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        # Guards the in-memory index (chroma does its own locking)
+        self._index_lock = threading.RLock()
         try:
-            import chromadb  # type: ignore
-            from chromadb.config import Settings  # type: ignore
+            if backend == "memory":
+                raise ImportError("memory backend requested")
+            import chromadb
+            from chromadb.config import Settings
 
             fast_init = os.getenv("INTELLIDOC_FAST_INIT") == "1"
             if fast_init:
@@ -18,94 +91,537 @@ class VectorStore:
                     path=settings.chroma_persist_dir,
                     settings=Settings(anonymized_telemetry=False),
                 )
-            self.collection = self.client.get_or_create_collection(
-                name="documents",
-                metadata={"hnsw:space": "cosine"},
-            )
+            self._collections: Dict[str, Any] = {}
+            # The unpartitioned collection; with partitioning it only holds legacy data,
+            # moved into the partitions below (see repartition())
+            self.collection = self._get_collection(collection_name)
         except Exception:
+            if backend == "chroma":
+                raise
             # In-memory fallback
             self._use_memory = True
-            self._memory_docs: Dict[str, Tuple[str, List[float], Dict[str, Any]]] = {}
-    
-    def add_document(self, doc_id: str, text: str, embeddings: List[float], metadata: Dict[str, Any]) -> bool:
-        """Add document to vector store."""
+            self._index = PartitionedIndex(
+                lambda: build_index(
+                    index or settings.vector_index,
+                    quantization or settings.vector_quantization,
+                    rerank_factor=settings.vector_rerank_factor,
+                    spill_dir=settings.vector_spill_dir,
+                    nlist=settings.vector_ivf_nlist,
+                    nprobe=settings.vector_ivf_nprobe,
+                    min_train_size=settings.vector_ivf_min_train,
+                ),
+                mode=self.partitioning,
+                shards=settings.vector_shards,
+            )
+        if not self._use_memory and self.partitioning != "none":
+            try:
+                moved = self.repartition()
+                if moved:
+                    print(f"Moved {moved} legacy chunk(s) into {self.partitioning} partitions")
+            except Exception as e:
+                print(f"Error repartitioning legacy vectors: {e}")
+
+    @property
+    def backend(self) -> str:
+        return "memory" if self._use_memory else "chroma"
+
+    def _partition(self, owner: Any) -> str:
+        return partition_key(owner, self.partitioning, settings.vector_shards)
+
+    def _get_collection(self, name: str) -> Any:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self.client.get_or_create_collection(
+                name=name, metadata={"hnsw:space": "cosine"}
+            )
+            self._collections[name] = collection
+        return collection
+
+    def _collection_for(self, owner: Any) -> Any:
+        """Chroma collection holding ``owner``'s vectors (one per user or per shard)."""
+        if self.partitioning == "none":
+            return self.collection
+        return self._get_collection(f"{self.collection_name}_{self._partition(owner)}")
+
+    def _existing_collections(self, owner: Any) -> List[Any]:
+        """``owner``'s collection if it exists, else none; reads and deletes use this so
+        they never create empty partitions."""
+        if self.partitioning == "none":
+            return [self.collection]
+        name = f"{self.collection_name}_{self._partition(owner)}"
+        collection = self._collections.get(name)
+        if collection is None:
+            try:
+                collection = self.client.get_collection(name=name)
+            except ValueError:  # chromadb's error for a missing collection
+                return []
+            self._collections[name] = collection
+        return [collection]
+
+    def _partition_collections(self) -> List[Any]:
+        if self.partitioning == "none":
+            return [self.collection]
+        prefix = f"{self.collection_name}_"
+        return [self._get_collection(c.name) for c in self.client.list_collections()
+                if c.name.startswith(prefix)]
+
+    @timed("vector_store", "add_document")
+    def add_document(self, doc_id: str, text: str, embeddings: np.ndarray,
+                     metadata: Dict[str, Any],
+                     chunk_metadata: Optional[List[Dict[str, Any]]] = None,
+                     page_breaks: Sequence[int] = ()) -> bool:
+        """Add document to vector store.
+
+        ``embeddings`` is either one vector shared by every chunk or one row per chunk;
+        ``chunk_metadata`` (one dict per chunk, e.g. language and embedding_model) is merged
+        into each chunk's metadata; ``page_breaks`` are as for :meth:`split_text`.
+        """
         try:
-            chunks = self._split_text(text)
-            if self._use_memory:
-                for i, chunk in enumerate(chunks):
-                    chunk_id = f"{doc_id}_chunk_{i}"
-                    self._memory_docs[chunk_id] = (chunk, embeddings, {**metadata, "chunk_index": i, "parent_doc_id": doc_id})
+            chunks = self.split_text(text, page_breaks)
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            if vectors.ndim == 1:
+                vectors = np.broadcast_to(vectors, (len(chunks), len(vectors)))
+            ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
+            metas = [{**metadata, **(chunk_metadata[i] if chunk_metadata else {}),
+                      "chunk_index": i, "parent_doc_id": doc_id}
+                     for i in range(len(chunks))]
+            write = {"owner": metadata.get("user_id"), "ids": ids, "chunks": chunks,
+                     "vectors": vectors, "metas": metas}
+            if not self.batch_size:
+                self._write({}, {doc_id: write})
                 return True
-            # chromadb path
-            ids = []
-            texts = []
-            embeds = []
-            metas = []
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{doc_id}_chunk_{i}"
-                ids.append(chunk_id)
-                texts.append(chunk)
-                embeds.append(embeddings)
-                metas.append({**metadata, "chunk_index": i, "parent_doc_id": doc_id})
-            self.collection.add(ids=ids, documents=texts, embeddings=embeds, metadatas=metas)
+            with self._buffer_lock:
+                previous = self._pending_adds.pop(doc_id, None)
+                self._pending_chunks += len(ids) - (len(previous["ids"]) if previous else 0)
+                self._pending_adds[doc_id] = write
+                self._mark_pending()
+            if self._pending_chunks >= self.batch_size:
+                self.flush()
             return True
         except Exception as e:
             print(f"Error adding document to vector store: {e}")
             return False
     
-    def search_documents(self, query_embeddings: List[float], n_results: int = 10, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Search for similar documents."""
+    def get_chunks(self, doc_id: str, indexes: Iterable[int], user_id: Optional[int] = None
+                   ) -> Dict[int, Tuple[np.ndarray, Dict[str, Any]]]:
+        """Stored vector and metadata of a document's chunks by chunk index (missing ones are
+        left out); with a lossy memory index the vector is its best reconstruction.
+        """
+        self.flush(user_id if user_id is not None else _ALL)
+        ids = {f"{doc_id}_chunk_{i}": i for i in indexes}
+        if not ids:
+            return {}
+        if self._use_memory:
+            with self._index_lock:
+                found = self._index.get(list(ids))
+            return {ids[chunk_id]: item for chunk_id, item in found.items()}
+        collections = (self._existing_collections(user_id) if user_id is not None
+                       else self._partition_collections())
+        chunks: Dict[int, Tuple[np.ndarray, Dict[str, Any]]] = {}
+        for collection in collections:
+            result = collection.get(ids=list(ids), include=["embeddings", "metadatas"])
+            for chunk_id, vector, meta in zip(result["ids"], result["embeddings"],
+                                              result["metadatas"]):
+                chunks[ids[chunk_id]] = (np.asarray(vector, dtype=np.float32), meta)
+        return chunks
+
+    @timed("vector_store", "update_chunks")
+    def update_chunks(self, doc_id: str, chunks: Dict[int, str], embeddings: np.ndarray,
+                      metadata: Dict[str, Any], chunk_metadata: List[Dict[str, Any]],
+                      chunk_count: int, previous_count: int,
+                      refresh_metadata: bool = False) -> bool:
+        """Rewrite only the changed chunks of an indexed document (for a new version of it).
+
+        ``chunks`` maps chunk index to new text, with one ``embeddings`` row and one
+        ``chunk_metadata`` dict each, in the same order; chunks from ``chunk_count`` up to
+        ``previous_count`` are deleted. ``refresh_metadata`` also writes the document-level
+        ``metadata`` (filename, category) to the chunks left in place. Written through,
+        after the owner's buffered writes.
+        """
+        owner = metadata.get("user_id")
+        try:
+            self.flush(owner)
+            ids = [f"{doc_id}_chunk_{i}" for i in chunks]
+            texts = list(chunks.values())
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            metas = [{**metadata, **extra, "chunk_index": i, "parent_doc_id": doc_id}
+                     for i, extra in zip(chunks, chunk_metadata)]
+            removed = [f"{doc_id}_chunk_{i}" for i in range(chunk_count, previous_count)]
+            kept = ([f"{doc_id}_chunk_{i}" for i in range(chunk_count) if i not in chunks]
+                    if refresh_metadata else [])
+            if self._use_memory:
+                with self._index_lock:
+                    self._index.remove(removed)
+                    if ids:
+                        self._index.add(ids, texts, vectors, metas)
+                    self._index.update_metadata(kept, metadata)
+                return True
+            collection = self._collection_for(owner)
+            for start in range(0, len(removed), CHROMA_MAX_BATCH):
+                collection.delete(ids=removed[start:start + CHROMA_MAX_BATCH])
+            for start in range(0, len(ids), CHROMA_MAX_BATCH):
+                end = start + CHROMA_MAX_BATCH
+                collection.upsert(
+                    ids=ids[start:end], documents=texts[start:end],
+                    embeddings=vectors[start:end].tolist(), metadatas=metas[start:end],
+                )
+            for start in range(0, len(kept), CHROMA_MAX_BATCH):
+                batch = collection.get(ids=kept[start:start + CHROMA_MAX_BATCH],
+                                       include=["metadatas"])
+                collection.update(ids=batch["ids"],
+                                  metadatas=[{**meta, **metadata} for meta in batch["metadatas"]])
+            return True
+        except Exception as e:
+            print(f"Error updating document chunks in vector store: {e}")
+            return False
+
+    @timed("vector_store", "search_documents")
+    def search_documents(self, query_embeddings: np.ndarray, n_results: int = 10,
+                         where: Optional[Dict[str, Any]] = None,
+                         nprobe: Optional[int] = None,
+                         embedding_model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents; ``nprobe`` overrides the IVF lists scanned.
+
+        ``embedding_model`` limits the search to chunks embedded by that model, the one that
+        produced ``query_embeddings`` (see :func:`merge_results` for searching several).
+        """
+        if embedding_model is not None:
+            results = self.search_documents(
+                query_embeddings, n_results * SPACE_OVERFETCH,
+                _space_where(where, embedding_model), nprobe,
+            )
+            return _in_space(results, embedding_model)[:n_results]
         try:
+            if self.pending_writes:
+                # Read-your-writes: apply the searching owner's buffered writes first
+                self.flush(where["user_id"] if where and "user_id" in where else _ALL)
             if self._use_memory:
-                def cosine(a: List[float], b: List[float]) -> float:
-                    import math
-                    if not a or not b or len(a) != len(b):
-                        return 0.0
-                    dot = sum(x * y for x, y in zip(a, b))
-                    na = math.sqrt(sum(x * x for x in a))
-                    nb = math.sqrt(sum(y * y for y in b))
-                    return dot / (na * nb) if na and nb else 0.0
-
-                matches = []
-                for chunk_id, (chunk_text, emb, meta) in self._memory_docs.items():
-                    if where and any(k in meta and meta[k] != v for k, v in where.items()):
-                        continue
-                    score = cosine(query_embeddings, emb)
-                    matches.append({"id": chunk_id, "document": chunk_text, "distance": 1 - score, "metadata": meta})
-                matches.sort(key=lambda m: m["distance"])
-                return matches[:n_results]
+                with self._index_lock:
+                    return self._index.search(query_embeddings, n_results, where, nprobe=nprobe)
 
             # chromadb path
-            results = self.collection.query(query_embeddings=[query_embeddings], n_results=n_results, where=where)
-            formatted_results = []
-            for i in range(len(results['ids'][0])):
-                formatted_results.append({
-                    "id": results['ids'][0][i],
-                    "document": results['documents'][0][i],
-                    "distance": results['distances'][0][i],
-                    "metadata": results['metadatas'][0][i]
-                })
-            return formatted_results
+            collection = self.collection
+            if where and "user_id" in where:
+                collections = self._existing_collections(where["user_id"])
+                if not collections:
+                    return []
+                collection = collections[0]
+                if self.partitioning == "user":
+                    where = {k: v for k, v in where.items() if k != "user_id"} or None
+            return self._query_collection(collection, query_embeddings, n_results, where)
         except Exception as e:
             print(f"Error searching vector store: {e}")
             return []
-    
-    def delete_document(self, doc_id: str) -> bool:
-        """Delete document from vector store."""
+
+    def _query_collection(self, collection: Any, query_embeddings: np.ndarray, n_results: int,
+                          where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        query = np.asarray(query_embeddings, dtype=np.float32).tolist()
+        if where and len(where) > 1:
+            # Chroma only accepts several conditions combined explicitly
+            where = {"$and": [{key: value} for key, value in where.items()]}
+        results = collection.query(query_embeddings=[query], n_results=n_results, where=where)
+        formatted_results = []
+        for i in range(len(results['ids'][0])):
+            formatted_results.append({
+                "id": results['ids'][0][i],
+                "document": results['documents'][0][i],
+                "distance": results['distances'][0][i],
+                "metadata": results['metadatas'][0][i]
+            })
+        return formatted_results
+
+    @timed("vector_store", "search_all")
+    def search_all(self, query_embeddings: np.ndarray, n_results: int = 10,
+                   user_ids: Optional[List[int]] = None,
+                   nprobe: Optional[int] = None,
+                   embedding_model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Cross-tenant search: queries partitions (or the given users) in parallel and merges.
+
+        ``embedding_model`` works as for :meth:`search_documents`.
+        """
+        self.flush()
+        k = n_results * SPACE_OVERFETCH if embedding_model is not None else n_results
+        space = _space_where(None, embedding_model) if embedding_model is not None else None
+        searches: List[Callable[[], List[Dict[str, Any]]]] = []
+        if self._use_memory:
+            if user_ids is not None:
+                for user_id in user_ids:
+                    searches.append(functools.partial(
+                        self._index.search, query_embeddings, k,
+                        {**(space or {}), "user_id": user_id}, nprobe=nprobe))
+            else:
+                for name in self._index.partition_names():
+                    searches.append(functools.partial(
+                        self._index.search_partition, name, query_embeddings, k, space,
+                        nprobe=nprobe))
+        elif user_ids is not None:
+            for user_id in user_ids:
+                searches.append(functools.partial(
+                    self.search_documents, query_embeddings, k,
+                    where={**(space or {}), "user_id": user_id}))
+        else:
+            for collection in self._partition_collections():
+                searches.append(functools.partial(
+                    self._query_collection, collection, query_embeddings, k, space))
         try:
-            if self._use_memory:
-                to_delete = [k for k, v in self._memory_docs.items() if v[2].get("parent_doc_id") == doc_id]
-                for k in to_delete:
-                    self._memory_docs.pop(k, None)
+            # The memory index is read by the pool threads while this thread holds its lock
+            with self._index_lock:
+                futures = [_search_executor().submit(search) for search in searches]
+                results = [r for future in futures for r in future.result()]
+        except Exception as e:
+            print(f"Error searching vector store: {e}")
+            return []
+        if embedding_model is not None:
+            results = _in_space(results, embedding_model)
+        return sorted(results, key=lambda r: r["distance"])[:n_results]
+
+    @timed("vector_store", "delete_document")
+    def delete_document(self, doc_id: str, user_id: Optional[int] = None) -> bool:
+        """Delete document from vector store; ``user_id`` limits the lookup to its partition.
+
+        Buffered: a failed write is retried by the next flush. Deletions that must be
+        confirmed (document deletion) use :meth:`delete_documents`.
+        """
+        try:
+            if not self.batch_size:
+                self._write({doc_id: user_id}, {})
                 return True
-            results = self.collection.get(where={"parent_doc_id": doc_id})
-            if results['ids']:
-                self.collection.delete(ids=results['ids'])
+            with self._buffer_lock:
+                # A buffered add of the same document is simply dropped
+                previous = self._pending_adds.pop(doc_id, None)
+                if previous:
+                    self._pending_chunks -= len(previous["ids"])
+                self._pending_deletes[doc_id] = user_id
+                self._mark_pending()
             return True
         except Exception as e:
             print(f"Error deleting document from vector store: {e}")
             return False
-    
+
+    @timed("vector_store", "delete_documents")
+    def delete_documents(self, chunk_counts: Dict[str, int], user_id: Optional[int] = None) -> None:
+        """Delete several documents at once, raising on failure so callers can retry.
+
+        ``chunk_counts`` maps document id to the number of chunks indexed for it; their ids
+        (``<doc>_chunk_<i>``) are deleted directly, without a metadata lookup. Documents with
+        an unknown count (0) fall back to a filtered delete. Unlike the buffered
+        :meth:`delete_document`, this returns only once the chunks are gone.
+        """
+        # Holding the flush lock, a flush in progress (and any writes it re-queues) completes
+        # before the buffered adds of these documents are dropped
+        with self._flush_lock:
+            with self._buffer_lock:
+                # Buffered adds of these documents must not be written afterwards
+                for doc_id in chunk_counts:
+                    previous = self._pending_adds.pop(doc_id, None)
+                    if previous:
+                        self._pending_chunks -= len(previous["ids"])
+            ids = [f"{doc_id}_chunk_{i}" for doc_id, count in chunk_counts.items()
+                   for i in range(count)]
+            if self._use_memory:
+                with self._index_lock:
+                    self._index.remove(ids)
+            elif ids:
+                collections = (self._existing_collections(user_id) if user_id is not None
+                               else self._partition_collections())
+                for collection in collections:
+                    for start in range(0, len(ids), CHROMA_MAX_BATCH):
+                        collection.delete(ids=ids[start:start + CHROMA_MAX_BATCH])
+            unknown = {doc_id: user_id for doc_id, count in chunk_counts.items() if not count}
+            if unknown:
+                self._write(unknown, {})
+
+    # -- write-behind buffer --------------------------------------------------------------
+
+    def _mark_pending(self) -> None:
+        if self._oldest_pending is None:
+            self._oldest_pending = time.monotonic()
+        if self._flusher is None and self.flush_interval > 0:
+            # Started on first use so pre-forked workers each run their own flusher
+            self._flusher = threading.Thread(target=self._flush_periodically,
+                                             name="intellidoc-vector-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval / 2):
+            oldest = self._oldest_pending
+            if oldest is not None and time.monotonic() - oldest >= self.flush_interval:
+                self.flush()
+
+    @property
+    def pending_writes(self) -> int:
+        return self._pending_chunks + len(self._pending_deletes)
+
+    @timed("vector_store", "flush")
+    def flush(self, owner: Any = _ALL) -> int:
+        """Apply buffered writes (only ``owner``'s, if given); returns the operations taken.
+
+        Deletes are applied before adds, so a document deleted and re-added in the same
+        batch ends up with only its new chunks. Writes that fail stay buffered and are retried
+        by the next flush. The buffer belongs to the process holding the store; the pre-fork
+        server's workers share one (see app.services.vector_service).
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                if owner is _ALL:
+                    deletes, adds = self._pending_deletes, self._pending_adds
+                    self._pending_deletes, self._pending_adds = {}, {}
+                else:
+                    partition = self._partition(owner)
+                    deletes = {d: u for d, u in self._pending_deletes.items()
+                               if u is None or self._partition(u) == partition}
+                    adds = {d: w for d, w in self._pending_adds.items()
+                            if self._partition(w["owner"]) == partition}
+                    for doc_id in deletes:
+                        del self._pending_deletes[doc_id]
+                    for doc_id in adds:
+                        del self._pending_adds[doc_id]
+                self._pending_chunks -= sum(len(w["ids"]) for w in adds.values())
+                if not self._pending_adds and not self._pending_deletes:
+                    self._oldest_pending = None
+            if deletes or adds:
+                self._apply(deletes, adds)
+            return len(deletes) + len(adds)
+
+    def _apply(self, deletes: Dict[str, Optional[int]], adds: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            self._write(deletes, adds)
+            return
+        except Exception as e:
+            print(f"Error writing batch to vector store: {e}")
+        # Retry document by document so one bad write does not hold back the rest
+        failed_deletes: Dict[str, Optional[int]] = {}
+        failed_adds: Dict[str, Dict[str, Any]] = {}
+        for doc_id, owner in deletes.items():
+            try:
+                self._write({doc_id: owner}, {})
+            except Exception:
+                failed_deletes[doc_id] = owner
+        for doc_id, write in adds.items():
+            if doc_id in failed_deletes:
+                failed_adds[doc_id] = write  # must not be written before its delete
+                continue
+            try:
+                self._write({}, {doc_id: write})
+            except Exception:
+                failed_adds[doc_id] = write
+        if failed_deletes or failed_adds:
+            print(f"Re-queued {len(failed_deletes) + len(failed_adds)} failed vector writes")
+            self._requeue(failed_deletes, failed_adds)
+
+    def _requeue(self, deletes: Dict[str, Optional[int]], adds: Dict[str, Dict[str, Any]]) -> None:
+        """Put failed writes back into the buffer; writes buffered since the flush win."""
+        with self._buffer_lock:
+            newer_deletes = set(self._pending_deletes)
+            for doc_id, write in adds.items():
+                if doc_id not in self._pending_adds and doc_id not in newer_deletes:
+                    self._pending_adds[doc_id] = write
+                    self._pending_chunks += len(write["ids"])
+            for doc_id, owner in deletes.items():
+                self._pending_deletes.setdefault(doc_id, owner)
+            if self._pending_adds or self._pending_deletes:
+                self._mark_pending()
+
+    def _write(self, deletes: Dict[str, Optional[int]], adds: Dict[str, Dict[str, Any]]) -> None:
+        """Write a batch: deletes grouped per partition, then adds grouped per partition."""
+        if self._use_memory:
+            with self._index_lock:
+                for owner, doc_ids in self._group_deletes(deletes).items():
+                    self._index.remove(self._index.rows_where(
+                        lambda meta: meta.get("parent_doc_id") in doc_ids, owner=owner
+                    ))
+                if adds:
+                    writes = list(adds.values())
+                    self._index.add(
+                        [i for w in writes for i in w["ids"]],
+                        [c for w in writes for c in w["chunks"]],
+                        np.concatenate([w["vectors"] for w in writes]),
+                        [m for w in writes for m in w["metas"]],
+                    )
+            return
+        for owner, doc_ids in self._group_deletes(deletes).items():
+            collections = (self._existing_collections(owner) if owner is not None
+                           else self._partition_collections())
+            for collection in collections:
+                collection.delete(where={"parent_doc_id": {"$in": sorted(doc_ids)}})
+        by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for write in adds.values():
+            by_collection.setdefault(self._collection_for(write["owner"]).name, []).append(write)
+        for name, writes in by_collection.items():
+            ids = [i for w in writes for i in w["ids"]]
+            documents = [c for w in writes for c in w["chunks"]]
+            embeddings = np.concatenate([w["vectors"] for w in writes]).tolist()
+            metadatas = [m for w in writes for m in w["metas"]]
+            for start in range(0, len(ids), CHROMA_MAX_BATCH):
+                end = start + CHROMA_MAX_BATCH
+                self._get_collection(name).upsert(
+                    ids=ids[start:end], documents=documents[start:end],
+                    embeddings=embeddings[start:end], metadatas=metadatas[start:end],
+                )
+
+    def _group_deletes(self, deletes: Dict[str, Optional[int]]) -> Dict[Any, set]:
+        groups: Dict[Any, set] = {}
+        for doc_id, owner in deletes.items():
+            groups.setdefault(owner, set()).add(doc_id)
+        return groups
+
+    def close(self) -> None:
+        """Flush buffered writes and stop the background flusher (shutdown)."""
+        self._closed.set()
+        self.flush()
+        if self.pending_writes:
+            print(f"{self.pending_writes} vector writes could not be applied before shutdown")
+
+    def repartition(self, batch_size: int = 1000) -> int:
+        """Move chunks from the unpartitioned chroma collection into per-owner collections.
+
+        Each batch is deleted from the old collection once copied, so an interrupted run
+        resumes where it stopped. Runs when the store is created with partitioning enabled.
+        """
+        if self._use_memory or self.partitioning == "none":
+            return 0
+        moved = 0
+        while True:
+            batch = self.collection.get(limit=batch_size,
+                                        include=["embeddings", "documents", "metadatas"])
+            if not batch["ids"]:
+                return moved
+            owners: Dict[Any, List[int]] = {}
+            for position, meta in enumerate(batch["metadatas"]):
+                owners.setdefault(meta.get("user_id"), []).append(position)
+            for owner, positions in owners.items():
+                self._collection_for(owner).upsert(
+                    ids=[batch["ids"][p] for p in positions],
+                    embeddings=[batch["embeddings"][p] for p in positions],
+                    documents=[batch["documents"][p] for p in positions],
+                    metadatas=[batch["metadatas"][p] for p in positions],
+                )
+            self.collection.delete(ids=batch["ids"])
+            moved += len(batch["ids"])
+
+    def train_index(self) -> None:
+        """(Re)train the memory backend's IVF quantizer on the current vectors."""
+        self.flush()
+        if self._use_memory and hasattr(self._index, "train"):
+            with self._index_lock:
+                self._index.train()
+
+    def chunk_count(self, text: str, page_breaks: Sequence[int] = ()) -> int:
+        """Number of chunks ``add_document`` stores for ``text``."""
+        return len(self.split_text(text, page_breaks))
+
+    def split_text(self, text: str, page_breaks: Sequence[int] = ()) -> List[str]:
+        """The chunks ``add_document`` stores for ``text``, in order.
+
+        Pages (starting at the offsets ``page_breaks``, see ``join_pages``) are chunked on
+        their own, so an edit to one page leaves the other pages' chunks unchanged.
+        """
+        if not page_breaks:
+            return self._split_text(text)
+        bounds = [0, *page_breaks, len(text)]
+        pages = (text[start:end].strip() for start, end in zip(bounds, bounds[1:]))
+        return [chunk for page in pages if page for chunk in self._split_text(page)]
+
     def _split_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """Split text into chunks with overlap."""
         if len(text) <= chunk_size:
@@ -135,9 +651,20 @@ class VectorStore:
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the collection."""
         try:
+            self.flush()
             if self._use_memory:
-                return {"total_documents": len(self._memory_docs), "collection_name": "memory"}
-            count = self.collection.count()
-            return {"total_documents": count, "collection_name": self.collection.name}
+                with self._index_lock:
+                    return {
+                        "total_documents": len(self._index),
+                        "collection_name": "memory",
+                        **self._index.describe(),
+                    }
+            collections = self._partition_collections()
+            return {
+                "total_documents": sum(c.count() for c in collections),
+                "collection_name": self.collection_name,
+                "partitioning": self.partitioning,
+                "partitions": len(collections),
+            }
         except Exception as e:
             return {"total_documents": 0, "error": str(e)}
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""Chunk-level diffs between two versions of a document.
+
+A new version is split into chunks exactly as it will be indexed and each chunk is compared
+by hash with the chunk indexed at the same position. Only positions whose text differs are
+rewritten in the vector store, and only text that occurs nowhere in the previous version is
+embedded again: a chunk that merely moved (a page inserted before it) takes the vector
+stored for its old position.
+"""
+import hashlib
+from typing import Any, Dict, List
+
+from ..config import settings
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def diff_chunks(old_chunks: List[str], new_chunks: List[str]) -> Dict[str, Any]:
+    """Compare the chunks of two versions.
+
+    Returns ``changed`` (new chunk indexes whose text differs from the chunk indexed there),
+    ``reuse`` (changed index -> index of an identical old chunk), ``embed`` (the changed
+    indexes without one), ``removed`` (old indexes past the new last chunk) and
+    ``added_chars``/``removed_chars`` (text only in the new/only in the old version).
+    """
+    old_hashes = [chunk_hash(chunk) for chunk in old_chunks]
+    new_hashes = [chunk_hash(chunk) for chunk in new_chunks]
+    old_positions: Dict[str, int] = {}
+    for i, digest in enumerate(old_hashes):
+        old_positions.setdefault(digest, i)
+    changed = [i for i, digest in enumerate(new_hashes)
+               if i >= len(old_hashes) or old_hashes[i] != digest]
+    reuse = {i: old_positions[new_hashes[i]] for i in changed if new_hashes[i] in old_positions}
+    embed = [i for i in changed if i not in reuse]
+    kept = set(new_hashes)
+    return {
+        "changed": changed,
+        "reuse": reuse,
+        "embed": embed,
+        "removed": list(range(len(new_chunks), len(old_chunks))),
+        "added_chars": sum(len(new_chunks[i]) for i in embed),
+        "removed_chars": sum(len(chunk) for chunk, digest in zip(old_chunks, old_hashes)
+                             if digest not in kept),
+    }
+
+
+def update_mode(diff: Dict[str, Any], text_length: int) -> str:
+    """How much of the analysis to redo: ``unchanged``, ``incremental`` or ``full``.
+
+    ``incremental`` while the added or removed text (whichever is larger, so a rewritten
+    passage counts once) stays within ``settings.version_incremental_ratio`` of the new text.
+    """
+    changed_chars = max(diff["added_chars"], diff["removed_chars"])
+    if not changed_chars:
+        return "unchanged"
+    if changed_chars <= settings.version_incremental_ratio * max(text_length, 1):
+        return "incremental"
+    return "full"
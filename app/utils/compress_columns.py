@@ -0,0 +1,119 @@
+"""Rewrite stored document text and analysis results in the compressed column format.
+
+Rows are read and updated in id order, ``--batch-size`` at a time with a commit per batch,
+so the tool can run against a live database and be interrupted and resumed. Legacy
+``str(dict)`` analysis results are converted to JSON on the way.
+
+Usage: python -m app.utils.compress_columns [--batch-size N] [--codec zlib|zstd|none] [--vacuum]
+"""
+import argparse
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import LargeBinary
+
+from ..config import settings
+from ..db_types import compress_text, decompress_text, dump_json, load_json, stored_codec
+
+# table -> {column: holds JSON}
+COLUMNS: Dict[str, Dict[str, bool]] = {
+    "documents": {"content": False, "summary": False},
+    "document_analyses": {"result": True},
+}
+
+
+def _encode(value: Any, is_json: bool, codec: str) -> Optional[bytes]:
+    """The value as the compressed column types would write it, or None if already so."""
+    if value is None:
+        return None
+    current = stored_codec(value)
+    decoded = decompress_text(value)
+    if is_json and current == "text":
+        decoded = dump_json(load_json(decoded))
+    encoded = compress_text(decoded, codec)
+    return None if current != "text" and stored_codec(encoded) == current else encoded
+
+
+def _ensure_binary_columns(engine: Engine) -> None:
+    """PostgreSQL keeps TEXT and bytes apart: convert legacy TEXT columns to BYTEA in place."""
+    if engine.dialect.name != "postgresql":
+        return
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in COLUMNS.items():
+            types = {c["name"]: c["type"] for c in inspector.get_columns(table)}
+            for column in columns:
+                if not isinstance(types[column], LargeBinary):
+                    conn.execute(text(
+                        f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BYTEA "
+                        f"USING convert_to({column}, 'UTF8')"
+                    ))
+
+
+def compress_columns(engine: Engine, batch_size: int = 500,
+                     codec: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """Re-encode every row; returns rows scanned/rewritten and stored bytes before/after."""
+    codec = codec or settings.db_compression
+    _ensure_binary_columns(engine)
+    report: Dict[str, Dict[str, int]] = {}
+    for table, columns in COLUMNS.items():
+        names = list(columns)
+        totals = {"rows": 0, "rewritten": 0, "bytes_before": 0, "bytes_after": 0}
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    text(f"SELECT id, {', '.join(names)} FROM {table} "
+                         f"WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                    {"last_id": last_id, "limit": batch_size},
+                ).fetchall()
+                updates: List[Dict[str, Any]] = []
+                for row in rows:
+                    changes: Dict[str, Any] = {}
+                    for name, value in zip(names, row[1:]):
+                        if value is None:
+                            continue
+                        before = len(value.encode("utf-8") if isinstance(value, str) else value)
+                        encoded = _encode(value, columns[name], codec)
+                        totals["bytes_before"] += before
+                        totals["bytes_after"] += before if encoded is None else len(encoded)
+                        if encoded is not None:
+                            changes[name] = encoded
+                    if changes:
+                        updates.append({"id": row[0], **changes})
+                for update in updates:
+                    assignments = ", ".join(f"{name} = :{name}" for name in update if name != "id")
+                    conn.execute(text(f"UPDATE {table} SET {assignments} WHERE id = :id"), update)
+            totals["rows"] += len(rows)
+            totals["rewritten"] += len(updates)
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1][0]
+        report[table] = totals
+    return report
+
+
+def main() -> None:
+    from ..database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--codec", choices=["zlib", "zstd", "none"], default=None,
+                        help="Default: settings.db_compression")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Reclaim the freed pages afterwards (SQLite VACUUM)")
+    args = parser.parse_args()
+
+    report = compress_columns(engine, batch_size=args.batch_size, codec=args.codec)
+    for table, totals in report.items():
+        print(f"{table}: rewrote {totals['rewritten']}/{totals['rows']} rows, "
+              f"{totals['bytes_before']} -> {totals['bytes_after']} bytes")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        print("Vacuumed database")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Delete uploaded files that no document references any more.
+
+Usage: python -m app.utils.gc_uploads [--grace-seconds N] [--dry-run]
+"""
+import argparse
+from ..database import SessionLocal
+from ..services.file_storage import build_storage, collect_garbage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grace-seconds", type=float, default=None,
+                        help="Keep orphans younger than this "
+                             "(default: settings.storage_gc_grace_seconds)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count orphaned files")
+    args = parser.parse_args()
+
+    storage = build_storage()
+    db = SessionLocal()
+    try:
+        report = collect_garbage(db, storage, grace_seconds=args.grace_seconds,
+                                 dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(f"Scanned {report['scanned']} {storage.name} file(s): {report['orphaned']} orphaned, "
+          f"{report['deleted']} deleted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Build MinHash signatures and LSH buckets for documents processed before deduplication.
+
+Usage: python -m app.utils.index_duplicates [--user-id ID] [--batch-size N]
+"""
+import argparse
+from ..database import SessionLocal
+from ..services.dedup import index_existing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=None, help="Only index this user")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = index_existing(db, user_id=args.user_id, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Indexed {report['indexed']} document(s), "
+          f"{report['duplicates']} near-duplicate(s) found")
+
+
+if __name__ == "__main__":
+    main()
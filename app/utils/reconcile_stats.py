@@ -0,0 +1,24 @@
+"""Rebuild the per-user dashboard rollups from the documents table.
+
+Usage: python -m app.utils.reconcile_stats [--user-id ID]
+"""
+import argparse
+from ..database import SessionLocal
+from .. import crud
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rebuilt = crud.rebuild_user_stats(db, user_id=args.user_id)
+    finally:
+        db.close()
+    print(f"Rebuilt dashboard stats for {rebuilt} user(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Move vectors from the unpartitioned chroma collection into per-owner collections.
+
+Chroma stores created before partitioning (or with VECTOR_PARTITIONING=none) keep every
+chunk in the "documents" collection. The vector store moves them when it starts with
+partitioning enabled; this runs the move on its own, e.g. ahead of a deploy.
+Usage: python -m app.utils.repartition_vectors [--batch-size N]
+"""
+import argparse
+from ..config import settings
+from ..services.vector_store import VectorStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Opened unpartitioned so the move runs here, with the requested batch size
+    store = VectorStore(backend="chroma", partitioning="none")
+    store.partitioning = settings.vector_partitioning
+    moved = store.repartition(batch_size=args.batch_size)
+    print(f"Moved {moved} chunk(s) into {store.partitioning} partitions")
+
+
+if __name__ == "__main__":
+    main()
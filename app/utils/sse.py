@@ -0,0 +1,76 @@
+"""Server-sent events: stream a worker thread's progress events to the client as they happen."""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from ..profiling import profiled
+from ..services.inference import InferenceSaturated
+
+# emit(event, data) as called from the worker thread
+Emit = Callable[[str, Dict[str, Any]], None]
+
+
+def format_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """One ``text/event-stream`` frame with a JSON payload."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def error_payload(exc: Exception) -> Dict[str, Any]:
+    """The status an equivalent non-streaming request would have answered with."""
+    if isinstance(exc, InferenceSaturated):
+        return {"status_code": exc.status_code, "retry_after": exc.retry_after,
+                "detail": f"Inference capacity for {exc.model} exhausted; retry later"}
+    if isinstance(exc, HTTPException):
+        return {"status_code": exc.status_code, "detail": exc.detail}
+    print(f"Error in event stream: {exc}")
+    return {"status_code": 500, "detail": "Internal server error"}
+
+
+async def stream_events(work: Callable[[Emit], Any],
+                        keepalive: float = 15.0) -> AsyncIterator[str]:
+    """Run ``work(emit)`` in the threadpool and yield every emitted event immediately.
+
+    The stream ends with ``done`` carrying work's return value, or ``error`` if it raised.
+    Comment frames are sent while idle so proxies keep the connection open.
+    """
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = asyncio.Queue()
+
+    def emit(event: str, data: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    # Completion is delivered through the loop after every event the worker emitted
+    task = asyncio.ensure_future(run_in_threadpool(profiled(work), emit))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    event_id = 0
+    while True:
+        try:
+            item = await asyncio.wait_for(queue.get(), keepalive)
+        except asyncio.TimeoutError:
+            yield ": keep-alive\n\n"
+            continue
+        if item is None:
+            break
+        event, data = item
+        yield format_event(event, data, event_id=event_id)
+        event_id += 1
+    try:
+        yield format_event("done", task.result(), event_id=event_id)
+    except Exception as e:
+        yield format_event("error", error_payload(e), event_id=event_id)
+
+
+def event_stream(work: Callable[[Emit], Any]) -> StreamingResponse:
+    """``text/event-stream`` response for :func:`stream_events`, unbuffered by proxies."""
+    return StreamingResponse(
+        stream_events(work),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
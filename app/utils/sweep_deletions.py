@@ -0,0 +1,42 @@
+"""Retry removing the vectors and files of deleted documents whose cleanup failed.
+
+Usage: python -m app.utils.sweep_deletions [--min-age-seconds N]
+"""
+import argparse
+from typing import Optional
+
+from ..config import settings
+from ..database import SessionLocal
+from ..services.deletion import sweep_pending_deletions
+from ..services.file_storage import build_storage
+from ..services.vector_service import connect
+from ..services.vector_store import VectorStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-age-seconds", type=float, default=60.0,
+                        help="Skip deletions younger than this (may still be in progress)")
+    args = parser.parse_args()
+
+    vector_store: Optional[VectorStore]
+    if settings.vector_store_address:
+        vector_store = connect(settings.vector_store_address)
+    else:
+        vector_store = VectorStore()
+    if isinstance(vector_store, VectorStore) and vector_store._use_memory:
+        # The in-memory index lives in the server process: POST /api/admin/deletions/sweep
+        print("Memory vector backend: only retrying file removal")
+        vector_store = None
+    db = SessionLocal()
+    try:
+        report = sweep_pending_deletions(db, vector_store, build_storage(),
+                                         min_age_seconds=args.min_age_seconds)
+    finally:
+        db.close()
+    print(f"Swept {report['pending']} pending deletion(s): {report['vectors']} vector and "
+          f"{report['files']} file cleanup(s) done, {report['remaining']} remaining")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class StageTimer:
+    """Accumulates wall-clock milliseconds per named processing stage."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.add(name, elapsed_ms)
+            record_stage(name, elapsed_ms, source=self)
+
+    def total_ms(self) -> float:
+        """Milliseconds since the timer was created."""
+        return (time.perf_counter() - self._started) * 1000
+
+
+# Timer of the HTTP request currently being served, set by the profiling middleware
+_request_timer: ContextVar[Optional[StageTimer]] = ContextVar(
+    "intellidoc_request_timer", default=None
+)
+
+
+def set_request_timer(timer: Optional[StageTimer]):
+    """Bind ``timer`` to the current request context; returns a reset token."""
+    return _request_timer.set(timer)
+
+
+def reset_request_timer(token) -> None:
+    _request_timer.reset(token)
+
+
+def record_stage(name: str, elapsed_ms: float, source: Optional[StageTimer] = None) -> None:
+    """Add a stage duration to the current request's breakdown, if one is being collected."""
+    timer = _request_timer.get()
+    if timer is not None and timer is not source:
+        timer.add(name, elapsed_ms)
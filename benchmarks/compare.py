@@ -0,0 +1,70 @@
+"""Compare two benchmark JSON reports.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.05]
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Keys that identify a run rather than measure it
+IDENTITY_KEYS = (
+    "format", "chars", "backend", "chunks", "dim", "index", "quantization", "partitioning",
+    "nprobe", "mode",
+)
+
+
+def _run_label(run: Dict[str, Any]) -> str:
+    return ",".join(f"{key}={run[key]}" for key in IDENTITY_KEYS if key in run)
+
+
+def flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """Flatten nested results to ``dotted.path -> number``; list items use their identity keys."""
+    flat: Dict[str, float] = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in IDENTITY_KEYS:
+                continue
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = _run_label(item) if isinstance(item, dict) else ""
+            flat.update(flatten(item, f"{prefix}[{label or index}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = float(value)
+    return flat
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any],
+            threshold: float = 0.0) -> Dict[str, Dict[str, Optional[float]]]:
+    """Relative change per metric present in both reports, filtered by ``threshold``."""
+    before = flatten(baseline["results"])
+    after = flatten(candidate["results"])
+    changes = {}
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = (new - old) / old if old else None
+        if change is None or abs(change) >= threshold:
+            changes[key] = {"baseline": old, "candidate": new, "change": change}
+    return changes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="Only show metrics that changed by at least this fraction")
+    args = parser.parse_args()
+    changes = compare(
+        json.loads(Path(args.baseline).read_text()),
+        json.loads(Path(args.candidate).read_text()),
+        args.threshold,
+    )
+    for key, row in changes.items():
+        change = "n/a" if row["change"] is None else f"{row['change']:+.1%}"
+        print(f"{key:<90} {row['baseline']:>12.3f} -> {row['candidate']:>12.3f}  {change}")
+
+
+if __name__ == "__main__":
+    main()
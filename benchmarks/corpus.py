@@ -0,0 +1,91 @@
+"""Deterministic synthetic corpora for benchmarks: plain text, DOCX and multi-page PDF."""
+import random
+from pathlib import Path
+from typing import List
+
+VOCABULARY = (
+    "agreement contract terms conditions invoice payment amount due legal court law attorney "
+    "financial revenue profit loss technical specification requirements medical patient "
+    "diagnosis treatment research study analysis paper the a of and to in for with on by "
+    "shall party parties section clause period notice liability warranty delivery schedule "
+    "report quarter results system module interface data model process service customer"
+).split()
+
+
+def make_text(n_chars: int, seed: int = 0) -> str:
+    """Sentence-structured pseudo text of roughly ``n_chars`` characters."""
+    rng = random.Random(seed)
+    sentences: List[str] = []
+    length = 0
+    while length < n_chars:
+        words = rng.choices(VOCABULARY, k=rng.randint(6, 18))
+        sentence = " ".join(words).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)[:n_chars]
+
+
+def write_txt(path: Path, text: str) -> Path:
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def write_docx(path: Path, text: str, paragraph_chars: int = 800) -> Path:
+    import docx
+
+    document = docx.Document()
+    for start in range(0, len(text), paragraph_chars):
+        document.add_paragraph(text[start:start + paragraph_chars])
+    document.save(str(path))
+    return path
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, text: str, chars_per_line: int = 90, lines_per_page: int = 50) -> Path:
+    """Write ``text`` as a Helvetica multi-page PDF without third-party dependencies."""
+    lines = [text[i:i + chars_per_line] for i in range(0, len(text), chars_per_line)] or [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    objects: List[bytes] = []
+    # 1: catalog, 2: page tree, 3: font; then (page, content) pairs
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page_lines in zip(page_ids, pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        body = "BT /F1 10 Tf 12 TL 40 760 Td " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in page_lines
+        ) + " ET"
+        stream = body.encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref_offset
+    )
+    path.write_bytes(bytes(out))
+    return path
+
+
+WRITERS = {
+    "text/plain": (".txt", write_txt),
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
+        ".docx", write_docx
+    ),
+    "application/pdf": (".pdf", write_pdf),
+}
@@ -0,0 +1,153 @@
+"""Latency, memory and output parity of the inference backends (torch / torch-int8 / onnx).
+
+Each (model, backend) pair is loaded in its own subprocess so load memory is measured
+cleanly; candidates are compared against the ``torch`` reference outputs.
+
+    python -m benchmarks.inference --output inference.json
+    python -m benchmarks.inference --models embedder,qa --backends torch,onnx
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .corpus import make_text
+from .run import _git_commit, _str_list, percentiles
+
+MODELS = ("classifier", "qa", "summarizer", "embedder")
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (
+        2**20 if sys.platform == "darwin" else 2**10
+    )
+
+
+def make_samples(kind: str, count: int, chars: int, seed: int) -> List[Any]:
+    """Deterministic inputs for one model kind."""
+    texts = [make_text(chars, seed=seed + i) for i in range(count)]
+    if kind == "embedder":
+        return [[text[:512] for text in texts[i:i + 8]] for i in range(0, count, 8)]
+    if kind == "qa":
+        return [
+            {"question": f"What does the {text.split()[3]} clause say?", "context": text}
+            for text in texts
+        ]
+    return texts
+
+
+def _jsonable(value: Any) -> Any:
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def measure(kind: str, backend: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Load one model on one backend and time it; runs inside the worker subprocess."""
+    from app.services.ai_service import MODEL_NAMES
+    from app.services.inference import MODEL_LOADERS, run_model
+
+    samples = make_samples(kind, args.samples, args.chars, args.seed)
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    model = MODEL_LOADERS[kind](MODEL_NAMES[kind], backend, "cpu", args.threads or None)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_loaded = _rss_mb()
+
+    for sample in samples[: args.warmup]:
+        run_model(kind, model, sample)
+    outputs, latencies = [], []
+    for sample in samples:
+        start = time.perf_counter()
+        outputs.append(run_model(kind, model, sample))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "model": MODEL_NAMES[kind],
+        "backend": backend,
+        "load_ms": load_ms,
+        "memory": {
+            "load_rss_mb": rss_loaded - rss_before,
+            "process_max_rss_mb": _rss_mb(),
+        },
+        "latency": percentiles(latencies),
+        "outputs": outputs,
+    }
+
+
+def _run_worker(kind: str, backend: str, argv: Sequence[str]) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.inference", *argv, "--worker", f"{kind}:{backend}"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"backend": backend, "error": proc.stderr.strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_inference_benchmarks(args: argparse.Namespace, argv: Sequence[str]) -> Dict[str, Any]:
+    from app.services.inference import compare_outputs
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "worker")},
+        },
+        "results": {},
+    }
+    for kind in args.models:
+        runs = {backend: _run_worker(kind, backend, argv)
+                for backend in dict.fromkeys(["torch", *args.backends])}
+        reference = runs["torch"]
+        for backend, run in runs.items():
+            outputs = run.pop("outputs", None)
+            if backend == "torch" or outputs is None or "outputs" not in reference:
+                continue
+            run["parity"] = compare_outputs(kind, reference["outputs"], outputs)
+            if reference.get("latency") and run.get("latency"):
+                run["speedup_p50"] = reference["latency"]["p50_ms"] / run["latency"]["p50_ms"]
+        reference.pop("outputs", None)
+        report["results"][kind] = runs
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="IntelliDoc inference backend benchmark")
+    parser.add_argument("--models", type=_str_list, default=list(MODELS))
+    parser.add_argument("--backends", type=_str_list, default=["torch-int8", "onnx"],
+                        help="Candidates compared against the torch reference")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--chars", type=int, default=2_000, help="Characters per input text")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    args = build_parser().parse_args(argv)
+    if args.worker:
+        kind, backend = args.worker.split(":", 1)
+        print(json.dumps(measure(kind, backend, args), default=_jsonable))
+        return
+    report = run_inference_benchmarks(args, argv)
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""Reproducible ingestion / search / QA benchmarks.
+
+Runs offline: models are replaced by AIService's built-in fallbacks (INTELLIDOC_FAST_INIT=1)
+and the corpus is generated deterministically from ``--seed``.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --suites search --search-sizes 1000,100000,1000000
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+os.environ.setdefault("INTELLIDOC_FAST_INIT", "1")
+
+from .corpus import WRITERS, make_text  # noqa: E402
+
+FORMATS = {
+    "txt": "text/plain",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+SUITES = ("ingestion", "search", "qa")
+
+
+def percentiles(samples_ms: Sequence[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 plus mean of millisecond samples."""
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+
+    def rank(fraction: float) -> float:
+        return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+    return {
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "mean_ms": sum(ordered) / len(ordered),
+    }
+
+
+@contextmanager
+def memory_high_water(result: Dict[str, Any], trace: bool = False) -> Iterator[None]:
+    """Record the process max RSS (and, if ``trace``, the Python heap peak) for the block.
+
+    tracemalloc slows allocation-heavy code noticeably, so it is opt-in and latencies from
+    traced runs should not be compared with untraced ones.
+    """
+    if trace:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        memory = {
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            "process_max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (2**20 if sys.platform == "darwin" else 2**10),
+        }
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory["python_peak_mb"] = peak / 2**20
+        result["memory"] = memory
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_ingestion(args: argparse.Namespace, workdir: Path) -> List[Dict[str, Any]]:
+    """Per-stage latency and throughput of the upload pipeline per format and size."""
+    from app.services.ai_service import AIService
+    from app.services.document_processor import DocumentProcessor
+    from app.services.vector_store import VectorStore
+    from app.utils.timing import StageTimer
+
+    processor = DocumentProcessor()
+    ai_service = AIService()
+    results = []
+    for fmt in args.formats:
+        mime_type = FORMATS[fmt]
+        suffix, writer = WRITERS[mime_type]
+        for n_chars in args.ingest_sizes:
+            store = VectorStore(backend="memory")
+            stages: Dict[str, List[float]] = {}
+            file_bytes = 0
+            for i in range(args.ingest_docs):
+                path = writer(workdir / f"doc_{fmt}_{n_chars}_{i}{suffix}",
+                              make_text(n_chars, seed=args.seed + i))
+                file_bytes += path.stat().st_size
+                timer = StageTimer()
+                with timer.stage("extraction"):
+                    text = processor.extract_text_from_file(str(path), mime_type)["text"]
+                with timer.stage("classification"):
+                    ai_service.classify_document(text)
+                with timer.stage("summarization"):
+                    ai_service.summarize_text(text)
+                with timer.stage("embedding"):
+                    embeddings = ai_service.get_embeddings([text])
+                with timer.stage("indexing"):
+                    store.add_document(str(i), text, embeddings[0], {"user_id": 1})
+                timer.stages["total"] = sum(timer.stages.values())
+                for stage, ms in timer.stages.items():
+                    stages.setdefault(stage, []).append(ms)
+            results.append({
+                "format": fmt,
+                "chars": n_chars,
+                "documents": args.ingest_docs,
+                "mb_per_doc": file_bytes / args.ingest_docs / 2**20,
+                "stages": {
+                    stage: {
+                        **percentiles(samples),
+                        "docs_per_s": (len(samples) / (sum(samples) / 1000)
+                                       if sum(samples) else None),
+                    }
+                    for stage, samples in stages.items()
+                },
+            })
+    return results
+
+
+@contextmanager
+def _chroma_dir(path: Path) -> Iterator[None]:
+    """Point chroma at ``path`` (a scratch directory) instead of the configured store."""
+    from app.config import settings
+
+    previous = settings.chroma_persist_dir
+    settings.chroma_persist_dir = str(path)
+    try:
+        yield
+    finally:
+        settings.chroma_persist_dir = previous
+
+
+def _drop_collections(store: Any) -> None:
+    """Delete the chroma collections a benchmark store created."""
+    if store.backend != "chroma":
+        return
+    names = {store.collection.name} | {c.name for c in store._partition_collections()}
+    for name in names:
+        try:
+            store.client.delete_collection(name)
+        except Exception as e:
+            print(f"Error dropping benchmark collection {name}: {e}")
+
+
+def _available_backends(requested: Sequence[str]) -> List[str]:
+    from app.services.vector_store import VectorStore
+
+    backends = []
+    for backend in requested:
+        try:
+            _drop_collections(VectorStore(backend=backend, collection_name="bench_probe"))
+            backends.append(backend)
+        except Exception as e:
+            print(f"Skipping vector backend {backend}: {e}")
+    return backends
+
+
+def _recall(results: List[Dict[str, Any]], expected: Sequence[int]) -> float:
+    found = {int(r["id"].split("_chunk_")[0]) for r in results}
+    return len(found & set(expected)) / len(expected) if len(expected) else 1.0
+
+
+def synthetic_vectors(rng: Any, n: int, dim: int, centres: Any = None, spread: float = 0.6) -> Any:
+    """Unit vectors, drawn around ``centres`` when given, like real embeddings (isotropic
+    noise has no structure for an ANN index to exploit)."""
+    import numpy as np
+
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    if centres is not None:
+        vectors = centres[rng.integers(0, len(centres), n)] + spread * vectors
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_search(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Query latency, index memory and recall@k against corpus size per backend and index.
+
+    Memory-backend runs cover every codec in ``--quantizations`` and index in ``--indexes``;
+    IVF indexes are queried once per ``--nprobes`` value (the recall/latency trade-off).
+    """
+    import numpy as np
+    from app.services.vector_store import VectorStore
+
+    rng = np.random.default_rng(args.seed)
+    configs = [
+        (backend, quantization, index, partitioning)
+        for backend in _available_backends(args.search_backends)
+        for quantization in (args.quantizations if backend == "memory" else ["none"])
+        for index in (args.indexes if backend == "memory" else ["flat"])
+        for partitioning in args.partitionings
+    ]
+    results = []
+    for n_chunks in args.search_sizes:
+        centres = None
+        if args.clusters:
+            centres = rng.standard_normal((args.clusters, args.dim)).astype(np.float32)
+        vectors = synthetic_vectors(rng, n_chunks, args.dim, centres)
+        tenants = np.arange(n_chunks) % args.tenants
+        queries = synthetic_vectors(rng, args.queries, args.dim, centres)
+        # Exact top-k within tenant 0, the reference for recall
+        tenant_rows = np.flatnonzero(tenants == 0)
+        expected = [
+            tenant_rows[np.argsort(-(vectors[tenant_rows] @ q), kind="stable")[: args.top_k]]
+            for q in queries
+        ]
+        for backend, quantization, index, partitioning in configs:
+            store = VectorStore(backend=backend,
+                                collection_name=f"bench_{n_chunks}_{time.time_ns()}",
+                                quantization=quantization, index=index, partitioning=partitioning)
+            try:
+                build_start = time.perf_counter()
+                for i, vector in enumerate(vectors):
+                    store.add_document(str(i), f"chunk {i}", vector, {"user_id": int(tenants[i])})
+                store.train_index()
+                build_ms = (time.perf_counter() - build_start) * 1000
+                stats = store.get_collection_stats()
+
+                for nprobe in (args.nprobes if index == "ivf" else [None]):
+                    latencies, recalls = [], []
+                    for q, exact in zip(queries, expected):
+                        start = time.perf_counter()
+                        found = store.search_documents(q, n_results=args.top_k,
+                                                       where={"user_id": 0}, nprobe=nprobe)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        recalls.append(_recall(found, exact))
+                    run = {
+                        "backend": backend,
+                        "index": index,
+                        "quantization": quantization,
+                        "partitioning": partitioning,
+                        "chunks": n_chunks,
+                        "dim": args.dim,
+                        "build_ms": build_ms,
+                        "inserts_per_s": n_chunks / (build_ms / 1000) if build_ms else None,
+                        "index_mb": (stats["codes_bytes"] / 2**20
+                                     if "codes_bytes" in stats else None),
+                        "recall_at_k": sum(recalls) / len(recalls),
+                        "query": percentiles(latencies),
+                    }
+                    if nprobe is not None:
+                        run.update(nprobe=nprobe, nlist=stats.get("nlist"))
+                    results.append(run)
+            finally:
+                _drop_collections(store)
+    return results
+
+
+def bench_qa(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Question answering latency against document length."""
+    from app.services.ai_service import AIService
+
+    ai_service = AIService()
+    rng = random.Random(args.seed)
+    results = []
+    for n_chars in args.qa_lengths:
+        context = make_text(n_chars, seed=args.seed)
+        questions = [" ".join(rng.sample(context.split(), 5)) + "?" for _ in range(args.queries)]
+        latencies = [_timed(functools.partial(ai_service.answer_question, q, context))
+                     for q in questions]
+        results.append({"chars": n_chars, "query": percentiles(latencies)})
+    return results
+
+
+def _git_commit() -> Any:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fast_init": os.getenv("INTELLIDOC_FAST_INIT") == "1",
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="intellidoc-bench-") as tmp, \
+            _chroma_dir(Path(tmp) / "chroma"):
+        for suite in args.suites:
+            suite_result: Dict[str, Any] = {}
+            with memory_high_water(suite_result, trace=args.trace_memory):
+                if suite == "ingestion":
+                    suite_result["runs"] = bench_ingestion(args, Path(tmp))
+                elif suite == "search":
+                    suite_result["runs"] = bench_search(args)
+                elif suite == "qa":
+                    suite_result["runs"] = bench_qa(args)
+            report["results"][suite] = suite_result
+    return report
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _str_list(value: str) -> List[str]:
+    return [v for v in value.split(",") if v]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="IntelliDoc benchmarks")
+    parser.add_argument("--suites", type=_str_list, default=list(SUITES))
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formats", type=_str_list, default=list(FORMATS))
+    parser.add_argument("--ingest-sizes", type=_int_list, default=[2_000, 20_000, 200_000],
+                        help="Characters per generated document")
+    parser.add_argument("--ingest-docs", type=int, default=5, help="Documents per format and size")
+    parser.add_argument("--search-sizes", type=_int_list, default=[1_000, 10_000],
+                        help="Corpus sizes in chunks (e.g. 1000,100000,1000000)")
+    parser.add_argument("--search-backends", type=_str_list, default=["memory", "chroma"])
+    parser.add_argument("--quantizations", type=_str_list, default=["none", "int8", "binary"],
+                        help="Memory backend codecs: none,float16,int8,binary")
+    parser.add_argument("--indexes", type=_str_list, default=["flat", "ivf"],
+                        help="Memory backend indexes: flat,ivf")
+    parser.add_argument("--nprobes", type=_int_list, default=[1, 4, 16],
+                        help="IVF lists scanned per query, one run each")
+    parser.add_argument("--partitionings", type=_str_list, default=["none", "user"],
+                        help="Vector partitioning by owner: none,user,shard")
+    parser.add_argument("--clusters", type=int, default=256,
+                        help="Topic clusters in the synthetic vectors (0 = isotropic noise)")
+    parser.add_argument("--tenants", type=int, default=10, help="Users the corpus is spread over")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the Python heap peak via tracemalloc (slower)")
+    parser.add_argument("--qa-lengths", type=_int_list, default=[1_000, 10_000, 100_000])
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    report = run_benchmarks(args)
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
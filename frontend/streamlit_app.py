@@ -1,10 +1,17 @@
+import json
+
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import plotly.express as px
 
 # Configuration
 API_BASE_URL = "http://localhost:8000/api"
+CATEGORIES = ["contract", "invoice", "legal", "financial", "technical", "medical", "academic",
+              "other"]
+PAGE_SIZES = [10, 25, 50]
+LANGUAGES = {"es": "Spanish", "fr": "French", "de": "German", "it": "Italian", "en": "English"}
 
 # Initialize session state
 if 'token' not in st.session_state:
@@ -12,30 +19,91 @@ if 'token' not in st.session_state:
 if 'user' not in st.session_state:
     st.session_state.user = None
 
+
+class ApiError(Exception):
+    """Non-2xx API response (raised inside cached readers so failures aren't cached)."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+@st.cache_resource
+def http_session():
+    """Keep-alive connection pool shared by every rerun and browser session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _auth_headers(token):
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_get(endpoint, token, params=None, byte_range=None):
+    """GET returning ``(status, body, lowercased headers)``; keyed by token so users never
+    share entries."""
+    headers = _auth_headers(token)
+    if byte_range:
+        headers["Range"] = byte_range
+    response = http_session().get(f"{API_BASE_URL}{endpoint}", headers=headers, params=params)
+    if response.status_code >= 400:
+        raise ApiError(response.status_code, response.text)
+    headers = {k.lower(): v for k, v in response.headers.items()}
+    return response.status_code, response.content, headers
+
+
+def invalidate_cache():
+    """Drop cached reads after a write (upload, delete) so the next rerun sees it."""
+    _cached_get.clear()
+
+
+def _session_expired():
+    st.session_state.token = None
+    st.session_state.user = None
+    invalidate_cache()
+    st.error("Session expired. Please login again.")
+
+
+def cached_api_get(endpoint, params=None):
+    """Cached authenticated GET; returns ``(json, headers)`` or ``(None, {})`` on failure."""
+    try:
+        _, body, headers = _cached_get(endpoint, st.session_state.token, params)
+        return (json.loads(body) if body else {}), headers
+    except ApiError as e:
+        if e.status_code == 401:
+            _session_expired()
+        else:
+            st.error(f"API Error: {e.status_code}")
+    except Exception as e:
+        st.error(f"API Error: {str(e)}")
+    return None, {}
+
+
 def make_api_request(endpoint, method="GET", data=None, files=None):
     """Make authenticated API request."""
-    headers = {}
-    if st.session_state.token:
-        headers["Authorization"] = f"Bearer {st.session_state.token}"
-    
+    headers = _auth_headers(st.session_state.token)
+
     url = f"{API_BASE_URL}{endpoint}"
-    
+    session = http_session()
+
     try:
         if method == "GET":
-            response = requests.get(url, headers=headers)
+            response = session.get(url, headers=headers)
         elif method == "POST":
             if files:
-                response = requests.post(url, headers=headers, files=files, data=data)
+                response = session.post(url, headers=headers, files=files, data=data)
             else:
                 headers["Content-Type"] = "application/json"
-                response = requests.post(url, headers=headers, json=data)
+                response = session.post(url, headers=headers, json=data)
         elif method == "DELETE":
-            response = requests.delete(url, headers=headers)
-        
+            response = session.delete(url, headers=headers)
+
         if response.status_code == 401:
-            st.session_state.token = None
-            st.session_state.user = None
-            st.error("Session expired. Please login again.")
+            _session_expired()
             return None
         
         return response.json() if response.content else {}
@@ -43,6 +111,54 @@ def make_api_request(endpoint, method="GET", data=None, files=None):
         st.error(f"API Error: {str(e)}")
         return None
 
+
+def stream_api_events(endpoint, data=None, files=None):
+    """POST to a server-sent-events endpoint and yield ``(event, data)`` as they arrive."""
+    headers = {"Accept": "text/event-stream", **_auth_headers(st.session_state.token)}
+
+    try:
+        if files:
+            response = http_session().post(f"{API_BASE_URL}{endpoint}", headers=headers,
+                                           files=files, data=data, stream=True)
+        else:
+            response = http_session().post(f"{API_BASE_URL}{endpoint}", headers=headers, json=data,
+                                           stream=True)
+        if response.status_code == 401:
+            _session_expired()
+            return
+        if response.status_code != 200:
+            detail = response.json().get("detail", response.text) if response.content else ""
+            yield "error", {"status_code": response.status_code, "detail": detail}
+            return
+
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event:
+                yield event, json.loads(line[len("data: "):])
+    except Exception as e:
+        st.error(f"API Error: {str(e)}")
+
+
+def fetch_content_preview(doc_id, max_bytes=1000):
+    """Fetch the first bytes of a document's text using a (cached) Range request."""
+    try:
+        _, body, headers = _cached_get(f"/documents/{doc_id}/content", st.session_state.token,
+                                       byte_range=f"bytes=0-{max_bytes - 1}")
+    except ApiError as e:
+        if e.status_code == 401:
+            _session_expired()
+        return None
+    except Exception as e:
+        st.error(f"API Error: {str(e)}")
+        return None
+    preview = body.decode("utf-8", errors="ignore")
+    total = headers.get("content-range", "").rsplit("/", 1)[-1]
+    truncated = total.isdigit() and int(total) > len(body)
+    return preview + "..." if truncated else preview
+
+
 def login_page():
     """Login/Register page"""
     st.title("🔐 IntelliDoc Login")
@@ -57,7 +173,7 @@ def login_page():
             submitted = st.form_submit_button("Login")
             
             if submitted:
-                response = requests.post(
+                response = http_session().post(
                     f"{API_BASE_URL}/auth/login",
                     data={"username": email, "password": password}
                 )
@@ -87,7 +203,7 @@ def login_page():
                 if reg_password != reg_password_confirm:
                     st.error("Passwords don't match")
                 else:
-                    response = requests.post(
+                    response = http_session().post(
                         f"{API_BASE_URL}/auth/register",
                         json={"email": reg_email, "password": reg_password}
                     )
@@ -101,9 +217,9 @@ def dashboard_page():
     """Main dashboard page"""
     st.title("📊 IntelliDoc Dashboard")
     
-    # Get dashboard stats
-    stats = make_api_request("/analytics/dashboard")
-    
+    # Get dashboard stats (cached briefly; reruns from widget changes reuse them)
+    stats, _ = cached_api_get("/analytics/dashboard")
+
     if stats:
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
@@ -158,48 +274,98 @@ def documents_page():
         
         category = st.selectbox(
             "Category (optional)",
-            ["", "contract", "invoice", "legal", "financial", "technical", "medical", "academic", "other"]
+            [""] + CATEGORIES
         )
         
         if uploaded_file and st.button("Upload Document"):
-            with st.spinner("Uploading and processing document..."):
-                files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                data = {"category": category} if category else {}
-                
-                result = make_api_request("/documents/upload", method="POST", files=files, data=data)
-                
-                if result:
-                    st.success(f"Document '{result['original_filename']}' uploaded successfully!")
-                    st.json(result)
-    
+            files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+            data = {"category": category} if category else {}
+
+            # Processing progress is streamed, so each stage shows up as soon as it finishes
+            with st.status("Uploading document...", expanded=True) as status:
+                pages = None
+                events = stream_api_events("/documents/upload/stream", data=data, files=files)
+                for event, payload in events:
+                    if event == "accepted":
+                        status.update(label=f"Processing '{payload['filename']}'...")
+                    elif event == "stage" and payload["status"] == "started":
+                        status.update(label=f"{payload['stage'].capitalize()}...")
+                    elif event == "page":
+                        pages = pages or st.progress(0.0)
+                        pages.progress(payload["page"] / payload["pages"],
+                                       text=f"Extracted page {payload['page']}/{payload['pages']}")
+                    elif event == "classification":
+                        st.write(f"**Category:** {payload['category']} "
+                                 f"({payload['confidence']:.2f})")
+                    elif event == "summary":
+                        st.write("**Summary:**")
+                        st.write(payload["summary"])
+                    elif event == "language":
+                        st.write(f"**Language:** {payload['language']}")
+                    elif event == "indexed":
+                        st.write(f"Indexed {payload['chunks']} chunks")
+                    elif event == "done":
+                        invalidate_cache()
+                        name = payload["original_filename"]
+                        status.update(label=f"Document '{name}' uploaded successfully!",
+                                      state="complete")
+                        st.json(payload)
+                    elif event == "error":
+                        status.update(label="Upload failed", state="error")
+                        st.error(payload["detail"])
+
     with tab2:
         st.subheader("📋 My Documents")
         
-        # Get documents
-        documents = make_api_request("/documents/")
-        
+        # Filter options; filtering and paging happen server-side
+        col1, col2 = st.columns(2)
+        with col1:
+            category_filter = st.selectbox("Filter by category", ["All"] + CATEGORIES)
+        with col2:
+            page_size = st.selectbox("Per page", PAGE_SIZES)
+
+        # Keyset paging: cursors[i] starts page i; restart when the filter changes
+        view = (category_filter, page_size)
+        if st.session_state.get("doc_view") != view:
+            st.session_state.doc_view = view
+            st.session_state.doc_cursors = [None]
+        cursors = st.session_state.doc_cursors
+        params = {"limit": page_size, "count": "estimate"}
+        if category_filter != "All":
+            params["category"] = category_filter
+        if cursors[-1]:
+            params["cursor"] = cursors[-1]
+
+        documents, headers = cached_api_get("/documents/", params)
+
         if documents:
-            # Filter options
-            col1, col2 = st.columns(2)
+            total = headers.get("x-total-count")
+            exact = headers.get("x-total-count-exact") == "true"
+            next_cursor = headers.get("x-next-cursor")
+
+            col1, col2, col3 = st.columns([1, 2, 1])
             with col1:
-                category_filter = st.selectbox(
-                    "Filter by category",
-                    ["All"] + list(set([doc.get("category", "other") for doc in documents if doc.get("category")]))
-                )
-            
-            # Display documents
-            filtered_docs = documents
-            if category_filter != "All":
-                filtered_docs = [doc for doc in documents if doc.get("category") == category_filter]
-            
-            for doc in filtered_docs:
+                if len(cursors) > 1 and st.button("← Previous"):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                shown = f"of {total}" if exact else f"of {total}+" if total else ""
+                st.caption(f"Page {len(cursors)} {shown}")
+            with col3:
+                if next_cursor and st.button("Next →"):
+                    cursors.append(next_cursor)
+                    st.rerun()
+
+            for doc in documents:
                 with st.expander(f"📄 {doc['original_filename']}"):
                     col1, col2, col3 = st.columns(3)
                     
                     with col1:
                         st.write(f"**Category:** {doc.get('category', 'Uncategorized')}")
                         st.write(f"**Size:** {doc['file_size']} bytes")
-                    
+                        if doc.get('language'):
+                            st.write(f"**Language:** {doc['language']}")
+
                     with col2:
                         st.write(f"**Created:** {doc['created_at'][:10]}")
                         if doc.get('confidence_score'):
@@ -208,35 +374,45 @@ def documents_page():
                     with col3:
                         if st.button(f"Delete", key=f"delete_{doc['id']}"):
                             if make_api_request(f"/documents/{doc['id']}", method="DELETE"):
+                                invalidate_cache()
                                 st.success("Document deleted!")
                                 st.rerun()
                     
-                    # Show summary if available
-                    if doc.get('summary'):
-                        st.write("**Summary:**")
-                        st.write(doc['summary'])
-
-                    # Show content preview
-                    if doc.get('content'):
-                        st.write("**Content Preview:**")
-                        st.text_area("Content",
-                                     doc['content'][:1000] + "..." if len(doc['content']) > 1000 else doc['content'],
-                                     height=200, key=f"content_{doc['id']}")
-                    
+                    # Summary and content are not part of the listing; load them on demand
+                    show_details = doc.get('processed_at') and st.checkbox(
+                        "Show summary and content", key=f"details_{doc['id']}"
+                    )
+                    if show_details:
+                        details, _ = cached_api_get(f"/documents/{doc['id']}")
+                        if details and details.get('summary'):
+                            st.write("**Summary:**")
+                            st.write(details['summary'])
+
+                        preview = fetch_content_preview(doc['id'])
+                        if preview:
+                            st.write("**Content Preview:**")
+                            st.text_area("Content", preview, height=200, key=f"content_{doc['id']}")
+
                     # Query document
                     query = st.text_input(f"Ask a question about this document", key=f"query_{doc['id']}")
                     if query and st.button(f"Ask", key=f"ask_{doc['id']}"):
+                        # Relevant passages arrive well before the answer; show them meanwhile
                         with st.spinner("Generating answer..."):
-                            answer = make_api_request(
-                                f"/documents/{doc['id']}/query",
-                                method="POST",
+                            for event, payload in stream_api_events(
+                                f"/documents/{doc['id']}/query/stream",
                                 data={"query": query}
-                            )
-                            if answer:
-                                st.write("**Answer:**")
-                                st.write(answer['answer'])
-                                st.write(f"**Confidence:** {answer['confidence']:.2f}")
-    
+                            ):
+                                if event == "passages" and payload["passages"]:
+                                    st.write("**Relevant passages:**")
+                                    for passage in payload["passages"]:
+                                        st.caption(passage["text"][:300])
+                                elif event == "done":
+                                    st.write("**Answer:**")
+                                    st.write(payload['answer'])
+                                    st.write(f"**Confidence:** {payload['confidence']:.2f}")
+                                elif event == "error":
+                                    st.error(payload["detail"])
+
     with tab3:
         st.subheader("🔍 Search Documents")
         
@@ -294,12 +470,29 @@ def ai_tools_page():
         st.subheader("🌐 Translation")
         
         source_text = st.text_area("Text to translate", height=100)
-        target_lang = st.selectbox("Target Language", ["Spanish", "French", "German", "Italian"])
-        
+        target_lang = st.selectbox("Target Language", list(LANGUAGES), format_func=LANGUAGES.get)
+
         if source_text and st.button("Translate"):
             st.write("**Translation:**")
-            st.write(f"[Translation to {target_lang} would appear here]")
-    
+            # Sentences are translated in batches; show each batch as soon as it arrives
+            output = st.empty()
+            translated = ""
+            for event, payload in stream_api_events(
+                "/documents/translate/stream",
+                data={"text": source_text, "target_language": target_lang}
+            ):
+                if event == "segment":
+                    translated += payload["text"]
+                    output.write(translated)
+                elif event == "done":
+                    output.write(payload["translated_text"])
+                    if payload.get("note"):
+                        st.info(payload["note"])
+                    st.caption(f"{payload['source_language']} → {payload['target_language']}: "
+                               f"{payload['sentences']} sentences, {payload['cached']} from cache")
+                elif event == "error":
+                    st.error(payload["detail"])
+
     with tab3:
         st.subheader("❓ Document Q&A")
         
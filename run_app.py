@@ -1,3 +1,4 @@
+import argparse
 import subprocess
 import sys
 import os
@@ -8,24 +9,60 @@ def run_backend():
     """Run FastAPI backend"""
     os.system("uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload")
 
+
+def run_backend_production(workers, limit_concurrency):
+    """Run the pre-fork backend: models load once and are shared by all workers"""
+    from app.server import serve
+
+    serve(host="0.0.0.0", port=8000, workers=workers, limit_concurrency=limit_concurrency)
+
+
 def run_frontend():
     """Run Streamlit frontend"""
     time.sleep(5)  # Wait for backend to start
     os.system("streamlit run frontend/streamlit_app.py --server.port 8501")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start IntelliDoc")
+    parser.add_argument("--prod", action="store_true",
+                        help="Production mode: pre-fork workers sharing preloaded models, "
+                             "no reload")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (--prod)")
+    parser.add_argument("--limit-concurrency", type=int, default=None,
+                        help="Concurrent connections per worker before returning 503 (--prod)")
+    parser.add_argument("--backend-only", action="store_true", help="Do not start Streamlit")
+    args = parser.parse_args()
+
     print("Starting IntelliDoc Application...")
     print("Backend will be available at: http://localhost:8000")
-    print("Frontend will be available at: http://localhost:8501")
+    if not args.backend_only:
+        print("Frontend will be available at: http://localhost:8501")
     print("API Documentation: http://localhost:8000/docs")
     
+    if args.prod:
+        if not args.backend_only:
+            # The pre-fork server owns the main thread (signal handling); run Streamlit beside it
+            frontend = subprocess.Popen(
+                [sys.executable, "-m", "streamlit", "run", "frontend/streamlit_app.py",
+                 "--server.port", "8501"]
+            )
+        try:
+            run_backend_production(args.workers, args.limit_concurrency)
+        finally:
+            if not args.backend_only:
+                frontend.terminate()
+        sys.exit(0)
+
     # Start backend in a separate thread
     backend_thread = Thread(target=run_backend)
     backend_thread.daemon = True
     backend_thread.start()
     
     # Start frontend
-    run_frontend()
+    if args.backend_only:
+        backend_thread.join()
+    else:
+        run_frontend()
 
 # Installation and Setup Instructions
 
@@ -51,6 +88,7 @@ if __name__ == "__main__":
 
 5. Run the application:
    python run_app.py
+   (production: python run_app.py --prod --workers 4; send SIGHUP for a rolling restart)
 
 6. Access the application:
    - Frontend: http://localhost:8501
@@ -1,11 +1,12 @@
+import json
 import os
 os.environ["INTELLIDOC_FAST_INIT"] = "1"
 os.environ["PYTHONHASHSEED"] = "0"
 
-from fastapi.testclient import TestClient
-from app.main import app
-from app.database import Base, engine, SessionLocal
-from sqlalchemy.orm import Session
+import numpy as np  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import Base, engine, SessionLocal  # noqa: E402
 
 
 def setup_module(module):
@@ -25,13 +26,15 @@ def test_health():
 
 def test_auth_register_login_and_me():
     # register
-    r = client.post("/api/auth/register", json={"email": "test@example.com", "password": "pw123456"})
+    r = client.post("/api/auth/register",
+                    json={"email": "test@example.com", "password": "pw123456"})
     assert r.status_code == 200
     user = r.json()
     assert user["email"] == "test@example.com"
 
     # login
-    r = client.post("/api/auth/login", data={"username": "test@example.com", "password": "pw123456"})
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
     assert r.status_code == 200
     token = r.json()["access_token"]
     assert token
@@ -45,7 +48,8 @@ def test_auth_register_login_and_me():
 
 def test_documents_crud_flow():
     # login
-    r = client.post("/api/auth/login", data={"username": "test@example.com", "password": "pw123456"})
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
     assert r.status_code == 200
     token = r.json()["access_token"]
 
@@ -83,3 +87,768 @@ def test_documents_crud_flow():
     assert r.status_code == 200
 
 
+def test_sqlite_pragmas_enabled():
+    from sqlalchemy import text
+
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        # NORMAL == 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+
+
+def test_document_list_omits_content_and_serves_ranges():
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    body = b"Range requests return slices of the extracted text."
+    files = {"file": ("range.txt", body, "text/plain")}
+    r = client.post("/api/documents/upload", headers=headers, files=files)
+    assert r.status_code == 200
+    doc_id = r.json()["id"]
+
+    r = client.get("/api/documents/", headers=headers)
+    listed = next(d for d in r.json() if d["id"] == doc_id)
+    assert "content" not in listed and "summary" not in listed
+
+    r = client.get(f"/api/documents/{doc_id}/content", headers=headers)
+    assert r.status_code == 200
+    assert r.content == body
+
+    r = client.get(f"/api/documents/{doc_id}/content", headers={**headers, "Range": "bytes=0-4"})
+    assert r.status_code == 206
+    assert r.content == body[:5]
+    assert r.headers["content-range"] == f"bytes 0-4/{len(body)}"
+
+    r = client.get(f"/api/documents/{doc_id}/content", headers={**headers, "Range": "bytes=999-"})
+    assert r.status_code == 416
+
+    client.delete(f"/api/documents/{doc_id}", headers=headers)
+
+
+def test_large_content_offloaded_to_blob(monkeypatch):
+    from app.api import documents as documents_api
+
+    monkeypatch.setattr(documents_api.content_store, "threshold", 16)
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    body = b"This text is longer than the sixteen byte threshold."
+    files = {"file": ("blob.txt", body, "text/plain")}
+    doc_id = client.post("/api/documents/upload", headers=headers, files=files).json()["id"]
+
+    db = SessionLocal()
+    try:
+        from app import models
+
+        stored = db.get(models.Document, doc_id)
+        assert stored.content is None
+        assert os.path.exists(stored.content_blob)
+        blob_path = stored.content_blob
+    finally:
+        db.close()
+
+    r = client.get(f"/api/documents/{doc_id}/content", headers=headers)
+    assert r.content == body
+    document = client.get(f"/api/documents/{doc_id}", headers=headers).json()
+    assert document["content"] == body.decode()
+
+    client.delete(f"/api/documents/{doc_id}", headers=headers)
+    assert not os.path.exists(blob_path)
+
+
+def test_document_list_keyset_pagination_and_filters():
+    client.post("/api/auth/register", json={"email": "pager@example.com", "password": "pw123456"})
+    r = client.post("/api/auth/login",
+                    data={"username": "pager@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    ids = []
+    for i in range(5):
+        files = {"file": (f"page{i}.txt", f"Paged document number {i}.".encode(), "text/plain")}
+        ids.append(client.post("/api/documents/upload", headers=headers, files=files).json()["id"])
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "count": "exact"}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/api/documents/", headers=headers, params=params)
+        assert r.status_code == 200
+        assert r.headers["x-total-count"] == "5"
+        seen.extend(d["id"] for d in r.json())
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert seen == sorted(ids, reverse=True)
+
+    r = client.get("/api/documents/", headers=headers,
+                   params={"count": "estimate", "mime_type": "application/pdf"})
+    assert r.json() == []
+    assert r.headers["x-total-count"] == "0"
+
+    r = client.get("/api/documents/", headers=headers, params={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
+
+
+def test_dashboard_rollups_track_writes_and_reconcile():
+    from app import crud, models
+
+    client.post("/api/auth/register", json={"email": "stats@example.com", "password": "pw123456"})
+    r = client.post("/api/auth/login",
+                    data={"username": "stats@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    files = {"file": ("invoice.txt", b"Invoice: payment amount due in 30 days.", "text/plain")}
+    first = client.post("/api/documents/upload", headers=headers, files=files).json()["id"]
+    files = {"file": ("paper.txt", b"This research study presents an analysis.", "text/plain")}
+    client.post("/api/documents/upload", headers=headers, files=files)
+
+    stats = client.get("/api/analytics/dashboard", headers=headers).json()
+    assert stats["total_documents"] == 2
+    assert stats["processed_documents"] == 2
+    assert stats["vector_store_stats"]["total_documents"] == 2
+    assert {c["category"]: c["count"] for c in stats["category_distribution"]} == {
+        "invoice": 1, "academic": 1
+    }
+    assert [d["filename"] for d in stats["recent_documents"]] == ["paper.txt", "invoice.txt"]
+
+    client.delete(f"/api/documents/{first}", headers=headers)
+    stats = client.get("/api/analytics/dashboard", headers=headers).json()
+    assert stats["total_documents"] == 1
+    assert [d["filename"] for d in stats["recent_documents"]] == ["paper.txt"]
+
+    # Corrupt the rollup, then rebuild it from the documents table
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_email(db, "stats@example.com")
+        db.get(models.UserStats, user.id).total_documents = 42
+        db.commit()
+        assert crud.rebuild_user_stats(db, user_id=user.id) == 1
+    finally:
+        db.close()
+    assert client.get("/api/analytics/dashboard", headers=headers).json() == stats
+
+
+def test_missing_rollup_is_seeded_from_existing_documents():
+    from app import crud, models
+
+    client.post("/api/auth/register", json={"email": "seed@example.com", "password": "pw123456"})
+    r = client.post("/api/auth/login",
+                    data={"username": "seed@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    files = {"file": ("memo.txt", b"Short internal memo about the budget.", "text/plain")}
+    client.post("/api/documents/upload", headers=headers, files=files)
+
+    # Documents from before rollups existed: the row is seeded from them on the next write
+    with SessionLocal() as db:
+        db.delete(db.get(models.UserStats, crud.get_user_by_email(db, "seed@example.com").id))
+        db.commit()
+    files = {"file": ("memo2.txt", b"Another memo about the travel policy.", "text/plain")}
+    second = client.post("/api/documents/upload", headers=headers, files=files).json()["id"]
+    stats = client.get("/api/analytics/dashboard", headers=headers).json()
+    assert (stats["total_documents"], stats["processed_documents"]) == (2, 2)
+    client.delete(f"/api/documents/{second}", headers=headers)
+    assert client.get("/api/analytics/dashboard", headers=headers).json()["total_documents"] == 1
+
+
+def test_performance_analytics_reports_stage_percentiles():
+    r = client.post("/api/auth/login",
+                    data={"username": "stats@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    r = client.get("/api/analytics/performance", headers=headers, params={"hours": 1})
+    assert r.status_code == 200
+    perf = r.json()
+    stages = {row["stage"]: row for row in perf["by_stage"]}
+    assert {"extraction", "classification", "summarization", "embedding", "indexing",
+            "total"} <= set(stages)
+    total = stages["total"]
+    assert total["documents"] == 2
+    assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"]
+    assert any(row["mime_type"] == "text/plain" for row in perf["by_mime_type"])
+    assert all(row["size_bucket"] == "<100KB" for row in perf["by_size_bucket"])
+    assert sum(row["documents"] for row in perf["hourly_throughput"]) == 2
+
+
+def test_metrics_endpoint_exposes_request_and_service_metrics():
+    from app import metrics
+
+    client.get("/health")
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    body = r.text
+    assert "# TYPE intellidoc_http_requests_total counter" in body
+    assert 'intellidoc_http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert ('intellidoc_operation_duration_seconds_count'
+            '{component="vector_store",operation="add_document"}') in body
+
+    # Disabled registries leave functions untouched
+    registry_enabled = metrics.REGISTRY.enabled
+    metrics.REGISTRY.enabled = False
+    try:
+        def operation():
+            return 1
+        assert metrics.timed("test", "operation")(operation) is operation
+    finally:
+        metrics.REGISTRY.enabled = registry_enabled
+
+
+def test_profiling_header_and_armed_slow_requests(monkeypatch, tmp_path, capsys):
+    import pstats
+    from app import profiling
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "slow_request_ms", 0.001)
+    monkeypatch.setattr(profiling.profile_store, "directory", tmp_path)
+    admin = {"X-Profile-Token": "secret"}
+    # The middleware is only installed when profiling is enabled at startup
+    assert not any(m.cls is profiling.ProfilingMiddleware for m in app.user_middleware)
+    client = TestClient(profiling.ProfilingMiddleware(app))
+
+    # Without a profiling or admin token, profiling stays closed
+    monkeypatch.setattr(settings, "admin_token", None)
+    assert client.get("/api/admin/profiling/profiles").status_code == 404
+    assert "x-profile-id" not in client.get("/health", headers={"X-Profile": "cprofile"}).headers
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.get("/api/admin/profiling/profiles", headers=admin).status_code == 200
+    monkeypatch.setattr(settings, "admin_token", None)
+    monkeypatch.setattr(settings, "profiling_token", "secret")
+
+    r = client.get("/health", headers={"X-Profile": "cprofile", "X-Profile-Token": "wrong"})
+    assert "x-profile-id" not in r.headers
+    assert client.get("/api/admin/profiling/profiles").status_code == 403
+
+    r = client.get("/health", headers={"X-Profile": "cprofile", **admin})
+    profile_id = r.headers["x-profile-id"]
+    r = client.get(f"/api/admin/profiling/profiles/{profile_id}", params={"format": "txt"},
+                   headers=admin)
+    assert r.status_code == 200
+    assert "function calls" in r.text
+
+    # Sync endpoints run in the threadpool; their calls are part of the request's cProfile
+    login = client.post("/api/auth/login",
+                        data={"username": "test@example.com", "password": "pw123456"})
+    r = client.post("/api/documents/search", json={"query": "invoice"},
+                    headers={"Authorization": f"Bearer {login.json()['access_token']}",
+                             "X-Profile": "cprofile", **admin})
+    assert r.status_code == 200
+    r = client.get(f"/api/admin/profiling/profiles/{r.headers['x-profile-id']}",
+                   params={"format": "prof"}, headers=admin)
+    prof = tmp_path / "search.prof"
+    prof.write_bytes(r.content)
+    functions = {name for _, _, name in pstats.Stats(str(prof)).stats}
+    assert {"search_documents", "_search", "embed_query"} <= functions
+
+    r = client.post("/api/admin/profiling/arm", json={"count": 1, "mode": "sample"}, headers=admin)
+    assert r.json()["remaining"] == 1
+    client.post("/api/auth/login", data={"username": "test@example.com", "password": "pw123456"})
+    profiles = client.get("/api/admin/profiling/profiles", headers=admin).json()
+    assert profiles["armed"]["remaining"] == 0
+    assert sorted(p["mode"] for p in profiles["profiles"]) == ["cprofile", "cprofile", "sample"]
+
+    assert "Slow request POST /api/auth/login" in capsys.readouterr().out
+
+
+def test_sampling_profiler_is_exclusive_and_samples_request_threads():
+    import contextvars
+    import threading
+    import time
+
+    from app import profiling
+
+    profiler = profiling._start_profiler("sample")
+    assert profiling._start_profiler("sample") is None
+
+    stop = threading.Event()
+
+    def other_request():
+        while not stop.is_set():
+            pass
+
+    def this_request():
+        time.sleep(0.1)
+
+    other = threading.Thread(target=other_request)
+    other.start()
+    try:
+        # run_in_threadpool carries the request's context into the worker thread
+        context = contextvars.copy_context()
+        worker = threading.Thread(target=context.run, args=(profiling.profiled(this_request),))
+        worker.start()
+        worker.join()
+    finally:
+        stop.set()
+        other.join()
+    profiler = profiling._stop_profiler("sample", profiler)
+    stacks = " ".join(profiler.samples)
+    assert "this_request" in stacks and "other_request" not in stacks
+    profiling._stop_profiler("sample", profiling._start_profiler("sample"))
+
+
+def test_inference_admission_control_returns_retry_after(monkeypatch):
+    from app.dependencies import get_ai_service
+    from app.services.inference import inference_limiter
+
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    before = len(client.get("/api/documents/", headers=headers).json())
+    files = {"file": ("busy.txt", b"Admission control " * 20, "text/plain")}
+
+    # Full queue: rejected with 429 before anything is stored
+    monkeypatch.setattr(inference_limiter, "max_queue", 1)
+    monkeypatch.setitem(inference_limiter._waiting, "summarizer", 1)
+    r = client.post("/api/documents/upload", headers=headers, files=files)
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 1
+    monkeypatch.setitem(inference_limiter._waiting, "summarizer", 0)
+
+    # Every embedder slot busy past the queue timeout: 503 and the upload is rolled back
+    class Embedder:
+        def encode(self, texts):
+            return [[0.0] * 8 for _ in texts]
+
+    monkeypatch.setitem(get_ai_service().models, "embedder", Embedder())
+    monkeypatch.setattr(inference_limiter, "queue_timeout", 0.05)
+    slot = inference_limiter._semaphore("embedder")
+    slot.acquire()
+    try:
+        r = client.post("/api/documents/upload", headers=headers, files=files)
+    finally:
+        slot.release()
+    assert r.status_code == 503 and "retry-after" in r.headers
+    assert len(client.get("/api/documents/", headers=headers).json()) == before
+
+    r = client.post("/api/documents/upload", headers=headers, files=files)
+    assert r.status_code == 200
+    assert client.get("/health/ready").json()["inference"]["embedder"]["running"] == 0
+    client.delete(f"/api/documents/{r.json()['id']}", headers=headers)
+
+
+def test_admin_search_requires_token_and_spans_tenants(monkeypatch):
+    from app.config import settings
+
+    assert client.post("/api/admin/search", json={"query": "x"}).status_code == 404
+    monkeypatch.setattr(settings, "admin_token", "admin-secret")
+    assert client.post("/api/admin/search", json={"query": "x"},
+                       headers={"X-Admin-Token": "nope"}).status_code == 403
+
+    doc_ids = {}
+    for email in ("tenant-a@example.com", "tenant-b@example.com"):
+        client.post("/api/auth/register", json={"email": email, "password": "pw123456"})
+        r = client.post("/api/auth/login", data={"username": email, "password": "pw123456"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        files = {"file": ("shared.txt", b"Quarterly revenue report for the board.", "text/plain")}
+        r = client.post("/api/documents/upload", headers=headers, files=files)
+        doc_ids[email] = (r.json()["id"], headers)
+
+    # A tenant only sees their own chunks; the admin search fans out over both
+    _, headers_a = doc_ids["tenant-a@example.com"]
+    query = "Quarterly revenue report for the board."
+    own = client.post("/api/documents/search", json={"query": query},
+                      headers=headers_a).json()["results"]
+    assert {r["metadata"]["document_id"] for r in own} == {doc_ids["tenant-a@example.com"][0]}
+
+    r = client.post("/api/admin/search", json={"query": query, "limit": 50},
+                    headers={"X-Admin-Token": "admin-secret"})
+    assert r.status_code == 200
+    found = {res["metadata"]["document_id"] for res in r.json()["results"]}
+    assert {doc_id for doc_id, _ in doc_ids.values()} <= found
+
+    for doc_id, headers in doc_ids.values():
+        client.delete(f"/api/documents/{doc_id}", headers=headers)
+
+
+def _sse_events(body):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines()
+                      if not line.startswith(":"))
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_streaming_upload_and_query_emit_progress_events():
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    text = "The contract payment is due in thirty days. " * 40
+
+    files = {"file": ("stream.txt", text.encode(), "text/plain")}
+    r = client.post("/api/documents/upload/stream", headers=headers, files=files)
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(r.text)
+    names = [name for name, _ in events]
+    assert names[0] == "accepted" and names[-1] == "done"
+    assert names.index("summary") < names.index("indexed")
+    stage = events[names.index("embedded") - 1][1]
+    assert stage["stage"] == "embedding" and stage["status"] == "done"
+    doc = events[-1][1]
+    assert doc["id"] == events[0][1]["document_id"] and doc["processed_at"]
+    chunks = dict(events)["indexed"]["chunks"]
+    assert chunks > 1
+
+    r = client.post(f"/api/documents/{doc['id']}/query/stream", headers=headers,
+                    json={"query": "When is the payment due?"})
+    events = _sse_events(r.text)
+    assert [name for name, _ in events] == ["document", "passages", "done"]
+    assert len(events[1][1]["passages"]) == min(chunks, 3)
+    assert "thirty days" in events[2][1]["answer"]
+
+    # Errors before the stream starts are plain HTTP responses
+    r = client.post("/api/documents/999999/query/stream", headers=headers, json={"query": "x"})
+    assert r.status_code == 404
+    client.delete(f"/api/documents/{doc['id']}", headers=headers)
+
+
+def test_uploaded_file_is_stored_sharded_served_and_removed():
+    from app.dependencies import get_document_processor
+
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    payload = b"Stored file contents. " * 100
+    files = {"file": ("stored.txt", payload, "text/plain")}
+    doc = client.post("/api/documents/upload", headers=headers, files=files).json()
+
+    storage = get_document_processor().storage
+    path = storage.path(doc["filename"])
+    assert path.exists() and path.parent.parent.parent == storage.root
+    r = client.get(f"/api/documents/{doc['id']}/file", headers=headers)
+    assert r.status_code == 200 and r.content == payload
+    assert 'filename="stored.txt"' in r.headers["content-disposition"]
+
+    assert client.delete(f"/api/documents/{doc['id']}", headers=headers).status_code == 200
+    assert not path.exists()
+    assert client.get(f"/api/documents/{doc['id']}/file", headers=headers).status_code == 404
+
+
+def test_bulk_delete_cascades_and_sweep_retries_failed_cleanup(monkeypatch):
+    from app import models
+    from app.config import settings
+    from app.dependencies import get_document_processor, get_vector_store
+
+    r = client.post("/api/auth/register",
+                    json={"email": "bulk@example.com", "password": "pw123456"})
+    r = client.post("/api/auth/login",
+                    data={"username": "bulk@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    storage, vector_store = get_document_processor().storage, get_vector_store()
+    docs = []
+    for i in range(4):
+        body = f"Bulk deletion document {i}. ".encode() * 80
+        files = {"file": (f"bulk{i}.txt", body, "text/plain")}
+        docs.append(client.post("/api/documents/upload", headers=headers, files=files).json())
+    vector_store.flush()
+
+    def indexed(doc_id):
+        return vector_store._index.rows_where(lambda meta: meta.get("parent_doc_id") == str(doc_id))
+
+    first, second = docs[0]["id"], docs[1]["id"]
+    r = client.delete(f"/api/documents/?ids={first},{second},999999", headers=headers)
+    assert r.json() == {"deleted": 2, "document_ids": [first, second], "not_found": [999999]}
+    assert not indexed(first) and not storage.path(docs[0]["filename"]).exists()
+    db = SessionLocal()
+    try:
+        assert db.query(models.DocumentAnalysis).filter(
+            models.DocumentAnalysis.document_id.in_([first, second])).count() == 0
+        assert db.query(models.PendingDeletion).count() == 0
+    finally:
+        db.close()
+    stats = client.get("/api/analytics/dashboard", headers=headers).json()
+    assert stats["total_documents"] == 2
+
+    # Vector store down: the rows go, the cleanup stays pending until a sweep succeeds
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("vector store unavailable")
+
+    monkeypatch.setattr(vector_store, "delete_documents", unavailable)
+    r = client.delete("/api/documents/?all=true", headers=headers)
+    assert r.json()["deleted"] == 2
+    assert client.get("/api/documents/", headers=headers).json() == []
+    assert indexed(docs[2]["id"]) and not storage.path(docs[2]["filename"]).exists()
+    monkeypatch.undo()
+
+    monkeypatch.setattr(settings, "admin_token", "admin-secret")
+    r = client.post("/api/admin/deletions/sweep?min_age_seconds=0",
+                    headers={"X-Admin-Token": "admin-secret"})
+    assert r.json() == {"pending": 2, "vectors": 2, "files": 0, "remaining": 0}
+    assert not indexed(docs[2]["id"]) and not indexed(docs[3]["id"])
+    assert client.delete("/api/documents/?ids=x", headers=headers).status_code == 400
+    assert client.delete("/api/documents/", headers=headers).status_code == 400
+
+
+def test_upload_detects_language_and_routes_chunks_to_embedders():
+    from app.dependencies import get_vector_store
+
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    text = ("Die Zahlung der Rechnung ist innerhalb von dreißig Tagen nach dem Lieferdatum "
+            "fällig. Bei Fragen wenden Sie sich bitte an unsere Buchhaltung. ") * 20
+    files = {"file": ("rechnung.txt", text.encode(), "text/plain")}
+    doc = client.post("/api/documents/upload", headers=headers, files=files).json()
+    assert doc["language"] == "de"
+
+    vector_store = get_vector_store()
+    vector_store.flush()
+    chunks = vector_store.search_documents(np.zeros(128), n_results=50,
+                                           where={"parent_doc_id": str(doc["id"])})
+    assert len(chunks) > 1
+    assert {(c["metadata"]["language"], c["metadata"]["embedding_model"]) for c in chunks} == {
+        ("de", "multilingual_embedder")
+    }
+
+    r = client.post("/api/documents/search", headers=headers,
+                    json={"query": "Zahlung der Rechnung", "limit": 5})
+    assert doc["id"] in {res["metadata"]["document_id"] for res in r.json()["results"]}
+    client.delete(f"/api/documents/{doc['id']}", headers=headers)
+
+
+def test_translation_endpoints_stream_segments_and_store_document_translation(monkeypatch):
+    from app.dependencies import get_ai_service
+
+    translator = get_ai_service().translator
+    monkeypatch.setattr(translator, "enabled", True)
+
+    def loader(name, device):
+        return lambda sentences, batch_size=None: [
+            {"translation_text": f"[{name[-5:]}] {s}"} for s in sentences
+        ]
+
+    monkeypatch.setattr(translator, "loader", loader)
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    text = "The invoice is due in thirty days. Thank you for your order. " * 20
+    r = client.post("/api/documents/translate/stream", headers=headers,
+                    json={"text": text, "target_language": "de"})
+    events = _sse_events(r.text)
+    segments = [data for name, data in events if name == "segment"]
+    assert len(segments) > 1 and events[-1][0] == "done"
+    done = events[-1][1]
+    assert done["translated_text"] == "".join(s["text"] for s in segments)
+    assert done["translated_text"].startswith("[en-de] The invoice")
+    assert (done["translated"], done["cached"]) == (2, 38)
+
+    files = {"file": ("invoice.txt", text.encode(), "text/plain")}
+    doc = client.post("/api/documents/upload", headers=headers, files=files).json()
+    r = client.post(f"/api/documents/{doc['id']}/translate", headers=headers,
+                    json={"target_language": "fr"})
+    assert r.status_code == 200 and r.json()["translated_text"].startswith("[en-fr]")
+    with SessionLocal() as db:
+        from app import models
+        stored = db.query(models.DocumentAnalysis).filter_by(
+            document_id=doc["id"], analysis_type="translation").one()
+        assert stored.result["target_language"] == "fr"
+    client.delete(f"/api/documents/{doc['id']}", headers=headers)
+
+    # Text whose language can't be detected isn't reported as translated
+    r = client.post("/api/documents/translate", headers=headers,
+                    json={"text": "12345 67890", "target_language": "de"})
+    assert not r.json()["available"] and "source_language" in r.json()["note"]
+
+
+def test_near_duplicate_upload_is_flagged_reused_and_collapsed_in_search():
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    text = " ".join(f"Lease clause {i}: the tenant pays {i * 40} euros for parking space {i}."
+                    for i in range(80))
+    edited = text.replace("Lease clause 12:", "Lease clause twelve:")
+    original = client.post("/api/documents/upload", headers=headers,
+                           files={"file": ("lease.txt", text.encode(), "text/plain")}).json()
+    r = client.post("/api/documents/upload/stream", headers=headers,
+                    files={"file": ("lease-v2.txt", edited.encode(), "text/plain")})
+    events = _sse_events(r.text)
+    duplicate_event = next(data for name, data in events if name == "duplicate")
+    assert duplicate_event["document_id"] == original["id"]
+    copy = client.get(f"/api/documents/{events[-1][1]['id']}", headers=headers).json()
+    assert copy["duplicate_of_id"] == original["id"] and copy["duplicate_similarity"] >= 0.95
+    assert copy["summary"] == original["summary"] and copy["category"] == original["category"]
+
+    query = {"query": "tenant pays euros for parking space", "limit": 20}
+    r = client.post("/api/documents/search", headers=headers, json=query).json()
+    found = {res["metadata"]["document_id"] for res in r["results"]}
+    assert original["id"] in found or copy["id"] in found
+    assert not {original["id"], copy["id"]} <= found and r["collapsed"] > 0
+    kept = next(res for res in r["results"] if res["metadata"]["document_id"] in
+                (original["id"], copy["id"]))
+    others = {original["id"], copy["id"]} - {kept["metadata"]["document_id"]}
+    assert set(kept["duplicates"]) == others
+    r = client.post("/api/documents/search", headers=headers,
+                    json={**query, "collapse_duplicates": False}).json()
+    assert {original["id"], copy["id"]} <= {res["metadata"]["document_id"] for res in r["results"]}
+    client.delete(f"/api/documents/?ids={original['id']},{copy['id']}", headers=headers)
+
+
+def test_new_version_reindexes_only_changed_chunks_and_keeps_history(monkeypatch):
+    from app.dependencies import get_ai_service, get_document_processor, get_vector_store
+
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    text = " ".join(f"Section {i}: the warehouse ships order {i * 13} on weekday {i % 5}."
+                    for i in range(60))
+    doc = client.post("/api/documents/upload", headers=headers,
+                      files={"file": ("report.txt", text.encode(), "text/plain")}).json()
+    vector_store, storage = get_vector_store(), get_document_processor().storage
+    assert doc["version"] == 1
+
+    embedded = []
+    ai_service = get_ai_service()
+    original_embed = ai_service.embed_by_language
+
+    def counting_embed(texts, languages):
+        embedded.extend(texts)
+        return original_embed(texts, languages)
+
+    monkeypatch.setattr(ai_service, "embed_by_language", counting_embed)
+    appended = text + " Appendix: returns are accepted within fourteen days of delivery."
+    r = client.put(f"/api/documents/{doc['id']}", headers=headers,
+                   files={"file": ("report-v2.txt", appended.encode(), "text/plain")})
+    monkeypatch.undo()
+    assert r.status_code == 200
+    updated = r.json()
+    assert updated["id"] == doc["id"] and updated["version"] == 2
+    assert updated["original_filename"] == "report-v2.txt"
+    assert not storage.path(doc["filename"]).exists() and storage.path(updated["filename"]).exists()
+
+    chunks = vector_store.split_text(appended)
+    assert 0 < len(embedded) < len(chunks) and "fourteen days" in embedded[-1]
+    versions = client.get(f"/api/documents/{doc['id']}/versions", headers=headers).json()
+    assert [v["version"] for v in versions] == [1, 2]
+    assert versions[0]["original_filename"] == "report.txt" and versions[0]["changes"] is None
+    assert versions[1]["changes"]["mode"] == "incremental"
+    assert versions[1]["changes"]["embedded"] == len(embedded)
+
+    vector_store.flush()
+    indexed = vector_store.search_documents(np.zeros(128), n_results=100,
+                                            where={"parent_doc_id": str(doc["id"])})
+    assert sorted(c["document"] for c in indexed) == sorted(chunks)
+    assert {c["metadata"]["filename"] for c in indexed} == {"report-v2.txt"}
+
+    # The same file again changes nothing
+    r = client.put(f"/api/documents/{doc['id']}", headers=headers,
+                   files={"file": ("report-v2.txt", appended.encode(), "text/plain")})
+    assert r.json()["summary"] == updated["summary"]
+    versions = client.get(f"/api/documents/{doc['id']}/versions", headers=headers).json()
+    assert versions[-1]["changes"] == {"mode": "unchanged", "chunks": len(chunks), "changed": 0,
+                                       "embedded": 0, "reused": 0, "removed": 0}
+
+    r = client.put(f"/api/documents/{doc['id']}", headers=headers,
+                   files={"file": ("empty.txt", b"   ", "text/plain")})
+    assert r.status_code == 422
+    assert client.get(f"/api/documents/{doc['id']}", headers=headers).json()["version"] == 3
+    assert client.put("/api/documents/999999", headers=headers,
+                      files={"file": ("x.txt", b"x", "text/plain")}).status_code == 404
+    client.delete(f"/api/documents/{doc['id']}", headers=headers)
+    with SessionLocal() as db:
+        from app import models
+        assert db.query(models.DocumentVersion).filter_by(document_id=doc["id"]).count() == 0
+
+
+def test_pdf_pages_are_chunked_separately_without_page_breaks_in_content(monkeypatch):
+    from app.dependencies import get_document_processor, get_vector_store
+    from app.services.document_processor import join_pages
+
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    pages = [f"Page {n}. " + f"Section {n} lists the delivery terms for region {n}. " * 10
+             for n in range(1, 9)]
+    processor, vector_store = get_document_processor(), get_vector_store()
+
+    def upload(method, url, pages):
+        # Stands in for PDF extraction, which needs a real PDF
+        text, page_breaks = join_pages(pages)
+        monkeypatch.setattr(processor, "extract_text", lambda *args, **kwargs: {
+            "text": text, "page_breaks": page_breaks, "pages": len(pages)})
+        r = client.request(method, url, headers=headers,
+                           files={"file": ("terms.pdf", b"%PDF-1.4", "application/pdf")})
+        monkeypatch.undo()
+        return r.json(), text, page_breaks
+
+    doc, text, page_breaks = upload("POST", "/api/documents/upload", pages)
+    content = client.get(f"/api/documents/{doc['id']}", headers=headers).json()["content"]
+    assert content == text and "\f" not in content
+    vector_store.flush()
+    indexed = vector_store.search_documents(np.zeros(128), n_results=100,
+                                            where={"parent_doc_id": str(doc["id"])})
+    assert sorted(c["document"] for c in indexed) == sorted(
+        vector_store.split_text(text, page_breaks)) == sorted(page.strip() for page in pages)
+
+    # The stored page offsets give the indexed layout back: only the edited page is embedded
+    pages[1] = pages[1].replace("region 2", "region two")
+    upload("PUT", f"/api/documents/{doc['id']}", pages)
+    versions = client.get(f"/api/documents/{doc['id']}/versions", headers=headers).json()
+    assert versions[-1]["changes"]["mode"] == "incremental"
+    assert versions[-1]["changes"]["embedded"] == 1
+    client.delete(f"/api/documents/{doc['id']}", headers=headers)
+
+
+def test_new_version_keeps_old_chunks_until_committed_and_reindexes_after_failure(monkeypatch):
+    from app import crud, models
+    from app.dependencies import get_vector_store
+
+    r = client.post("/api/auth/login",
+                    data={"username": "test@example.com", "password": "pw123456"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    text = " ".join(f"Item {i}: the depot stocks {i * 11} crates of part {i % 7}."
+                    for i in range(60))
+    doc = client.post("/api/documents/upload", headers=headers,
+                      files={"file": ("stock.txt", text.encode(), "text/plain")}).json()
+    vector_store = get_vector_store()
+
+    def indexed_chunks():
+        vector_store.flush()
+        return sorted(c["document"] for c in vector_store.search_documents(
+            np.zeros(128), n_results=100, where={"parent_doc_id": str(doc["id"])}))
+
+    def chunk_count():
+        with SessionLocal() as db:
+            return db.get(models.Document, doc["id"]).chunk_count
+
+    original = indexed_chunks()
+    indexed_count = chunk_count()
+    assert len(original) == indexed_count > 1
+
+    # A failed database write leaves the indexed chunks alone
+    def failing_update(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(crud, "update_document", failing_update)
+    shorter = text[:len(text) // 3] + " Stock was recounted."
+    try:
+        client.put(f"/api/documents/{doc['id']}", headers=headers,
+                   files={"file": ("stock.txt", shorter.encode(), "text/plain")})
+    except RuntimeError:
+        pass
+    monkeypatch.undo()
+    assert indexed_chunks() == original
+
+    # Failed indexing keeps the old chunk count, so the next version removes the stale chunks
+    monkeypatch.setattr(vector_store, "update_chunks", lambda **kwargs: False)
+    r = client.put(f"/api/documents/{doc['id']}", headers=headers,
+                   files={"file": ("stock.txt", shorter.encode(), "text/plain")})
+    monkeypatch.undo()
+    assert r.status_code == 200 and chunk_count() == indexed_count
+    versions = client.get(f"/api/documents/{doc['id']}/versions", headers=headers).json()
+    assert versions[-1]["changes"]["indexed"] is False
+
+    r = client.put(f"/api/documents/{doc['id']}", headers=headers,
+                   files={"file": ("stock.txt", shorter.encode(), "text/plain")})
+    chunks = vector_store.split_text(shorter)
+    assert r.status_code == 200 and chunk_count() == len(chunks) < indexed_count
+    assert indexed_chunks() == sorted(chunks)
+    versions = client.get(f"/api/documents/{doc['id']}/versions", headers=headers).json()
+    assert versions[-1]["changes"]["mode"] == "full" and "indexed" not in versions[-1]["changes"]
+    client.delete(f"/api/documents/{doc['id']}", headers=headers)
@@ -0,0 +1,66 @@
+import os
+os.environ["INTELLIDOC_FAST_INIT"] = "1"
+
+from benchmarks.compare import compare  # noqa: E402
+from benchmarks.run import build_parser, run_benchmarks  # noqa: E402
+
+
+def test_benchmark_suites_produce_comparable_reports():
+    args = build_parser().parse_args([
+        "--ingest-sizes", "3000", "--ingest-docs", "1",
+        "--search-sizes", "50", "--search-backends", "memory", "--dim", "16",
+        "--quantizations", "none,binary", "--indexes", "flat,ivf", "--nprobes", "2",
+        "--partitionings", "user",
+        "--queries", "3", "--qa-lengths", "500", "--trace-memory",
+    ])
+    from app.config import settings
+
+    chroma_dir = settings.chroma_persist_dir
+    report = run_benchmarks(args)
+    assert settings.chroma_persist_dir == chroma_dir  # benchmarks use a scratch chroma store
+
+    ingestion = report["results"]["ingestion"]
+    assert {run["format"] for run in ingestion["runs"]} == {"txt", "docx", "pdf"}
+    for run in ingestion["runs"]:
+        assert {"extraction", "embedding", "indexing", "total"} <= set(run["stages"])
+    assert ingestion["memory"]["python_peak_mb"] > 0
+
+    search = report["results"]["search"]["runs"]
+    assert search[0]["backend"] == "memory" and search[0]["chunks"] == 50
+    assert search[0]["query"]["p50_ms"] <= search[0]["query"]["p99_ms"]
+    assert search[0]["quantization"] == "none" and search[0]["recall_at_k"] == 1.0
+    flat_none, ivf_none, flat_binary = search[0], search[1], search[2]
+    assert ivf_none["index"] == "ivf" and ivf_none["nprobe"] == 2
+    assert flat_binary["index_mb"] * 32 == flat_none["index_mb"]
+    assert report["results"]["qa"]["runs"][0]["chars"] == 500
+
+    changes = compare(report, report)
+    assert changes and all(row["change"] in (0.0, None) for row in changes.values())
+
+
+def test_inference_parity_report_and_backend_validation():
+    import pytest
+    from app.services.inference import load_pipeline, parity_report
+
+    class Embedder:
+        def __init__(self, noise):
+            self.noise = noise
+
+        def encode(self, texts):
+            return [[len(t), 1.0 + self.noise] for t in texts]
+
+    report = parity_report("embedder", Embedder(0.0), Embedder(0.001), [["a", "bb"], ["ccc"]])
+    assert report["samples"] == 3 and report["agreement"] == 1.0
+    assert 0.99 < report["min_similarity"] <= 1.0
+
+    def reference(question, context):
+        return {"answer": "the payment terms", "score": 0.9}
+
+    def candidate(question, context):
+        return {"answer": "payment terms", "score": 0.8}
+
+    qa = parity_report("qa", reference, candidate, [{"question": "q?", "context": "c"}])
+    assert qa["agreement"] == 0.0 and 0.7 < qa["mean_similarity"] < 1.0
+
+    with pytest.raises(ValueError):
+        load_pipeline("question-answering", "deepset/roberta-base-squad2", backend="tensorrt")
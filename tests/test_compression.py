@@ -0,0 +1,58 @@
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base, create_db_engine
+from app.db_types import load_json, stored_codec
+from app.utils.compress_columns import compress_columns
+
+
+def test_compressed_columns_read_legacy_rows_and_migrate_them(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    content = "Payment is due within thirty days of the invoice date. " * 200
+    analysis = {"category": "invoice", "confidence": 0.75, "all_scores": {"invoice": 0.75}}
+
+    # Rows as written before compression: TEXT values, analysis results as str(dict)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO documents (id, content, summary) VALUES (1, :c, 'short')"),
+                     {"c": content})
+        conn.execute(text("INSERT INTO document_analyses (id, document_id, result) "
+                          "VALUES (1, 1, :r)"), {"r": str(analysis)})
+        conn.execute(text("INSERT INTO document_analyses (id, document_id, result) "
+                          "VALUES (2, 1, 'invoice (manual review)')"))
+    with Session() as db:
+        assert db.get(models.Document, 1).content == content
+        assert db.get(models.DocumentAnalysis, 1).result == analysis
+        # Free text that is neither JSON nor a literal still reads as an object
+        assert db.get(models.DocumentAnalysis, 2).result == {"raw": "invoice (manual review)"}
+
+    report = compress_columns(engine, batch_size=1)
+    assert report["documents"]["rewritten"] == 1 and report["document_analyses"]["rewritten"] == 2
+    assert report["documents"]["bytes_after"] < report["documents"]["bytes_before"] / 10
+    with engine.connect() as conn:
+        stored = conn.execute(text("SELECT content, summary FROM documents")).one()
+    assert stored_codec(stored[0]) == "zlib" and stored_codec(stored[1]) == "none"
+    assert compress_columns(engine)["documents"]["rewritten"] == 0
+
+    with Session() as db:
+        document = db.get(models.Document, 1)
+        assert (document.content, document.summary) == (content, "short")
+        assert db.get(models.DocumentAnalysis, 1).result == analysis
+        assert db.get(models.DocumentAnalysis, 2).result == {"raw": "invoice (manual review)"}
+        document.summary = "A longer summary. " * 50
+        db.commit()
+        db.expire_all()
+        assert db.get(models.Document, 1).summary == "A longer summary. " * 50
+    engine.dispose()
+
+
+def test_load_json_wraps_values_that_are_not_objects():
+    assert load_json('{"category": "invoice"}') == {"category": "invoice"}
+    assert load_json("{'category': 'invoice'}") == {"category": "invoice"}
+    assert load_json("[1,2]") == {"raw": [1, 2]}
+    assert load_json("42") == {"raw": 42}
+    assert load_json('"x"') == {"raw": "x"}
+    assert load_json("('a', 1)") == {"raw": ("a", 1)}
+    assert load_json(None) is None
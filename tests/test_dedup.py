@@ -0,0 +1,63 @@
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base, create_db_engine
+from app.services import dedup
+from app.services.dedup import MinHasher, band_buckets, shingle_hashes, similarity
+
+BASE = " ".join(f"Clause {i}: the supplier delivers item {i * 7} within {i + 3} days."
+                for i in range(60))
+
+
+def test_signature_similarity_tracks_jaccard():
+    hasher = MinHasher(num_perm=256)
+    edited = BASE.replace("Clause 10:", "Section 10:").replace("Clause 40:", "Section 40:")
+    a, b = shingle_hashes(BASE), shingle_hashes(edited)
+    jaccard = len(np.intersect1d(a, b)) / len(np.union1d(a, b))
+    estimate = similarity(hasher.signature(a), hasher.signature(b))
+    assert abs(estimate - jaccard) < 0.08
+    unrelated = hasher.signature(shingle_hashes("An entirely different text about holidays. " * 5))
+    assert similarity(hasher.signature(a), unrelated) < 0.1
+
+    signature = hasher.signature(a)
+    assert signature.dtype == np.uint32
+    assert np.array_equal(MinHasher(num_perm=256).signature(a), signature)
+    buckets = band_buckets(signature, 16)
+    assert len(set(buckets)) == 16 and buckets == band_buckets(signature.copy(), 16)
+
+
+def test_lsh_lookup_finds_group_original_per_owner(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'dedup.db'}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        docs = [models.Document(owner_id=owner, filename=f"{i}.txt") for i, owner in
+                enumerate([1, 1, 2])]
+        db.add_all(docs)
+        db.commit()
+        original, copy, other_owner = docs
+        signature = dedup.text_signature(BASE)
+        dedup.index_document(db, original.id, 1, signature)
+        dedup.index_document(db, other_owner.id, 2, signature)
+
+        near = dedup.text_signature(BASE.replace("Clause 5:", "Clause five:"))
+        match = dedup.find_duplicate(db, 1, near, exclude_id=copy.id)
+        assert match[0] == original.id and match[1] >= 0.8
+        copy.duplicate_of_id = original.id
+        dedup.index_document(db, copy.id, 1, near)
+        # A third copy is attributed to the group's original, not to the copy it matched best
+        assert dedup.find_duplicate(db, 1, near, exclude_id=None)[0] == original.id
+        unrelated = dedup.text_signature("Nothing alike here. " * 30)
+        assert dedup.find_duplicate(db, 1, unrelated) is None
+        assert db.query(models.LSHBucket).count() == 3 * 16
+        # Re-indexing the original never matches its own duplicates
+        assert dedup.find_duplicate(db, 1, signature, exclude_id=original.id) is None
+
+        # An original that becomes a duplicate hands its group over instead of forming a chain
+        other = models.Document(owner_id=1, filename="3.txt")
+        db.add(other)
+        db.commit()
+        assert crud.reassign_duplicates(db, original.id, other.id) == 1
+        db.refresh(copy)
+        assert copy.duplicate_of_id == other.id
+    engine.dispose()
@@ -0,0 +1,79 @@
+import os
+import time
+
+import anyio
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base, create_db_engine
+from app.services.file_storage import LocalStorage, S3Storage, collect_garbage
+
+
+async def _chunks(data, size=1000):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _read_all(storage, key):
+    return b"".join([chunk async for chunk in storage.read(key, chunk_size=4096)])
+
+
+def test_local_storage_shards_streams_and_collects_orphans(tmp_path):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    data = os.urandom(10_000)
+    key = storage.new_key("report.pdf")
+    assert key.endswith(".pdf") and "/" not in key
+
+    assert anyio.run(storage.save, key, _chunks(data)) == len(data)
+    path = storage.path(key)
+    assert path.relative_to(storage.root).parts[:2] == tuple(storage.shard(key).split("/"))
+    assert anyio.run(_read_all, storage, key) == data
+    with storage.local_path(key) as local:
+        assert local.read_bytes() == data
+    assert not list(path.parent.glob(".*.tmp"))
+
+    # A file from before sharding (its row stores the full path) and two orphans
+    legacy = storage.root / "legacy.txt"
+    legacy.write_bytes(b"legacy")
+    orphan = storage.new_key("orphan.txt")
+    anyio.run(storage.save, orphan, _chunks(b"orphan"))
+    fresh = storage.new_key("fresh.txt")
+    anyio.run(storage.save, fresh, _chunks(b"fresh"))
+    old = time.time() - 7200
+    for stale in (path, legacy, storage.path(orphan)):
+        os.utime(stale, (old, old))
+    assert {k for k, _ in storage.list()} == {key, str(legacy), orphan, fresh}
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'gc.db'}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        legacy_row = models.Document(file_path=f"{storage.root}/./legacy.txt")
+        db.add_all([models.Document(file_path=key), legacy_row])
+        db.commit()
+        assert collect_garbage(db, storage, grace_seconds=3600, dry_run=True)["orphaned"] == 1
+        report = collect_garbage(db, storage, grace_seconds=3600)
+    engine.dispose()
+    assert report == {"scanned": 4, "orphaned": 1, "deleted": 1}
+    assert path.exists() and legacy.exists() and storage.path(fresh).exists()
+    assert not storage.path(orphan).exists()
+
+
+def test_s3_storage_round_trip_against_moto():
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="uploads")
+        storage = S3Storage("uploads", prefix="files/", client=client)
+        small, large = os.urandom(1000), os.urandom(9 * 1024 * 1024)  # large: multipart
+        for data in (small, large):
+            key = storage.new_key("blob.bin")
+            assert anyio.run(storage.save, key, _chunks(data, 1024 * 1024)) == len(data)
+            assert anyio.run(_read_all, storage, key) == data
+            with storage.local_path(key) as local:
+                assert local.read_bytes() == data
+            assert key in {k for k, _ in storage.list()}
+            storage.delete(key)
+        assert list(storage.list()) == []
@@ -0,0 +1,83 @@
+import os
+os.environ["INTELLIDOC_FAST_INIT"] = "1"
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+
+from app.services.ai_service import AIService  # noqa: E402
+from app.services.language import UNDETERMINED, detect_language, dominant_language  # noqa: E402
+from app.services.vector_store import VectorStore, merge_results  # noqa: E402
+
+SAMPLES = {
+    "en": "Please find attached the quarterly statement, which shows that revenue increased.",
+    "de": "Bitte beachten Sie, dass die Kündigung schriftlich erfolgen muss und erst dann gilt.",
+    "fr": "Veuillez noter que la résiliation doit être faite par écrit avant la fin du délai.",
+    "es": "Tenga en cuenta que la cancelación debe hacerse por escrito antes del plazo previsto.",
+    "it": "Si prega di notare che la disdetta deve essere fatta per iscritto entro il termine.",
+    "pt": "Por favor, note que o cancelamento deve ser feito por escrito antes do fim do prazo.",
+    "nl": "Houd er rekening mee dat de opzegging schriftelijk moet gebeuren voor het einde.",
+    "ru": "Обратите внимание, что расторжение договора должно быть оформлено письменно.",
+    "ja": "この契約は書面で解除する必要があります。",
+    "zh": "请注意，合同必须以书面形式终止。",
+}
+
+
+@pytest.mark.parametrize("language", sorted(SAMPLES))
+def test_detects_language_of_unseen_sentences(language):
+    detected, confidence = detect_language(SAMPLES[language])
+    assert detected == language and confidence > 0.5
+
+
+def test_short_text_is_undetermined_and_documents_take_the_dominant_language():
+    assert detect_language("12.5 %") == (UNDETERMINED, 0.0)
+    assert dominant_language(["de", "en", UNDETERMINED], [900, 300, 50]) == "de"
+    assert dominant_language([UNDETERMINED]) == UNDETERMINED
+
+
+class _Embedder:
+    def __init__(self, dim, offset):
+        self.dim, self.offset, self.calls = dim, offset, []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.full((len(texts), self.dim), self.offset, dtype=np.float32)
+
+
+def test_chunks_are_embedded_in_one_batch_per_routed_model():
+    ai = AIService()
+    english, multilingual = _Embedder(4, 1.0), _Embedder(4, -1.0)
+    ai.models = {"embedder": english, "multilingual_embedder": multilingual}
+
+    texts = ["one", "zwei", "three", "quatre"]
+    vectors, models = ai.embed_by_language(texts, ["en", "de", "en", "fr"])
+    assert models == ["embedder", "multilingual_embedder", "embedder", "multilingual_embedder"]
+    assert english.calls == [["one", "three"]] and multilingual.calls == [["zwei", "quatre"]]
+    assert vectors[:, 0].tolist() == [1.0, -1.0, 1.0, -1.0]
+    assert set(ai.embed_query("where")) == {"embedder", "multilingual_embedder"}
+
+    # Without the multilingual model everything stays in the default embedding space
+    del ai.models["multilingual_embedder"]
+    assert ai.embed_by_language(["zwei"], ["de"])[1] == ["embedder"]
+
+
+def test_search_is_limited_to_the_query_embedding_space():
+    store = VectorStore(backend="memory", batch_size=0)
+    vector = np.ones(8, dtype=np.float32)
+    store.add_document("1", "legacy chunk", vector, {"user_id": 1})  # no embedding_model
+    store.add_document("2", "english chunk", vector, {"user_id": 1},
+                       chunk_metadata=[{"language": "en", "embedding_model": "embedder"}])
+    store.add_document("3", "german chunk", vector, {"user_id": 1},
+                       chunk_metadata=[{"language": "de",
+                                        "embedding_model": "multilingual_embedder"}])
+
+    def ids(model):
+        return {r["id"] for r in store.search_documents(vector, 5, {"user_id": 1},
+                                                        embedding_model=model)}
+
+    assert ids("embedder") == {"1_chunk_0", "2_chunk_0"}
+    assert ids("multilingual_embedder") == {"3_chunk_0"}
+    results = store.search_all(vector, 5, embedding_model="multilingual_embedder")
+    assert {r["id"] for r in results} == {"3_chunk_0"}
+    merged = merge_results([store.search_documents(vector, 2, embedding_model=m)
+                            for m in ("embedder", "multilingual_embedder")], 2)
+    assert len(merged) == 2
@@ -0,0 +1,50 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import create_db_engine
+from app.migrations import upgrade_schema
+
+# Schema (and a row) of a database created before any of the later columns and tables
+BASELINE = [
+    """CREATE TABLE users (id INTEGER NOT NULL, email VARCHAR, hashed_password VARCHAR,
+       is_active BOOLEAN, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (id))""",
+    """CREATE TABLE documents (id INTEGER NOT NULL, filename VARCHAR, original_filename VARCHAR,
+       file_path VARCHAR, file_size INTEGER, mime_type VARCHAR, content TEXT, summary TEXT,
+       category VARCHAR, confidence_score FLOAT, language VARCHAR, owner_id INTEGER,
+       created_at DATETIME DEFAULT CURRENT_TIMESTAMP, processed_at DATETIME, PRIMARY KEY (id),
+       FOREIGN KEY(owner_id) REFERENCES users (id))""",
+    "CREATE INDEX ix_documents_id ON documents (id)",
+    """CREATE TABLE document_analyses (id INTEGER NOT NULL, document_id INTEGER,
+       analysis_type VARCHAR, result TEXT, confidence FLOAT,
+       created_at DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (id))""",
+    "INSERT INTO users (id, email, is_active) VALUES (1, 'old@example.com', 1)",
+    """INSERT INTO documents (id, filename, original_filename, file_size, mime_type, content,
+       summary, category, owner_id, processed_at)
+       VALUES (1, 'a.txt', 'a.txt', 5, 'text/plain', 'hello', 'hi', 'other', 1, '2024-01-01')""",
+    """INSERT INTO document_analyses (document_id, analysis_type, result, confidence)
+       VALUES (1, 'classification', '{''category'': ''other''}', 0.5)""",
+]
+
+
+def test_upgrade_adds_missing_columns_tables_and_indexes_to_an_old_database(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for sql in BASELINE:
+            conn.execute(text(sql))
+
+    executed = upgrade_schema(engine)
+    assert "ALTER TABLE documents ADD COLUMN version INTEGER DEFAULT 1" in executed
+    assert upgrade_schema(engine) == []  # idempotent
+    inspector = inspect(engine)
+    assert {"document_versions", "user_stats", "lsh_buckets"} <= set(inspector.get_table_names())
+    indexes = {i["name"] for i in inspector.get_indexes("documents")}
+    assert "ix_documents_owner_created_id" in indexes
+
+    with sessionmaker(bind=engine)() as db:
+        document = crud.get_document(db, 1, 1)
+        assert (document.content, document.summary) == ("hello", "hi")
+        assert (document.chunk_count, document.version, document.duplicate_of_id) == (0, 1, None)
+        assert db.query(models.DocumentAnalysis).one().result == {"category": "other"}
+        assert crud.get_user_stats(db, 1).total_documents == 1
+    engine.dispose()
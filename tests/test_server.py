@@ -0,0 +1,114 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork server needs os.fork")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url: str, timeout: float = 20.0) -> httpx.Response:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return httpx.get(url, timeout=1.0)
+        except httpx.HTTPError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def test_prefork_server_serves_restarts_and_stops(tmp_path):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "INTELLIDOC_FAST_INIT": "1",
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'server.db'}",
+        "UPLOAD_DIR": str(tmp_path / "uploads"),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "2"],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        # Services were built in the parent, so workers are ready immediately
+        assert _wait_for(f"http://127.0.0.1:{port}/health/ready").status_code == 200
+
+        proc.send_signal(signal.SIGHUP)
+        time.sleep(1.0)
+        assert _wait_for(f"http://127.0.0.1:{port}/health/live").status_code == 200
+
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=30) == 0
+        output = proc.stdout.read()
+        assert "with 2 workers" in output
+        assert "Rolling restart of workers" in output
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def test_prefork_workers_share_one_vector_store(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "INTELLIDOC_FAST_INIT": "1",
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'server.db'}",
+        "UPLOAD_DIR": str(tmp_path / "uploads"),
+        "CHROMA_PERSIST_DIR": str(tmp_path / "chroma"),
+    }
+    env.pop("VECTOR_STORE_ADDRESS", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "2"],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        assert _wait_for(f"{base}/health/ready").status_code == 200
+        account = {"email": "workers@example.com", "password": "pw123456"}
+        httpx.post(f"{base}/api/auth/register", json=account, timeout=10)
+        token = httpx.post(f"{base}/api/auth/login", timeout=10, data={
+            "username": account["email"], "password": account["password"],
+        }).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        text = "Shared index check: the lighthouse keeper logs every passing ship. " * 20
+        doc = httpx.post(f"{base}/api/documents/upload", headers=headers, timeout=30,
+                         files={"file": ("ships.txt", text.encode(), "text/plain")}).json()
+
+        def search(_):
+            r = httpx.post(f"{base}/api/documents/search", headers=headers, timeout=30,
+                           json={"query": "lighthouse keeper ships"})
+            return {hit["metadata"]["document_id"] for hit in r.json()["results"]}
+
+        # Whichever worker answers, it sees the upload another worker indexed
+        with ThreadPoolExecutor(16) as pool:
+            assert all(found == {doc["id"]} for found in pool.map(search, range(64)))
+
+        httpx.delete(f"{base}/api/documents/{doc['id']}", headers=headers, timeout=30)
+        with ThreadPoolExecutor(16) as pool:
+            assert not any(pool.map(search, range(32)))
+
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=30) == 0
+        assert "Vector store (memory) serving on" in proc.stdout.read()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+import time
+os.environ["INTELLIDOC_FAST_INIT"] = "1"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.dependencies import services  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "chromadb", "PyPDF2", "docx",
+                 "cv2"]
+IMPORT_BUDGET_SECONDS = 5.0
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def test_import_app_main_is_fast_and_skips_heavy_modules(tmp_path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'import.db'}",
+        "UPLOAD_DIR": str(tmp_path / "uploads"),
+    }
+    env.pop("INTELLIDOC_FAST_INIT", None)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["heavy"] == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS, (
+        f"import app.main took {result['seconds']:.2f}s"
+    )
+
+
+def test_liveness_and_readiness_probes():
+    services.reset()
+    client = TestClient(app)
+    assert client.get("/health/live").json() == {"status": "alive"}
+    r = client.get("/health/ready")
+    assert r.status_code == 503
+    assert r.json()["services"]["ai_service"] == "pending"
+
+    # Entering the client runs the lifespan, which warms services in the background
+    with TestClient(app) as started:
+        for _ in range(100):
+            r = started.get("/health/ready")
+            if r.status_code == 200:
+                break
+            time.sleep(0.05)
+        assert r.status_code == 200
+        assert set(r.json()["services"].values()) == {"ready"}
@@ -0,0 +1,87 @@
+from app.services.translation import TranslationService, split_sentences
+
+
+class _Marian:
+    """Stands in for a transformers translation pipeline: upper-cases each sentence."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, sentences, batch_size=None):
+        self.batches.append(list(sentences))
+        return [{"translation_text": sentence.upper()} for sentence in sentences]
+
+
+def test_split_sentences_round_trips_and_cuts_long_sentences():
+    text = "First sentence. Second one!  Third?\nHeader\n\nLast line without stop"
+    segments = split_sentences(text)
+    assert "".join(s + gap for s, gap in segments) == text
+    assert [s for s, _ in segments] == ["First sentence.", "Second one!", "Third?", "Header",
+                                        "Last line without stop"]
+
+    long = "word " * 200
+    pieces = split_sentences(long.strip(), max_chars=100)
+    assert all(len(s) <= 100 for s, _ in pieces)
+    assert "".join(s + gap for s, gap in pieces) == long.strip()
+
+
+def test_translates_in_batches_and_caches_repeated_sentences():
+    model = _Marian()
+    loads = []
+    service = TranslationService(loader=lambda name, device: loads.append(name) or model,
+                                 batch_size=3)
+    clause = "This agreement is governed by the laws of the state."
+    text = f"{clause} Payment is due in thirty days. {clause} Thank you for your order. {clause}"
+
+    segments = []
+    result = service.translate(text, "de", on_segment=segments.append)
+    assert result["source_language"] == "en" and result["available"]
+    assert result["translated_text"] == text.upper()
+    assert [s["index"] for s in segments] == [0, 3]
+    assert "".join(s["text"] for s in segments) == result["translated_text"]
+    # The repeated clause is translated once; the second batch only sends the new sentence
+    assert model.batches == [[clause, "Payment is due in thirty days."],
+                             ["Thank you for your order."]]
+    assert (result["translated"], result["cached"]) == (3, 2)
+
+    # Another document with the same boilerplate: served from the cache, model loaded once
+    again = service.translate(f"{clause} New sentence here.", "de", source="en")
+    assert model.batches[-1] == ["New sentence here."] and again["cached"] == 1
+    assert loads == ["Helsinki-NLP/opus-mt-en-de"]
+    assert service.state()["loaded"] == ["en-de"]
+
+
+def test_unavailable_pair_and_same_language_pass_through():
+    def missing(name, device):
+        raise OSError(f"{name} not found")
+
+    service = TranslationService(loader=missing)
+    text = "Der Vertrag bleibt für zwei Jahre in Kraft. Vielen Dank."
+    result = service.translate(text, "fi")
+    assert result["translated_text"] == text and not result["available"]
+    assert result["source_language"] == "de"
+    assert service.state()["unavailable"] == ["de-fi"]
+
+    same = service.translate(text, "de")
+    assert same["translated_text"] == text and same["available"] and same["translated"] == 0
+
+
+def test_undetected_source_and_failed_batches_are_reported():
+    model = _Marian()
+    service = TranslationService(loader=lambda name, device: model, batch_size=2)
+    undetected = service.translate("12345 67890", "de")
+    assert undetected["source_language"] == "und" and not undetected["available"]
+    assert undetected["translated_text"] == "12345 67890" and model.batches == []
+
+    def flaky(sentences, batch_size=None):
+        if "Second sentence." in sentences:
+            raise RuntimeError("out of memory")
+        return model(sentences)
+
+    service = TranslationService(loader=lambda name, device: flaky, batch_size=1)
+    result = service.translate("First sentence. Second sentence.", "de", source="en")
+    assert result["translated_text"] == "FIRST SENTENCE. Second sentence."
+    assert (result["translated"], result["failed"]) == (1, 1)
+    assert not result["available"] and result["error"] == "out of memory"
+    # The failed sentence isn't cached as its own translation
+    assert service.cache.get(service.cache.key("en", "de", "Second sentence.")) is None
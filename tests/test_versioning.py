@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.services.document_processor import join_pages
+from app.services.vector_store import VectorStore
+from app.services.versioning import diff_chunks, update_mode
+
+PAGES = [f"Page {n}. " + f"Clause {n} of the agreement covers delivery and payment. " * 8
+         for n in range(1, 5)]
+
+
+def test_pages_are_chunked_separately_and_moved_chunks_are_reused():
+    store = VectorStore(backend="memory", batch_size=0)
+    text, page_breaks = join_pages(PAGES)
+    assert text == "\n".join(page.strip() for page in PAGES)
+    assert all(text[offset:].startswith(f"Page {n}.") for n, offset in enumerate(page_breaks, 2))
+    old = store.split_text(text, page_breaks)
+    assert len(old) == 4 and old[1].startswith("Page 2.")
+    assert store.chunk_count(text) < 4  # without the offsets, chunks cross pages
+
+    edited = list(PAGES)
+    edited[2] = edited[2].replace("Clause 3 of", "Section 3 of")
+    diff = diff_chunks(old, store.split_text(*join_pages(edited)))
+    assert diff["changed"] == diff["embed"] == [2] and diff["removed"] == []
+    assert update_mode(diff, sum(map(len, edited))) == "incremental"
+
+    # A page inserted in front moves every chunk; only the new one needs embedding
+    inserted = store.split_text(*join_pages(["Cover letter. " * 30] + PAGES))
+    diff = diff_chunks(old, inserted)
+    assert diff["changed"] == [0, 1, 2, 3, 4] and diff["embed"] == [0]
+    assert diff["reuse"] == {1: 0, 2: 1, 3: 2, 4: 3} and diff["removed_chars"] == 0
+
+    shortened = diff_chunks(old, old[:2])
+    assert shortened["changed"] == [] and shortened["removed"] == [2, 3]
+    assert update_mode(shortened, len(PAGES[0]) * 2) == "full"
+    assert update_mode(diff_chunks(old, old), 100) == "unchanged"
+
+
+def test_update_chunks_rewrites_only_given_chunks():
+    store = VectorStore(backend="memory", batch_size=0)
+    vectors = np.eye(4, 8, dtype=np.float32)
+    metadata = {"document_id": 7, "filename": "v1.txt", "user_id": 1}
+    text, page_breaks = join_pages(PAGES)
+    store.add_document("7", text, vectors, metadata, page_breaks=page_breaks)
+
+    stored = store.get_chunks("7", [1, 3, 9], user_id=1)
+    assert sorted(stored) == [1, 3] and stored[3][1]["chunk_index"] == 3
+    assert np.allclose(stored[1][0], vectors[1])
+
+    new_vector = np.zeros((1, 8), dtype=np.float32)
+    new_vector[0, 7] = 1.0
+    assert store.update_chunks("7", {1: "Rewritten page two."}, new_vector,
+                               {**metadata, "filename": "v2.txt"}, [{"language": "en"}],
+                               chunk_count=3, previous_count=4, refresh_metadata=True)
+    results = store.search_documents(new_vector[0], 10, {"user_id": 1})
+    assert [r["id"] for r in results][0] == "7_chunk_1"
+    assert results[0]["document"] == "Rewritten page two." and len(results) == 3
+    assert {r["metadata"]["filename"] for r in results} == {"v2.txt"}
+    assert np.allclose(store.get_chunks("7", [0], user_id=1)[0][0], vectors[0])